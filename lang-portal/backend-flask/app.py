@@ -1,65 +1,140 @@
 from flask import Flask, g
-from flask_cors import CORS
 
 from lib.db import Db
+from lib.snapshot import SnapshotDb
+from lib.pagination import CountCache
+from lib.reviews import WordIdCache
+from lib.stats_cache import StatsCache
+from lib.review_queue import ReviewQueue
+from lib.response_cache import ResponseCache
+from lib.export import Exports
+from lib.origins import CORS_HEADERS, DEFAULT_CORS_ORIGINS, OriginAllowlist, init_cors
+from lib.shards import ShardRouter, init_sharding
+from lib.query_profiler import QueryProfiler, init_profiling
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
-
-def get_allowed_origins(app):
-    try:
-        cursor = app.db.cursor()
-        cursor.execute('SELECT url FROM study_activities')
-        urls = cursor.fetchall()
-        # Convert URLs to origins (e.g., https://example.com/app -> https://example.com)
-        origins = set()
-        for url in urls:
-            try:
-                from urllib.parse import urlparse
-                parsed = urlparse(url['url'])
-                origin = f"{parsed.scheme}://{parsed.netloc}"
-                origins.add(origin)
-            except:
-                continue
-        return list(origins) if origins else ["*"]
-    except:
-        return ["*"]  # Fallback to allow all origins if there's an error
+import routes.debug
 
 def create_app(test_config=None):
     app = Flask(__name__)
     
-    if test_config is None:
-        app.config.from_mapping(
-            DATABASE='words.db'
-        )
-    else:
+    app.config.from_mapping(
+        DATABASE='words.db',
+        DATABASE_POOL_SIZE=5,       # Connections shared by all request threads
+        DATABASE_POOL_TIMEOUT=30,   # Seconds to wait for a free connection
+        READ_SNAPSHOT=False,        # Serve the dashboard and session listings from a refreshed read-only copy
+        READ_SNAPSHOT_PATH=None,    # Location of the copy; defaults to words.snapshot.db beside DATABASE
+        READ_SNAPSHOT_MAX_STALENESS=5,  # Seconds; an older copy is bypassed and the primary is read
+        SHARD_DIRECTORY=None,       # Keep each learner's study history in <dir>/<learner>.db; None for one shared database
+        SHARD_HEADER='X-Learner-Id',  # Request header naming the learner whose shard a request uses
+        SHARD_POOL_SIZE=2,          # Connections per open learner shard
+        SHARD_MAX_OPEN=64,          # Learner shards kept open (LRU)
+        SHARD_MAX_COUNT=10000,      # Learner shards that can be created; new learners past it get a 503
+        COUNT_CACHE_TTL=60,         # Seconds a paginated listing's total count is reused
+        REVIEW_JOURNAL='review_journal.ndjson',  # Write-behind review log (one per process)
+        REVIEW_FLUSH_INTERVAL=0.5,  # Seconds between background commits of the review log
+        RESPONSE_CACHE_SIZE=1024,   # Cached GET responses kept (LRU); None for no cap
+        RESPONSE_CACHE_MAX_AGE=0,   # Cache-Control max-age; 0 makes clients revalidate by ETag
+        EXPORT_MAX_CONCURRENT=2,    # Streaming exports at once per process; more get a 503
+        ASGI_THREADS=None,          # Request threads per process under asgi.py; defaults to DATABASE_POOL_SIZE
+        CORS_ORIGINS=DEFAULT_CORS_ORIGINS,  # Allowed besides study activity origins; ['*'] allows all
+        CORS_REFRESH_INTERVAL=5,    # Seconds between checks for changed study activity origins
+        QUERY_PROFILING=False,      # Time every statement; adds Server-Timing and /api/_debug/queries
+        SLOW_QUERY_MS=100,          # Statements at least this slow go to the slow query log
+        SLOW_QUERY_LOG='slow_queries.log'  # Rotating slow query log; None to only keep stats
+    )
+    # Any setting can be overridden from the environment, e.g. FLASK_DATABASE_POOL_SIZE=16
+    app.config.from_prefixed_env()
+    if test_config is not None:
         app.config.update(test_config)
     
-    # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
-    
-    # Get allowed origins from study_activities table
-    allowed_origins = get_allowed_origins(app)
+    # Initialize database
+    app.db = Db(
+        database=app.config['DATABASE'],
+        pool_size=app.config['DATABASE_POOL_SIZE'],
+        pool_timeout=app.config['DATABASE_POOL_TIMEOUT']
+    )
+
+    # Learner shards: requests naming a learner in SHARD_HEADER read and write
+    # that learner's study history in its own file under SHARD_DIRECTORY
+    app.shards = None
+    if app.config['SHARD_DIRECTORY']:
+        app.shards = ShardRouter(
+            app.config['SHARD_DIRECTORY'],
+            app.config['DATABASE'],
+            header=app.config['SHARD_HEADER'],
+            pool_size=app.config['SHARD_POOL_SIZE'],
+            pool_timeout=app.config['DATABASE_POOL_TIMEOUT'],
+            max_open=app.config['SHARD_MAX_OPEN'],
+            max_shards=app.config['SHARD_MAX_COUNT']
+        )
+        app.db.shards = app.shards
+        init_sharding(app, app.shards)
+
+    # Reads that tolerate bounded staleness go through app.read_db, which is
+    # the primary itself unless READ_SNAPSHOT is set
+    app.read_db = app.db
+    if app.config['READ_SNAPSHOT']:
+        app.read_db = SnapshotDb(
+            app.db,
+            path=app.config['READ_SNAPSHOT_PATH'],
+            max_staleness=app.config['READ_SNAPSHOT_MAX_STALENESS'],
+            pool_size=app.config['DATABASE_POOL_SIZE'],
+            pool_timeout=app.config['DATABASE_POOL_TIMEOUT']
+        )
+        app.read_db.start()
     
-    # In development, add localhost to allowed origins
-    if app.debug:
-        allowed_origins.extend(["http://localhost:8080", "http://127.0.0.1:8080", "http://localhost:5173"])
+    app.count_cache = CountCache(ttl=app.config['COUNT_CACHE_TTL'])
+    app.word_ids = WordIdCache()
+    app.stats_cache = StatsCache()
+    app.review_queue = ReviewQueue(
+        app.db,
+        app.config['REVIEW_JOURNAL'],
+        flush_interval=app.config['REVIEW_FLUSH_INTERVAL'],
+        shards=app.shards
+    )
+    # Commit reviews a previous run journaled but never flushed
+    app.review_queue.claim_journal()
+    app.review_queue.start_if_journal_exists()
+    app.response_cache = ResponseCache(
+        app.db,
+        max_entries=app.config['RESPONSE_CACHE_SIZE'],
+        max_age=app.config['RESPONSE_CACHE_MAX_AGE']
+    )
+    # Exports stream from their own connections, not the request pool
+    app.exports = Exports(app.db, max_concurrent=app.config['EXPORT_MAX_CONCURRENT'])
     
-    # Configure CORS with combined origins
-    CORS(app, resources={
-        r"/*": {
-            "origins": allowed_origins,
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
-        }
-    })
+    # Allowed CORS origins are resolved on first use, not at startup, and
+    # follow changes to study_activities
+    app.origins = OriginAllowlist(
+        app.db,
+        extra_origins=app.config['CORS_ORIGINS'],
+        refresh_interval=app.config['CORS_REFRESH_INTERVAL']
+    )
+    allow_headers = CORS_HEADERS
+    if app.shards is not None:
+        allow_headers += ', ' + app.config['SHARD_HEADER']
+    init_cors(app, app.origins, allow_headers=allow_headers)
+
+    # Per-statement timings for cursors from app.db.cursor()
+    app.query_profiler = None
+    if app.config['QUERY_PROFILING']:
+        app.query_profiler = QueryProfiler(
+            slow_ms=app.config['SLOW_QUERY_MS'],
+            slow_log=app.config['SLOW_QUERY_LOG']
+        )
+        app.db.profiler = app.query_profiler
+        init_profiling(app, app.query_profiler)
 
-    # Close database connection
-    @app.teardown_appcontext
+    # Return the database connections to their pools at the end of each
+    # request (closing twice is harmless when read_db is the primary)
+    @app.teardown_request
     def close_db(exception):
+        app.read_db.close()
         app.db.close()
 
     # load routes -----------
@@ -68,6 +143,7 @@ def create_app(test_config=None):
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
+    routes.debug.load(app)
     
     return app
 
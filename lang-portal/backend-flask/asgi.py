@@ -0,0 +1,18 @@
+# ASGI entry point for production serving:
+#
+#   uvicorn asgi:application --workers 4
+#
+# or `invoke serve`. The routes registered by routes.*.load(app) stay
+# synchronous; each request runs on a bounded thread pool of ASGI_THREADS
+# threads (default DATABASE_POOL_SIZE), so the event loop never blocks on
+# SQLite and no more requests wait on the database than there are pooled
+# connections. Settings come from FLASK_-prefixed environment variables,
+# e.g. FLASK_ASGI_THREADS=16 FLASK_DATABASE_POOL_SIZE=16.
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+application = WSGIMiddleware(
+    app,
+    workers=app.config['ASGI_THREADS'] or app.config['DATABASE_POOL_SIZE']
+)
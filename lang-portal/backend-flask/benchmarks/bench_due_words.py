@@ -0,0 +1,82 @@
+# Times selecting the next due words (lib/scheduler.py due_words, what
+# /api/groups/<id>/due runs) in a group of a million words, most of them
+# with a schedule, plus a small group drawn from the same words.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_due_words [--words 1000000]
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from lib.scheduler import due_words, format_due
+
+def seed_words(connection, words, scheduled_share, small_group_size):
+  connection.execute("INSERT INTO groups (name) VALUES ('Bench Large')")
+  large_id = connection.execute('SELECT last_insert_rowid()').fetchone()[0]
+  connection.execute("INSERT INTO groups (name) VALUES ('Bench Small')")
+  small_id = connection.execute('SELECT last_insert_rowid()').fetchone()[0]
+  first_id = (connection.execute('SELECT MAX(id) FROM words').fetchone()[0] or 0) + 1
+  connection.executemany(
+    'INSERT INTO words (english, spanish) VALUES (?, ?)',
+    ((f'word {n}', f'palabra {n}') for n in range(words))
+  )
+  word_ids = range(first_id, first_id + words)
+  connection.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', ((word_id, large_id) for word_id in word_ids))
+  connection.executemany(
+    'INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
+    ((word_id, small_id) for word_id in random.sample(word_ids, small_group_size))
+  )
+  # Due times spread from a month ago to two months ahead
+  now = datetime.now()
+  connection.executemany(
+    'INSERT INTO word_schedules (word_id, ease, interval_days, repetitions, due_at) VALUES (?, 2.5, 6, 2, ?)',
+    ((word_id, format_due(now + timedelta(minutes=random.randint(-43200, 86400))))
+     for word_id in random.sample(word_ids, int(words * scheduled_share)))
+  )
+  connection.commit()
+  return large_id, small_id
+
+def timed(label, repeat, call):
+  call()
+  samples = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    call()
+    samples.append(time.perf_counter() - started)
+  samples.sort()
+  print(f"{label:<40} mean {sum(samples) / repeat * 1000:7.3f} ms  p99 {samples[int(repeat * 0.99) - 1] * 1000:7.3f} ms")
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark due word selection')
+  parser.add_argument('--words', type=int, default=1000000)
+  parser.add_argument('--scheduled-share', type=float, default=0.8, help='Share of words that have been reviewed')
+  parser.add_argument('--small-group', type=int, default=1000)
+  parser.add_argument('--repeat', type=int, default=1000)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    app = create_app({'DATABASE': os.path.join(directory, 'bench_words.db'), 'TESTING': True})
+    app.db.init(app)
+    with app.app_context():
+      connection = app.db.get()
+      started = time.perf_counter()
+      large_id, small_id = seed_words(connection, args.words, args.scheduled_share, args.small_group)
+      print(f"Seeded {args.words:,} words in {time.perf_counter() - started:.1f}s")
+
+      cursor = connection.cursor()
+      for label, group_id in (('large', large_id), ('small', small_id)):
+        for limit in (10, 100):
+          timed(f'{label} group  limit={limit:<4} due only', args.repeat,
+                lambda: due_words(cursor, group_id, limit=limit, include_new=False))
+          timed(f'{label} group  limit={limit:<4} due + new', args.repeat,
+                lambda: due_words(cursor, group_id, limit=limit))
+      app.db.close()
+    app.review_queue.stop()
+    app.db.pool.close_all()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,72 @@
+# Measures throughput and peak Python memory of the streaming word exports
+# (/api/groups/<id>/words/export) for groups of growing size. Peak memory
+# should stay flat as the group grows.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_export [--sizes 10000 100000 1000000]
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from app import create_app
+
+def seed_group(connection, name, words):
+  connection.execute('INSERT INTO groups (name) VALUES (?)', (name,))
+  group_id = connection.execute('SELECT last_insert_rowid()').fetchone()[0]
+  first_id = (connection.execute('SELECT MAX(id) FROM words').fetchone()[0] or 0) + 1
+  connection.executemany(
+    'INSERT INTO words (english, spanish) VALUES (?, ?)',
+    ((f'word {n}', f'palabra {n}') for n in range(words))
+  )
+  connection.executemany(
+    'INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
+    ((word_id, group_id) for word_id in range(first_id, first_id + words))
+  )
+  connection.commit()
+  return group_id
+
+def stream(client, url):
+  # Reads the body chunk by chunk the way a WSGI server would send it
+  response = client.get(url, buffered=False)
+  size = 0
+  for chunk in response.response:
+    size += len(chunk)
+  response.close()
+  return size
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark streaming exports')
+  parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    app = create_app({'DATABASE': os.path.join(directory, 'bench_words.db'), 'TESTING': True})
+    app.db.init(app)
+    groups = []
+    with app.app_context():
+      connection = app.db.get()
+      for words in args.sizes:
+        groups.append((words, seed_group(connection, f'Export {words}', words)))
+      app.db.close()
+
+    client = app.test_client()
+    for words, group_id in groups:
+      for format in ('ndjson', 'csv'):
+        url = f'/api/groups/{group_id}/words/export?format={format}'
+        started = time.perf_counter()
+        size = stream(client, url)
+        seconds = time.perf_counter() - started
+        # tracemalloc slows every allocation down, so peak memory is taken
+        # from a second, untimed run
+        tracemalloc.start()
+        stream(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{words:>10,} words {format:<6} {size / 1e6:8.1f} MB  {words / seconds:>10,.0f} rows/s  peak {peak / 1e6:6.2f} MB")
+    app.review_queue.stop()
+    app.db.pool.close_all()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,64 @@
+# Measures review ingestion throughput through POST /api/study_sessions/<id>/review.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_review_ingest [--reviews 10000]
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+
+def build_app(directory):
+  app = create_app({'DATABASE': os.path.join(directory, 'bench_words.db'), 'TESTING': True})
+  app.db.init(app)
+  return app
+
+def new_session(client):
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  return response.get_json()['id']
+
+def random_reviews(word_ids, count):
+  return [{'word_id': random.choice(word_ids), 'correct': random.random() < 0.7} for _ in range(count)]
+
+def report(label, count, seconds):
+  print(f"{label:<28} {count:>7} reviews  {seconds:8.3f}s  {count / seconds:>10,.0f} reviews/sec")
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark bulk review ingestion')
+  parser.add_argument('--reviews', type=int, default=10000, help='Reviews per bulk request')
+  parser.add_argument('--single', type=int, default=500, help='Reviews posted one request at a time')
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    app = build_app(directory)
+    client = app.test_client()
+    with app.app_context():
+      word_ids = [row['id'] for row in app.db.cursor().execute('SELECT id FROM words').fetchall()]
+      app.db.close()
+
+    reviews = random_reviews(word_ids, args.reviews)
+
+    session_id = new_session(client)
+    started = time.perf_counter()
+    response = client.post(f'/api/study_sessions/{session_id}/review', json={'words': reviews})
+    report('JSON batch', response.get_json()['accepted'], time.perf_counter() - started)
+
+    session_id = new_session(client)
+    body = '\n'.join(json.dumps(review) for review in reviews)
+    started = time.perf_counter()
+    response = client.post(f'/api/study_sessions/{session_id}/review', data=body, content_type='application/x-ndjson')
+    report('NDJSON stream', response.get_json()['accepted'], time.perf_counter() - started)
+
+    session_id = new_session(client)
+    started = time.perf_counter()
+    for review in reviews[:args.single]:
+      client.post(f'/api/study_sessions/{session_id}/review', json=review)
+    report('One request per review', args.single, time.perf_counter() - started)
+
+    app.db.pool.close_all()
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,110 @@
+# Compares the session listing query in lib/session_summary.py with the
+# listing get_group_study_sessions used to run: two correlated subqueries over
+# word_review_items per session plus one datetime() round trip per session
+# without reviews.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_session_listing [--sessions 100000]
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+from lib.session_summary import list_sessions
+
+LEGACY_SORT_COLUMNS = {
+  'startTime': 'created_at',
+  'reviewItemsCount': 'review_count'
+}
+
+def legacy_group_sessions(cursor, group_id, sort_by, limit, offset):
+  sort_column = LEGACY_SORT_COLUMNS[sort_by]
+  cursor.execute(f'''
+    SELECT
+      s.id,
+      s.group_id,
+      s.study_activity_id,
+      s.created_at as start_time,
+      (
+        SELECT MAX(created_at)
+        FROM word_review_items
+        WHERE study_session_id = s.id
+      ) as last_activity_time,
+      a.name as activity_name,
+      g.name as group_name,
+      (
+        SELECT COUNT(*)
+        FROM word_review_items
+        WHERE study_session_id = s.id
+      ) as review_count
+    FROM study_sessions s
+    JOIN study_activities a ON s.study_activity_id = a.id
+    JOIN groups g ON s.group_id = g.id
+    WHERE s.group_id = ?
+    ORDER BY {sort_column} desc
+    LIMIT ? OFFSET ?
+  ''', (group_id, limit, offset))
+  sessions = []
+  for session in cursor.fetchall():
+    end_time = session['last_activity_time']
+    if not end_time:
+      end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session['start_time'],)).fetchone()[0]
+    sessions.append((session['id'], end_time, session['review_count']))
+  return sessions
+
+def seed_sessions(connection, sessions, reviews_per_session):
+  word_ids = [row[0] for row in connection.execute('SELECT id FROM words').fetchall()]
+  group_ids = [row[0] for row in connection.execute('SELECT id FROM groups').fetchall()]
+  connection.executemany(
+    'INSERT INTO study_sessions (group_id, study_activity_id, created_at) VALUES (?, 1, ?)',
+    [(random.choice(group_ids), f'2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} 10:00:00') for _ in range(sessions)]
+  )
+  # Roughly a third of the sessions have no reviews
+  session_ids = [row[0] for row in connection.execute('SELECT id FROM study_sessions').fetchall()]
+  reviewed = random.sample(session_ids, len(session_ids) * 2 // 3)
+  connection.executemany(
+    'INSERT INTO word_review_items (study_session_id, word_id, correct, created_at) VALUES (?, ?, ?, ?)',
+    ((session_id, random.choice(word_ids), random.random() < 0.7, '2025-06-01 10:10:00')
+     for session_id in reviewed for _ in range(reviews_per_session))
+  )
+  connection.commit()
+
+def timed(label, repeat, call):
+  started = time.perf_counter()
+  for _ in range(repeat):
+    call()
+  seconds = (time.perf_counter() - started) / repeat
+  print(f"{label:<44} {seconds * 1000:10.2f} ms/page")
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark study session listings')
+  parser.add_argument('--sessions', type=int, default=100000)
+  parser.add_argument('--reviews-per-session', type=int, default=3)
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    app = create_app({'DATABASE': os.path.join(directory, 'bench_words.db'), 'TESTING': True})
+    app.db.init(app)
+    with app.app_context():
+      connection = app.db.get()
+      started = time.perf_counter()
+      seed_sessions(connection, args.sessions, args.reviews_per_session)
+      print(f"Seeded {args.sessions:,} sessions in {time.perf_counter() - started:.1f}s")
+
+      cursor = connection.cursor()
+      group_id = connection.execute('SELECT group_id FROM study_sessions GROUP BY group_id ORDER BY COUNT(*) DESC').fetchone()[0]
+      for sort_by, sort_key in (('startTime', 'start_time'), ('reviewItemsCount', 'review_items_count')):
+        for page in (1, 100):
+          offset = (page - 1) * 10
+          timed(f'legacy   sort={sort_by:<16} page={page}', args.repeat,
+                lambda: legacy_group_sessions(cursor, group_id, sort_by, 10, offset))
+          timed(f'summary  sort={sort_by:<16} page={page}', args.repeat,
+                lambda: list_sessions(cursor, sort_by=sort_key, limit=10, offset=offset, group_id=group_id))
+      app.db.close()
+    app.db.pool.close_all()
+
+if __name__ == '__main__':
+  main()
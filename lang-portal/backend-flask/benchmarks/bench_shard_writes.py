@@ -0,0 +1,86 @@
+# Review write throughput with several server processes writing at once, all
+# for one learner (one shard file, one write lock) and then each for its own
+# learner (SHARD_DIRECTORY, lib/shards.py).
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_shard_writes [--processes 1,2,4,8 --batch 20 --seconds 5]
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+from benchmarks.generate_data import generate_database
+
+def write_reviews(database, shard_directory, learner_id, word_ids, batch, seconds, start, results):
+  app = create_app({
+    'DATABASE': database,
+    'DATABASE_POOL_SIZE': 1,
+    'REVIEW_JOURNAL': os.path.join(shard_directory, f'journal.{os.getpid()}.ndjson'),
+    'SHARD_DIRECTORY': shard_directory,
+    'TESTING': True
+  })
+  client = app.test_client()
+  headers = {'X-Learner-Id': learner_id}
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1}, headers=headers)
+  url = f"/api/study_sessions/{response.get_json()['id']}/review"
+  start.wait()
+  written = 0
+  deadline = time.perf_counter() + seconds
+  while time.perf_counter() < deadline:
+    body = {'words': [
+      {'word_id': random.choice(word_ids), 'correct': random.random() < 0.7}
+      for _ in range(batch)
+    ]}
+    if client.post(url, json=body, headers=headers).status_code == 200:
+      written += batch
+  results.put(written)
+  app.shards.close_all()
+  app.db.pool.close_all()
+
+def run(database, directory, processes, shared, batch, seconds, word_ids):
+  shard_directory = os.path.join(directory, f"{'shared' if shared else 'own'}-{processes}")
+  start = multiprocessing.Barrier(processes)
+  results = multiprocessing.Queue()
+  workers = [
+    multiprocessing.Process(target=write_reviews, args=(
+      database,
+      shard_directory,
+      'learner' if shared else f'learner-{index}',
+      word_ids,
+      batch,
+      seconds,
+      start,
+      results
+    ))
+    for index in range(processes)
+  ]
+  for worker in workers:
+    worker.start()
+  written = sum(results.get() for _ in workers)
+  for worker in workers:
+    worker.join()
+  return written / seconds
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark review writes with one shard against one shard per learner')
+  parser.add_argument('--words', type=int, default=20000)
+  parser.add_argument('--processes', default='1,2,4,8', help='Comma-separated writer process counts')
+  parser.add_argument('--batch', type=int, default=20, help='Reviews per request')
+  parser.add_argument('--seconds', type=float, default=5)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    database = os.path.join(directory, 'bench_words.db')
+    generated = generate_database(database, words=args.words, sessions=1, reviews=1)
+    word_ids = list(range(generated['first_word_id'], generated['first_word_id'] + args.words))
+    print(f"{'processes':>9}  {'one learner':>14}  {'own learner':>14}  scaling")
+    for processes in (int(count) for count in args.processes.split(',')):
+      shared = run(database, directory, processes, True, args.batch, args.seconds, word_ids)
+      own = run(database, directory, processes, False, args.batch, args.seconds, word_ids)
+      print(f"{processes:>9}  {shared:>12,.0f}/s  {own:>12,.0f}/s  {own / shared:6.2f}x")
+
+if __name__ == '__main__':
+  main()
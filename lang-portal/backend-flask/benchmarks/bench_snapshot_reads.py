@@ -0,0 +1,107 @@
+# Review write latency while reader threads hammer the dashboard and session
+# listings, with the listings read from the primary and then from the
+# READ_SNAPSHOT copy (lib/snapshot.py).
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_snapshot_reads [--sessions 50000 --reviews 2000000 --readers 8 --pool-size 5]
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from app import create_app
+from benchmarks.generate_data import generate_database
+
+READ_URLS = [
+  '/api/dashboard/stats',
+  '/api/dashboard/recent_session',
+  '/api/study_sessions?page=200',
+  '/api/groups/{group_id}/study_sessions?sort_by=review_items_count&order=desc&page=20',
+  '/api/study_activities/1/sessions?page=50'
+]
+
+def run(database, snapshot, ids, readers, pool_size, seconds):
+  app = create_app({
+    'DATABASE': database,
+    'DATABASE_POOL_SIZE': pool_size,
+    'REVIEW_JOURNAL': database + f'.{snapshot}.journal.ndjson',
+    'READ_SNAPSHOT': snapshot,
+    'TESTING': True
+  })
+  if snapshot:
+    started = time.perf_counter()
+    app.read_db.refresh()
+    print(f"Copied the database to the snapshot in {time.perf_counter() - started:.2f}s")
+  urls = [url.format(**ids) for url in READ_URLS]
+  stop = threading.Event()
+  reads = [0] * readers
+  write_samples = []
+
+  def read(index):
+    client = app.test_client()
+    while not stop.is_set():
+      client.get(random.choice(urls))
+      reads[index] += 1
+
+  def write():
+    client = app.test_client()
+    url = f"/api/study_sessions/{ids['session_id']}/review"
+    while not stop.is_set():
+      body = {'word_id': random.randint(ids['first_word_id'], ids['last_word_id']), 'correct': random.random() < 0.7}
+      started = time.perf_counter()
+      client.post(url, json=body)
+      write_samples.append(time.perf_counter() - started)
+
+  threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+  threads.append(threading.Thread(target=write))
+  for thread in threads:
+    thread.start()
+  time.sleep(seconds)
+  stop.set()
+  for thread in threads:
+    thread.join()
+
+  wal_size = os.path.getsize(database + '-wal') if os.path.exists(database + '-wal') else 0
+  write_samples.sort()
+  count = len(write_samples)
+  label = 'snapshot' if snapshot else 'primary'
+  print(
+    f"{label:<9} reads {sum(reads) / seconds:8,.0f}/s   writes {count / seconds:7,.0f}/s"
+    f"   write p50 {write_samples[count // 2] * 1000:6.2f} ms  p95 {write_samples[int(count * 0.95)] * 1000:6.2f} ms"
+    f"   max {write_samples[-1] * 1000:7.2f} ms   primary WAL {wal_size / 1024 / 1024:5.1f} MB"
+  )
+  print(f"{'':<9} write connection waits: {app.db.pool.stats()['waits']}")
+  if snapshot:
+    print(f"{'':<9} {app.read_db.refreshes} snapshot copies, {app.read_db.fallbacks} reads fell back to the primary")
+    app.read_db.stop()
+  app.review_queue.stop()
+  app.db.pool.close_all()
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark review writes against listing reads')
+  parser.add_argument('--words', type=int, default=100000)
+  parser.add_argument('--sessions', type=int, default=50000)
+  parser.add_argument('--reviews', type=int, default=2000000)
+  parser.add_argument('--readers', type=int, default=8)
+  parser.add_argument('--pool-size', type=int, default=5, help='Connections per pool, as DATABASE_POOL_SIZE')
+  parser.add_argument('--seconds', type=float, default=10)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    database = os.path.join(directory, 'bench_words.db')
+    started = time.perf_counter()
+    generated = generate_database(database, words=args.words, sessions=args.sessions, reviews=args.reviews)
+    print(f"Generated {args.words:,} words, {args.sessions:,} sessions, {args.reviews:,} reviews in {time.perf_counter() - started:.1f}s")
+    ids = {
+      'group_id': generated['first_group_id'],
+      'session_id': generated['first_session_id'],
+      'first_word_id': generated['first_word_id'],
+      'last_word_id': generated['first_word_id'] + args.words - 1
+    }
+    for snapshot in (False, True):
+      run(database, snapshot, ids, args.readers, args.pool_size, args.seconds)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,66 @@
+# Times word search (lib/search.py search_words, what /api/words/search runs
+# before its response cache) on a large generated vocabulary: autocomplete
+# prefixes of growing length, accent-free queries and substring matches.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.bench_word_search [--words 500000]
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from app import create_app
+from lib.search import fold, search_words
+
+SYLLABLES = ['ca', 'ma', 'lo', 'ri', 'to', 'pe', 'sa', 'ni', 'bra', 'tri', 'gu', 'hé', 'ár', 'ño', 'cio', 'lla']
+
+def made_up_word(rng):
+  return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+def seed_words(connection, words):
+  rng = random.Random(14)
+  pairs = ((f'{made_up_word(rng)} {made_up_word(rng)}', made_up_word(rng)) for _ in range(words))
+  connection.executemany(
+    'INSERT INTO words (english, spanish, english_folded, spanish_folded) VALUES (?, ?, ?, ?)',
+    ((english, spanish, fold(english), fold(spanish)) for english, spanish in pairs)
+  )
+  connection.commit()
+
+def timed(label, repeat, call):
+  call()
+  samples = []
+  for _ in range(repeat):
+    started = time.perf_counter()
+    call()
+    samples.append(time.perf_counter() - started)
+  samples.sort()
+  print(f"{label:<36} mean {sum(samples) / repeat * 1000:7.3f} ms  p99 {samples[int(repeat * 0.99) - 1] * 1000:7.3f} ms")
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark word search')
+  parser.add_argument('--words', type=int, default=500000)
+  parser.add_argument('--repeat', type=int, default=200)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    app = create_app({'DATABASE': os.path.join(directory, 'bench_words.db'), 'TESTING': True})
+    app.db.init(app)
+    with app.app_context():
+      connection = app.db.get()
+      started = time.perf_counter()
+      seed_words(connection, args.words)
+      print(f"Seeded {args.words:,} words in {time.perf_counter() - started:.1f}s")
+
+      cursor = connection.cursor()
+      for text in ('c', 'ca', 'cam', 'cama', 'camalo', 'arca', 'ca lo'):
+        timed(f'prefix     q={text!r}', args.repeat, lambda: search_words(cursor, text))
+      for text in ('malori', 'xyzzy'):
+        timed(f'substring  q={text!r}', args.repeat, lambda: search_words(cursor, text))
+      timed("field      q='ca' spanish", args.repeat, lambda: search_words(cursor, 'ca', field='spanish'))
+      app.db.close()
+    app.review_queue.stop()
+    app.db.pool.close_all()
+
+if __name__ == '__main__':
+  main()
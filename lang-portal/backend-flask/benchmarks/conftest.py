@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tracemalloc
+
+import pytest
+
+from app import create_app
+from benchmarks.generate_data import generate_database
+
+# Peak Python memory per benchmarked route, keyed by database scale. A route
+# fails its benchmark when it allocates more than MEMORY_TOLERANCE above its
+# baseline (plus MEMORY_SLACK_BYTES, so tiny routes don't fail on noise).
+# Rewrite the baselines with --save-memory-baseline.
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'memory.json')
+MEMORY_TOLERANCE = 0.25
+MEMORY_SLACK_BYTES = 64 * 1024
+
+measured_peaks = {}
+
+def pytest_addoption(parser):
+  group = parser.getgroup('lang-portal', 'lang-portal route benchmarks')
+  group.addoption('--bench-db', help='Database made by benchmarks/generate_data.py to run against (a copy is used)')
+  group.addoption('--bench-words', type=int, default=20000, help='Words to generate when --bench-db is not given')
+  group.addoption('--bench-sessions', type=int, default=2000, help='Study sessions to generate')
+  group.addoption('--bench-reviews', type=int, default=100000, help='Review items to generate')
+  group.addoption('--save-memory-baseline', action='store_true', help='Record peak memory per route as the new baseline')
+
+def database_scale(connection):
+  words, sessions, reviews = connection.execute('''
+    SELECT
+      (SELECT COUNT(*) FROM words),
+      (SELECT COUNT(*) FROM study_sessions),
+      (SELECT COUNT(*) FROM word_review_items)
+  ''').fetchone()
+  return f'{words}w-{sessions}s-{reviews}r'
+
+@pytest.fixture(scope='session')
+def bench_app(request, tmp_path_factory):
+  directory = tmp_path_factory.mktemp('bench')
+  path = str(directory / 'bench_words.db')
+  source = request.config.getoption('--bench-db')
+  if source:
+    shutil.copy(source, path)
+  else:
+    generate_database(
+      path,
+      words=request.config.getoption('--bench-words'),
+      sessions=request.config.getoption('--bench-sessions'),
+      reviews=request.config.getoption('--bench-reviews')
+    )
+  app = create_app({
+    'DATABASE': path,
+    'REVIEW_JOURNAL': str(directory / 'review_journal.ndjson'),
+    'TESTING': True
+  })
+  yield app
+  app.review_queue.stop()
+  app.db.pool.close_all()
+
+@pytest.fixture(scope='session')
+def bench_ids(bench_app):
+  # Ids the route URLs are filled in with: the largest generated group, and
+  # a word, session and activity from the generated data
+  with bench_app.app_context():
+    connection = bench_app.db.get()
+    group_id, group_name = connection.execute(
+      'SELECT id, name FROM groups ORDER BY words_count DESC, id LIMIT 1'
+    ).fetchone()
+    ids = {
+      'group_id': group_id,
+      'group_name': group_name,
+      'word_id': connection.execute('SELECT MAX(id) FROM words').fetchone()[0],
+      'session_id': connection.execute('SELECT MAX(study_session_id) FROM word_review_items').fetchone()[0],
+      'activity_id': connection.execute('SELECT MIN(id) FROM study_activities').fetchone()[0],
+      'scale': database_scale(connection)
+    }
+    bench_app.db.close()
+  return ids
+
+@pytest.fixture(scope='session')
+def bench_client(bench_app):
+  return bench_app.test_client()
+
+@pytest.fixture(scope='session')
+def memory_baselines():
+  if not os.path.exists(BASELINE_PATH):
+    return {}
+  with open(BASELINE_PATH) as file:
+    return json.load(file)
+
+def request_peak(client, method, url, **kwargs):
+  # Peak Python allocations while serving one request, with the body read
+  # chunk by chunk as a server would send it. A first, unmeasured request
+  # loads whatever the route caches, so the peak doesn't depend on which
+  # benchmarks ran before it.
+  client.open(url, method=method, **kwargs)
+  tracemalloc.start()
+  try:
+    response = client.open(url, method=method, buffered=False, **kwargs)
+    for _ in response.response:
+      pass
+    response.close()
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+@pytest.fixture
+def memory_check(request, bench_client, bench_ids, memory_baselines):
+  def check(method, url, **kwargs):
+    peak = request_peak(bench_client, method, url, **kwargs)
+    name = request.node.name
+    measured_peaks.setdefault(bench_ids['scale'], {})[name] = peak
+    baseline = memory_baselines.get(bench_ids['scale'], {}).get(name)
+    if baseline is not None and not request.config.getoption('--save-memory-baseline'):
+      limit = baseline * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_BYTES
+      if peak > limit:
+        pytest.fail(f"{name} peaked at {peak:,} bytes, baseline {baseline:,} (limit {limit:,.0f})")
+    return peak
+  return check
+
+def pytest_sessionfinish(session):
+  if not session.config.getoption('--save-memory-baseline', default=False) or not measured_peaks:
+    return
+  baselines = {}
+  if os.path.exists(BASELINE_PATH):
+    with open(BASELINE_PATH) as file:
+      baselines = json.load(file)
+  for scale, peaks in measured_peaks.items():
+    baselines.setdefault(scale, {}).update(peaks)
+  os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+  with open(BASELINE_PATH, 'w') as file:
+    json.dump(baselines, file, indent=2, sort_keys=True)
+    file.write('\n')
@@ -0,0 +1,130 @@
+# Builds a lang-portal database at production scale for benchmarking.
+#
+# The database is created the way the app creates one (Db.init: sql/setup,
+# migrations and the seed data), then filled with generated words, groups,
+# study sessions and review items. Rows are generated inside SQLite with
+# recursive CTEs, a chunk per transaction, and go through the same triggers
+# as real writes, so word_reviews, the review rollups, group word counts and
+# the search indexes are all populated. Spaced repetition schedules are
+# written by the review routes, not by triggers, so generated reviews leave
+# every word unscheduled.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.generate_data bench.db --words 1000000 --reviews 50000000
+#   invoke generate-data bench.db --words 1000000 --reviews 50000000
+import argparse
+import os
+import time
+
+from app import create_app
+from lib.search import fold_words
+
+GENERATE_CHUNK_SIZE = 100000
+
+SERIES = '''
+  WITH RECURSIVE series(i) AS (
+    SELECT ? UNION ALL SELECT i + 1 FROM series WHERE i < ?
+  )
+'''
+
+def insert_in_chunks(connection, label, total, statement, params=(), progress=None):
+  # statement is run once per chunk with (first, last, *params); i runs
+  # from first to last inclusive
+  started = time.perf_counter()
+  for first in range(0, total, GENERATE_CHUNK_SIZE):
+    last = min(first + GENERATE_CHUNK_SIZE, total) - 1
+    connection.execute(SERIES + statement, (first, last, *params))
+    connection.commit()
+    if progress:
+      progress(label, last + 1, total, time.perf_counter() - started)
+
+def id_range(connection, table, count):
+  # The ids of the count rows just appended to table
+  last = connection.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+  return last - count + 1, last
+
+def generate_database(path, words=100000, groups=20, sessions=10000, reviews=1000000, progress=None):
+  if os.path.exists(path):
+    raise FileExistsError(f"{path} already exists")
+  app = create_app({'DATABASE': path, 'REVIEW_JOURNAL': path + '.journal.ndjson', 'TESTING': True})
+  app.db.init(app)
+  try:
+    with app.db.pool.connection() as connection:
+      # Groups, each holding an equal share of the generated words
+      insert_in_chunks(connection, 'groups', groups, """
+        INSERT INTO groups (name)
+        SELECT 'Generated group ' || (i + 1) FROM series
+      """, progress=progress)
+      first_group, _ = id_range(connection, 'groups', groups)
+
+      insert_in_chunks(connection, 'words', words, """
+        INSERT INTO words (english, spanish)
+        SELECT 'word ' || i || ' ' || hex(randomblob(2)), 'palabra ' || i || ' ' || hex(randomblob(2)) FROM series
+      """, progress=progress)
+      first_word, _ = id_range(connection, 'words', words)
+      # The substring search index reads these columns
+      fold_words(connection)
+
+      insert_in_chunks(connection, 'word_groups', words, """
+        INSERT INTO word_groups (word_id, group_id)
+        SELECT ? + i, ? + i % ? FROM series
+      """, (first_word, first_group, groups), progress=progress)
+
+      # Sessions over the past year, in a random group and study activity
+      activities = [row[0] for row in connection.execute('SELECT id FROM study_activities ORDER BY id')]
+      insert_in_chunks(connection, 'study_sessions', sessions, """
+        INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+        SELECT
+          ? + abs(random()) % ?,
+          ? + abs(random()) % ?,
+          datetime('now', '-' || (abs(random()) % 525600) || ' minutes')
+        FROM series
+      """, (first_group, groups, activities[0], len(activities)), progress=progress)
+      first_session, _ = id_range(connection, 'study_sessions', sessions)
+
+      # Reviews of random words in random sessions, 70% correct, timed
+      # within half an hour of the session start
+      insert_in_chunks(connection, 'word_review_items', reviews, """
+        INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+        SELECT
+          picked.session_id,
+          picked.word_id,
+          abs(random()) % 10 < 7,
+          datetime(ss.created_at, '+' || (picked.i % 1800) || ' seconds')
+        FROM (
+          SELECT i, ? + abs(random()) % ? AS session_id, ? + abs(random()) % ? AS word_id FROM series
+        ) picked
+        JOIN study_sessions ss ON ss.id = picked.session_id
+      """, (first_session, sessions, first_word, words), progress=progress)
+
+      connection.execute('PRAGMA optimize')
+  finally:
+    app.review_queue.stop()
+    app.db.pool.close_all()
+  return {
+    'words': words,
+    'groups': groups,
+    'sessions': sessions,
+    'reviews': reviews,
+    'first_word_id': first_word,
+    'first_group_id': first_group,
+    'first_session_id': first_session
+  }
+
+def print_progress(label, done, total, seconds):
+  print(f"{label:<18} {done:>12,} / {total:<12,} {done / max(seconds, 1e-9):>10,.0f} rows/sec")
+
+def main():
+  parser = argparse.ArgumentParser(description='Generate a lang-portal database for benchmarks')
+  parser.add_argument('path', help='Database file to create (must not exist)')
+  parser.add_argument('--words', type=int, default=100000)
+  parser.add_argument('--groups', type=int, default=20)
+  parser.add_argument('--sessions', type=int, default=10000)
+  parser.add_argument('--reviews', type=int, default=1000000)
+  args = parser.parse_args()
+  started = time.perf_counter()
+  generate_database(args.path, args.words, args.groups, args.sessions, args.reviews, progress=print_progress)
+  print(f"Generated {args.path} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,167 @@
+# Load test for the API servers: requests/sec and latency percentiles for a
+# mix of reads and review submissions.
+#
+# Run from the backend-flask directory:
+#   python -m benchmarks.load_test                      # sync dev server, then ASGI
+#   python -m benchmarks.load_test --server asgi --workers 4 --threads 8
+#   python -m benchmarks.load_test --url http://localhost:5000   # an already running server
+#
+# sync is Flask's threaded development server (what `python app.py` runs,
+# without the debugger); asgi is uvicorn serving asgi:application. Each run
+# uses a fresh copy of the seeded database. The client is a pool of threads
+# with one keep-alive connection each, so on a single machine it competes
+# with the server for CPU; compare servers under the same settings.
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+from app import create_app
+
+READ_PATHS = [
+  '/api/words?page={page}',
+  '/api/words/{word_id}',
+  '/api/groups',
+  '/api/groups/1/words/raw',
+  '/api/groups/1/study_sessions',
+  '/api/study_sessions',
+  '/api/dashboard/stats',
+  '/api/study_activities',
+]
+
+def build_database(directory):
+  path = os.path.join(directory, 'load_words.db')
+  app = create_app({'DATABASE': path, 'REVIEW_JOURNAL': os.path.join(directory, 'setup_journal.ndjson')})
+  app.db.init(app)
+  client = app.test_client()
+  session_id = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['id']
+  app.review_queue.stop()
+  app.db.pool.close_all()
+  return path, session_id
+
+def start_server(kind, port, database, directory, workers, threads):
+  env = dict(
+    os.environ,
+    FLASK_DATABASE=json.dumps(database),
+    FLASK_REVIEW_JOURNAL=json.dumps(os.path.join(directory, 'review_journal.ndjson')),
+    FLASK_ASGI_THREADS=str(threads),
+    FLASK_DATABASE_POOL_SIZE=str(threads)
+  )
+  if kind == 'sync':
+    command = [sys.executable, '-c', f'from app import app; app.run(port={port}, threaded=True)']
+  else:
+    command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning']
+  process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+  deadline = time.monotonic() + 30
+  while time.monotonic() < deadline:
+    try:
+      connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+      connection.request('GET', '/api/study_activities')
+      if connection.getresponse().status == 200:
+        return process
+    except OSError:
+      time.sleep(0.2)
+  process.kill()
+  raise RuntimeError(f"{kind} server did not start on port {port}")
+
+def run_load(base_url, session_id, concurrency, duration, write_ratio):
+  target = urlparse(base_url)
+  latencies = []
+  errors = [0]
+  lock = threading.Lock()
+  deadline = time.monotonic() + duration
+
+  def worker():
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    local = []
+    failed = 0
+    while time.monotonic() < deadline:
+      if random.random() < write_ratio:
+        method = 'POST'
+        path = f'/api/study_sessions/{session_id}/review'
+        body = json.dumps({'word_id': random.randint(1, 100), 'correct': random.random() < 0.7})
+        headers = {'Content-Type': 'application/json'}
+      else:
+        method = 'GET'
+        path = random.choice(READ_PATHS).format(page=random.randint(1, 5), word_id=random.randint(1, 100))
+        body = None
+        headers = {}
+      started = time.perf_counter()
+      try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.status >= 500:
+          failed += 1
+      except (OSError, http.client.HTTPException):
+        failed += 1
+        connection.close()
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+        continue
+      local.append(time.perf_counter() - started)
+    with lock:
+      latencies.extend(local)
+      errors[0] += failed
+
+  threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+  started = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  elapsed = time.perf_counter() - started
+  return latencies, errors[0], elapsed
+
+def percentile(values, fraction):
+  if not values:
+    return 0
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def report(label, latencies, errors, elapsed):
+  print(
+    f"{label:<24} {len(latencies) / elapsed:>9,.0f} req/s  "
+    f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms  "
+    f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+    f"errors {errors}"
+  )
+
+def main():
+  parser = argparse.ArgumentParser(description='Load test the lang-portal API')
+  parser.add_argument('--server', choices=['sync', 'asgi', 'both'], default='both')
+  parser.add_argument('--url', help='Load an already running server instead of starting one')
+  parser.add_argument('--session-id', type=int, default=1, help='Study session reviews are posted to with --url')
+  parser.add_argument('--workers', type=int, default=1, help='ASGI worker processes')
+  parser.add_argument('--threads', type=int, default=8, help='Request threads (and pooled connections) per process')
+  parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client connections')
+  parser.add_argument('--duration', type=float, default=10, help='Seconds of load per server')
+  parser.add_argument('--write-ratio', type=float, default=0.1, help='Share of requests that submit a review')
+  parser.add_argument('--port', type=int, default=5055)
+  args = parser.parse_args()
+
+  if args.url:
+    report(args.url, *run_load(args.url, args.session_id, args.concurrency, args.duration, args.write_ratio))
+    return
+
+  kinds = ['sync', 'asgi'] if args.server == 'both' else [args.server]
+  for kind in kinds:
+    with tempfile.TemporaryDirectory() as directory:
+      database, session_id = build_database(directory)
+      process = start_server(kind, args.port, database, directory, args.workers, args.threads)
+      try:
+        label = kind if kind == 'sync' else f'asgi ({args.workers}x{args.threads})'
+        report(label, *run_load(f'http://127.0.0.1:{args.port}', session_id, args.concurrency, args.duration, args.write_ratio))
+      finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,89 @@
+# Latency and memory benchmarks for every route in routes/*.py, run against a
+# generated database (see benchmarks/conftest.py for the options).
+#
+# Run from the backend-flask directory:
+#   pytest benchmarks --benchmark-autosave                  # record a latency baseline
+#   pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:25%
+#   pytest benchmarks --bench-db bench.db                   # a database from generate_data.py
+#
+# The response cache is cleared before every timed call, so each read route
+# is measured running its own queries; routes behind app.response_cache are
+# timed again as cache hits by test_cached_read_route. POST
+# /api/study_sessions/reset is
+# left out because it deletes the data the other benchmarks read, and
+# /api/_debug/queries because it needs QUERY_PROFILING.
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+READ_ROUTES = [
+  ('words', '/api/words?page=50'),
+  ('words_keyset', '/api/words?cursor='),
+  ('words_by_group', '/api/words?group={group_name}&page=5'),
+  ('word', '/api/words/{word_id}'),
+  ('word_search', '/api/words/search?q=palabra%2012'),
+  ('words_export', '/api/words/export'),
+  ('groups', '/api/groups'),
+  ('groups_by_count', '/api/groups?sort_by=words_count&order=desc'),
+  ('group', '/api/groups/{group_id}'),
+  ('group_words', '/api/groups/{group_id}/words?page=20'),
+  ('group_words_raw', '/api/groups/{group_id}/words/raw'),
+  ('group_words_export', '/api/groups/{group_id}/words/export?format=csv'),
+  ('group_due', '/api/groups/{group_id}/due?limit=20'),
+  ('group_sessions', '/api/groups/{group_id}/study_sessions?page=5'),
+  ('study_sessions', '/api/study_sessions?page=50'),
+  ('study_session', '/api/study_sessions/{session_id}'),
+  ('session_reviews_export', '/api/study_sessions/reviews/export?study_session_id={session_id}'),
+  ('reviews_export', '/api/study_sessions/reviews/export'),
+  ('study_activities', '/api/study_activities'),
+  ('study_activity', '/api/study_activities/{activity_id}'),
+  ('study_activity_sessions', '/api/study_activities/{activity_id}/sessions'),
+  ('study_activity_launch', '/api/study_activities/{activity_id}/launch'),
+  ('dashboard_recent_session', '/api/dashboard/recent_session'),
+  ('dashboard_stats', '/api/dashboard/stats'),
+]
+
+# Routes whose views are wrapped in app.response_cache.cached
+CACHED_ROUTES = [
+  (name, url) for name, url in READ_ROUTES
+  if name in ('word', 'word_search', 'groups', 'groups_by_count', 'group_words_raw', 'study_activities')
+]
+
+READ_ROUNDS = 50
+
+@pytest.mark.parametrize('url', [url for _, url in READ_ROUTES], ids=[name for name, _ in READ_ROUTES])
+def test_read_route(benchmark, bench_app, bench_client, bench_ids, memory_check, url):
+  url = url.format(**bench_ids)
+  bench_app.response_cache.clear()
+  memory_check('GET', url)
+  response = benchmark.pedantic(
+    bench_client.get, args=(url,), setup=bench_app.response_cache.clear, rounds=READ_ROUNDS, warmup_rounds=1
+  )
+  assert response.status_code == 200, response.get_data(as_text=True)
+
+@pytest.mark.parametrize('url', [url for _, url in CACHED_ROUTES], ids=[name for name, _ in CACHED_ROUTES])
+def test_cached_read_route(benchmark, bench_client, bench_ids, url):
+  url = url.format(**bench_ids)
+  bench_client.get(url)
+  response = benchmark(bench_client.get, url)
+  assert response.status_code == 200, response.get_data(as_text=True)
+
+def test_create_study_session(benchmark, bench_client, bench_ids, memory_check):
+  body = {'group_id': bench_ids['group_id'], 'study_activity_id': bench_ids['activity_id']}
+  memory_check('POST', '/api/study_sessions', json=body)
+  response = benchmark(bench_client.post, '/api/study_sessions', json=body)
+  assert response.status_code == 201
+
+@pytest.mark.parametrize('path,reviews,status', [
+  ('review', 1, 200),
+  ('review', 100, 200),
+  ('review_log', 100, 202)
+], ids=['review', 'review_batch', 'review_log'])
+def test_submit_reviews(benchmark, bench_client, bench_ids, memory_check, path, reviews, status):
+  url = f"/api/study_sessions/{bench_ids['session_id']}/{path}"
+  body = {'words': [
+    {'word_id': bench_ids['word_id'] - n, 'correct': n % 3 != 0} for n in range(reviews)
+  ]}
+  memory_check('POST', url, json=body)
+  response = benchmark(bench_client.post, url, json=body)
+  assert response.status_code == status
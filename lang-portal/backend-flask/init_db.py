@@ -2,6 +2,9 @@ import sqlite3
 import json
 import os
 
+from lib.importer import import_vocab
+from lib.migrations import migrate
+
 def init_db():
     # Remove existing database if it exists
     if os.path.exists('words.db'):
@@ -109,41 +112,21 @@ def init_db():
                   ('All Words', 'Combined collection of all Spanish words', 0))
     all_words_group_id = cursor.lastrowid
 
-    # Load and insert adjectives
+    # Bring the schema up to date (indexes, rollup triggers) from sql/migrations
+    # before loading data, so the bulk importer can deduplicate through the
+    # words index and the triggers keep word_reviews and the rollups current
+    conn.commit()
+    migrate(conn)
+
+    # Load adjectives and verbs with the bulk importer; every word also joins
+    # the All Words group; the word_groups triggers keep group word counts
     with open('seed/data_adjectives.json', 'r') as f:
         adjectives = json.load(f)
-        for adj in adjectives:
-            cursor.execute('INSERT INTO words (english, spanish) VALUES (?, ?)',
-                         (adj['english'], adj['spanish']))
-            word_id = cursor.lastrowid
-            # Associate with adjectives group
-            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
-                         (word_id, adj_group_id))
-            # Also associate with All Words group
-            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
-                         (word_id, all_words_group_id))
-    
-    # Load and insert verbs
+    import_vocab(conn, adjectives, groups=['Adjectives', 'All Words'])
+
     with open('seed/data_verbs.json', 'r') as f:
         verbs = json.load(f)
-        for verb in verbs:
-            cursor.execute('INSERT INTO words (english, spanish) VALUES (?, ?)',
-                         (verb['english'], verb['spanish']))
-            word_id = cursor.lastrowid
-            # Associate with verbs group
-            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
-                         (word_id, verb_group_id))
-            # Also associate with All Words group
-            cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)',
-                         (word_id, all_words_group_id))
-
-    # Update word counts for each group
-    cursor.execute('UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = ?) WHERE id = ?', 
-                  (adj_group_id, adj_group_id))
-    cursor.execute('UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = ?) WHERE id = ?', 
-                  (verb_group_id, verb_group_id))
-    cursor.execute('UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = ?) WHERE id = ?', 
-                  (all_words_group_id, all_words_group_id))
+    import_vocab(conn, verbs, groups=['Verbs', 'All Words'])
 
     # Load and insert study activities
     with open('seed/study_activities.json', 'r') as f:
@@ -188,25 +171,18 @@ def init_db():
                 VALUES (?, ?, ?, ?)
                 ''', (session_id, review['word_id'], review['correct'], session['created_at']))
 
-    # Update word_reviews table based on the review items
-    cursor.execute('''
-    INSERT OR REPLACE INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
-    SELECT 
-        word_id,
-        SUM(CASE WHEN correct THEN 1 ELSE 0 END) as correct_count,
-        SUM(CASE WHEN NOT correct THEN 1 ELSE 0 END) as wrong_count,
-        MAX(created_at) as last_reviewed
-    FROM word_review_items
-    GROUP BY word_id
-    ''')
+    # word_reviews and the review rollups are maintained by the triggers on
+    # word_review_items
+    cursor.execute('SELECT id, words_count FROM groups')
+    words_counts = dict(cursor.fetchall())
 
     conn.commit()
     conn.close()
     
     print("Database initialized successfully with:")
-    print(f"- Adjectives group: {len(adjectives)} words")
-    print(f"- Verbs group: {len(verbs)} words")
-    print(f"- All Words group: {len(adjectives) + len(verbs)} words")
+    print(f"- Adjectives group: {words_counts[adj_group_id]} words")
+    print(f"- Verbs group: {words_counts[verb_group_id]} words")
+    print(f"- All Words group: {words_counts[all_words_group_id]} words")
     print(f"- Fixed Writing Practice session created with ID 1 and group ID {all_words_group_id}")
 
 if __name__ == '__main__':
@@ -1,30 +1,200 @@
 import sqlite3
 import json
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from flask import g
 
+from lib.importer import import_vocab
+from lib.migrations import migrate
+from lib.search import fold_words
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every pooled connection. WAL lets readers run alongside
+# the single writer instead of queueing behind the rollback journal lock.
+CONNECTION_PRAGMAS = (
+  'PRAGMA journal_mode=WAL',
+  'PRAGMA synchronous=NORMAL',
+  'PRAGMA cache_size=-20000',    # ~20MB page cache per connection
+  'PRAGMA mmap_size=268435456',  # 256MB memory-mapped I/O
+  'PRAGMA temp_store=MEMORY',
+  'PRAGMA busy_timeout=5000',
+)
+
+class PoolTimeout(Exception):
+  pass
+
+class ConnectionPool:
+  def __init__(self, database, size=5, timeout=30, statement_cache_size=256, uri=False, pragmas=CONNECTION_PRAGMAS):
+    self.database = database
+    self.uri = uri
+    self.pragmas = pragmas
+    self.size = size
+    self.timeout = timeout
+    self.statement_cache_size = statement_cache_size
+    self._idle = queue.LifoQueue()
+    self._lock = threading.Lock()
+    self._retired = False
+    self._opened = 0
+    self._in_use = 0
+    self._checkouts = 0
+    self._waits = 0
+    self._wait_total = 0.0
+    self._wait_max = 0.0
+
+  def _connect(self):
+    # check_same_thread is off because a connection may be handed to a
+    # different thread on its next checkout; the pool guarantees only one
+    # thread holds it at a time.
+    connection = sqlite3.connect(
+      self.database,
+      check_same_thread=False,
+      cached_statements=self.statement_cache_size,
+      uri=self.uri
+    )
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    for pragma in self.pragmas:
+      connection.execute(pragma)
+    return connection
+
+  def checkout(self):
+    started = time.perf_counter()
+    connection = None
+    try:
+      connection = self._idle.get_nowait()
+    except queue.Empty:
+      with self._lock:
+        if self._opened < self.size:
+          self._opened += 1
+          connection = False  # open outside the lock
+    if connection is False:
+      try:
+        connection = self._connect()
+      except Exception:
+        with self._lock:
+          self._opened -= 1
+        raise
+    elif connection is None:
+      try:
+        connection = self._idle.get(timeout=self.timeout)
+      except queue.Empty:
+        raise PoolTimeout(f"No database connection available after {self.timeout}s (pool size {self.size})")
+    waited = time.perf_counter() - started
+    with self._lock:
+      self._in_use += 1
+      self._checkouts += 1
+      self._wait_total += waited
+      self._wait_max = max(self._wait_max, waited)
+      if waited > 0.01:
+        self._waits += 1
+    if waited > 0.1:
+      logger.warning("Waited %.1fms for a database connection (pool size %d)", waited * 1000, self.size)
+    return connection
+
+  def checkin(self, connection):
+    # Never hand an open transaction to the next request
+    if connection.in_transaction:
+      connection.rollback()
+    with self._lock:
+      self._in_use -= 1
+      retired = self._retired
+    if retired:
+      connection.close()
+      with self._lock:
+        self._opened -= 1
+      return
+    self._idle.put(connection)
+
+  @contextmanager
+  def connection(self):
+    connection = self.checkout()
+    try:
+      yield connection
+    finally:
+      self.checkin(connection)
+
+  def close_all(self):
+    while True:
+      try:
+        connection = self._idle.get_nowait()
+      except queue.Empty:
+        break
+      connection.close()
+      with self._lock:
+        self._opened -= 1
+
+  def retire(self):
+    # Closes the idle connections now and the rest as they are checked in
+    with self._lock:
+      self._retired = True
+    self.close_all()
+
+  def stats(self):
+    with self._lock:
+      return {
+        'size': self.size,
+        'open': self._opened,
+        'in_use': self._in_use,
+        'checkouts': self._checkouts,
+        'waits': self._waits,
+        'wait_avg_ms': (self._wait_total / self._checkouts * 1000) if self._checkouts else 0,
+        'wait_max_ms': self._wait_max * 1000
+      }
+
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=5, pool_timeout=30):
     self.database = database
-    self.connection = None
+    self.pool = ConnectionPool(database, size=pool_size, timeout=pool_timeout)
+    # Set to a lib.query_profiler.QueryProfiler to time statements run
+    # through cursor()
+    self.profiler = None
+    # Set to a lib.shards.ShardRouter to give requests that selected a
+    # learner shard a connection to it instead of the primary (to the
+    # read-only empty shard for a learner that has none yet)
+    self.shards = None
+
+  def request_pool(self):
+    shard = g.get('shard')
+    if shard is not None and self.shards is not None:
+      return self.shards.pool(shard)
+    return self.pool
+
+  def dedicated_connection(self):
+    # A connection of its own, outside the pool, for the request's database;
+    # for work that outlives the request such as streaming exports. The
+    # caller closes it.
+    return self.request_pool()._connect()
 
   def get(self):
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      g.db_pool = self.request_pool()
+      g.db = g.db_pool.checkout()
     return g.db
 
   def commit(self):
     self.get().commit()
 
+  def rollback(self):
+    self.get().rollback()
+
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
     connection = self.get()
+    if self.profiler is not None:
+      return self.profiler.cursor(connection)
     return connection.cursor()
 
   def close(self):
+    # Return the connection to the pool rather than closing it
+    if self.profiler is not None:
+      self.profiler.finish_request()
     db = g.pop('db', None)
+    pool = g.pop('db_pool', self.pool)
     if db is not None:
-      db.close()
+      pool.checkin(db)
 
   # Function to load SQL from a file
   def sql(self, filepath):
@@ -59,6 +229,13 @@ class Db:
     cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
     self.get().commit()
 
+  # Apply any pending migrations from sql/migrations
+  def migrate(self, verbose=False):
+    applied = migrate(self.get(), verbose=verbose)
+    # Fold words other tools wrote without the search columns
+    fold_words(self.get())
+    return applied
+
   def import_study_activities_json(self,cursor,data_json_path):
     study_actvities = self.load_json(data_json_path)
     for activity in study_actvities:
@@ -68,52 +245,19 @@ class Db:
     self.get().commit()
 
   def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
+      # Words already present (same english and spanish) are linked to the
+      # group instead of being inserted again
       words = self.load_json(data_json_path)
+      result = import_vocab(self.get(), words, groups=[group_name])
 
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (english, spanish) VALUES (?, ?)
-        ''', (word['english'], word['spanish']))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
-
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
-
-      # Update the words_count in the groups table by counting all words in the group
-      cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
-
-      self.get().commit()
-
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+      print(f"Successfully added {result['links_added']} words to the '{group_name}' group ({result['words_added']} new).")
 
   # Initialize the database with sample data
   def init(self, app):
     with app.app_context():
       cursor = self.cursor()
       self.setup_tables(cursor)
+      self.migrate()
       self.import_word_json(
         cursor=cursor,
         group_name='Core Verbs',
@@ -129,6 +273,7 @@ class Db:
         cursor=cursor,
         data_json_path='seed/study_activities.json'
       )
+      self.close()
 
 # Create an instance of the Db class
 db = Db()
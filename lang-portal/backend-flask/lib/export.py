@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import threading
+
+from flask import current_app, jsonify
+
+# Streaming exports. The export query runs on a connection of its own and
+# the rows are then read from the cursor EXPORT_CHUNK_SIZE at a time and
+# written out as each chunk is encoded, so memory use does not depend on how
+# many rows there are. The response has no Content-Length and goes out with
+# chunked transfer encoding.
+#
+# A stream lasts as long as the client takes to read it and keeps a WAL read
+# transaction open throughout, so exports never hold a connection from the
+# request pool, and at most EXPORT_MAX_CONCURRENT stream at once per process
+# (more get a 503) to bound how long checkpoints can be held back.
+#
+# Routes flush the review log before running an export query, so the rows
+# come from one snapshot that includes every acknowledged review.
+#
+# Export queries should be ordered by an index (or not at all): an ORDER BY
+# SQLite has to sort makes it collect every row before returning the first.
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MAX_CONCURRENT = 2
+EXPORT_RETRY_AFTER = 5  # Seconds suggested to a client turned away
+
+EXPORT_FORMATS = {
+  'ndjson': 'application/x-ndjson',
+  'csv': 'text/csv'
+}
+
+def export_format(value):
+  # Returns the requested format, or None if it is not supported
+  value = (value or 'ndjson').lower()
+  return value if value in EXPORT_FORMATS else None
+
+# One encoder for every row rather than a new one per json.dumps call
+encode_json = json.JSONEncoder(ensure_ascii=False).encode
+
+def encode_ndjson(columns, rows):
+  return ''.join(encode_json(dict(zip(columns, row))) + '\n' for row in rows)
+
+def encode_csv(rows):
+  buffer = io.StringIO()
+  csv.writer(buffer).writerows(rows)
+  return buffer.getvalue()
+
+def iter_export(cursor, format, chunk_size=EXPORT_CHUNK_SIZE):
+  columns = [column[0] for column in cursor.description]
+  if format == 'csv':
+    yield encode_csv([columns])
+  while True:
+    rows = cursor.fetchmany(chunk_size)
+    if not rows:
+      break
+    yield encode_csv(rows) if format == 'csv' else encode_ndjson(columns, rows)
+
+class Exports:
+  def __init__(self, db, max_concurrent=EXPORT_MAX_CONCURRENT):
+    self.db = db
+    self._slots = threading.BoundedSemaphore(max_concurrent)
+
+  def response(self, format, filename, sql, params=()):
+    if not self._slots.acquire(blocking=False):
+      response = jsonify({"error": "Too many exports in progress, try again shortly"})
+      response.status_code = 503
+      response.headers['Retry-After'] = str(EXPORT_RETRY_AFTER)
+      return response
+    try:
+      connection = self.db.dedicated_connection()
+    except Exception:
+      self._slots.release()
+      raise
+
+    # Called when the last chunk is sent and again when the server closes
+    # the response, which also covers clients that go away mid-stream
+    once = threading.Lock()
+    def finish():
+      if once.acquire(blocking=False):
+        connection.close()
+        self._slots.release()
+
+    try:
+      cursor = connection.execute(sql, params)
+    except Exception:
+      finish()
+      raise
+
+    def stream():
+      try:
+        yield from iter_export(cursor, format)
+      finally:
+        finish()
+
+    response = current_app.response_class(stream(), mimetype=EXPORT_FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{format}"'
+    response.call_on_close(finish)
+    return response
@@ -0,0 +1,26 @@
+# Consistency check for groups.words_count, which the triggers from
+# sql/migrations/0009_group_word_counts.sql keep equal to the number of
+# word_groups rows of each group.
+
+def group_count_drift(connection):
+  # Returns (group_id, name, stored, actual) for every group whose stored
+  # count is wrong. One pass over idx_word_groups_group_id.
+  return connection.execute('''
+    SELECT g.id, g.name, g.words_count, COALESCE(c.actual, 0) AS actual
+    FROM groups g
+    LEFT JOIN (
+      SELECT group_id, COUNT(*) AS actual FROM word_groups GROUP BY group_id
+    ) c ON c.group_id = g.id
+    WHERE g.words_count IS NOT COALESCE(c.actual, 0)
+    ORDER BY g.id
+  ''').fetchall()
+
+def repair_group_counts(connection):
+  # Rewrites the counts of drifted groups; returns the drift it fixed
+  drift = group_count_drift(connection)
+  connection.executemany(
+    'UPDATE groups SET words_count = ? WHERE id = ?',
+    [(actual, group_id) for group_id, _, _, actual in drift]
+  )
+  connection.commit()
+  return drift
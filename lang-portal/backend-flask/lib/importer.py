@@ -0,0 +1,309 @@
+import csv
+import itertools
+import json
+import os
+import re
+import time
+
+from lib.reviews import chunked, iter_ndjson
+from lib.search import fold
+
+# Rows written per transaction by the bulk vocabulary importer
+IMPORT_CHUNK_SIZE = 10000
+
+# Indexes the importer itself reads to deduplicate words and links. Every
+# other non-unique index on words/word_groups can be dropped for the length
+# of a large import and rebuilt once at the end.
+IMPORT_LOOKUP_INDEXES = ('idx_words_english_spanish', 'idx_word_groups_word_id')
+
+# Invalid rows reported back in detail; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+# Longest partial token a buffer can end in without the decoder seeing the
+# buffer's end: a literal such as "fals" or a "\uXXX" escape
+JSON_PARTIAL_TOKEN = 6
+
+def iter_json_array(file, buffer_size=1 << 20):
+  # Decodes a top-level JSON array one element at a time, so a large file is
+  # never loaded whole. More is read only when an element may have been cut
+  # off by the end of the buffer; any other decode error is reported at once.
+  decoder = json.JSONDecoder()
+  buffer = file.read(buffer_size).lstrip()
+  if not buffer.startswith('['):
+    raise ValueError("Expected a JSON array of words")
+  position = 1
+  offset = 0  # of buffer[0] in the stripped file
+  index = 0
+  eof = False
+  while True:
+    position = JSON_SEPARATORS.match(buffer, position).end()
+    if position < len(buffer) and buffer[position] == ']':
+      return
+    try:
+      item, end = decoder.raw_decode(buffer, position)
+      cut_off = end == len(buffer)
+    except json.JSONDecodeError as error:
+      cut_off = error.msg.startswith('Unterminated string') or len(buffer) - error.pos <= JSON_PARTIAL_TOKEN
+      if eof and error.pos == len(buffer):
+        raise ValueError(f"Truncated JSON array: the file ends inside element {index}") from None
+      if not cut_off or eof:
+        raise ValueError(f"Invalid JSON in element {index} at offset {offset + error.pos}: {error.msg}") from None
+    if cut_off and not eof:
+      more = file.read(buffer_size)
+      eof = not more
+      offset += position
+      buffer = buffer[position:] + more
+      position = 0
+      continue
+    yield item
+    index += 1
+    position = end
+
+def iter_csv(file):
+  # Expects a header row with english, spanish and optionally groups
+  # (several group names separated by ';')
+  for row in csv.DictReader(file):
+    groups = row.get('groups')
+    if groups is not None:
+      row['groups'] = [name for name in groups.split(';') if name.strip()]
+    yield row
+
+def detect_format(path):
+  extension = os.path.splitext(path)[1].lower()
+  if extension == '.json':
+    return 'json'
+  if extension in ('.ndjson', '.jsonl'):
+    return 'ndjson'
+  if extension == '.csv':
+    return 'csv'
+  raise ValueError(f"Cannot tell the format of {path}; pass json, ndjson or csv")
+
+def iter_vocab_file(file, format):
+  if format == 'json':
+    return iter_json_array(file)
+  if format == 'ndjson':
+    return iter_ndjson(file)
+  if format == 'csv':
+    return iter_csv(file)
+  raise ValueError(f"Unknown vocabulary format: {format}")
+
+def parse_vocab_row(item, groups=()):
+  # Returns (english, spanish, group names) or raises ValueError
+  if isinstance(item, Exception):
+    raise item
+  if not isinstance(item, dict):
+    raise ValueError("Word must be an object")
+  english = item.get('english')
+  spanish = item.get('spanish')
+  if not isinstance(english, str) or not isinstance(spanish, str):
+    raise ValueError("english and spanish are required")
+  english = english.strip()
+  spanish = spanish.strip()
+  if not english or not spanish:
+    raise ValueError("english and spanish are required")
+
+  row_groups = item.get('groups', [])
+  if isinstance(row_groups, str):
+    row_groups = [row_groups]
+  if item.get('group'):
+    row_groups = list(row_groups) + [item['group']]
+  if not isinstance(row_groups, list) or not all(isinstance(name, str) for name in row_groups):
+    raise ValueError("groups must be a list of group names")
+  names = []
+  for name in itertools.chain(groups, row_groups):
+    name = name.strip()
+    if name and name not in names:
+      names.append(name)
+  return english, spanish, names
+
+def file_fingerprint(path):
+  stat = os.stat(path)
+  return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+def load_import_state(connection, source):
+  return connection.execute(
+    'SELECT fingerprint, rows_done, deferred_indexes FROM vocab_imports WHERE source = ?',
+    (source,)
+  ).fetchone()
+
+def save_import_state(connection, source, fingerprint, rows_done, deferred_indexes, completed=False):
+  connection.execute('''
+    INSERT INTO vocab_imports (source, fingerprint, rows_done, deferred_indexes, completed_at)
+    VALUES (?, ?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+    ON CONFLICT (source) DO UPDATE SET
+      fingerprint = excluded.fingerprint,
+      rows_done = excluded.rows_done,
+      deferred_indexes = excluded.deferred_indexes,
+      completed_at = excluded.completed_at
+  ''', (source, fingerprint, rows_done, json.dumps(deferred_indexes) if deferred_indexes else None, completed))
+
+def secondary_indexes(connection):
+  # [name, sql] of the indexes on words/word_groups an import can defer.
+  # Unique indexes stay: they enforce constraints, not just lookups.
+  indexes = connection.execute('''
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND tbl_name IN ('words', 'word_groups') AND sql IS NOT NULL
+    ORDER BY name
+  ''').fetchall()
+  return [[name, sql] for name, sql in indexes
+          if name not in IMPORT_LOOKUP_INDEXES and not sql.upper().startswith('CREATE UNIQUE')]
+
+def drop_indexes(connection, indexes):
+  for name, _ in indexes:
+    connection.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+def rebuild_indexes(connection, indexes):
+  for name, sql in indexes:
+    exists = connection.execute(
+      "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+    ).fetchone()
+    if not exists:
+      connection.execute(sql)
+
+def load_chunk(connection, staged):
+  # staged is a list of (line, english, spanish, group name or None,
+  # english_folded, spanish_folded) (see lib/search.py fold()). New
+  # groups and words are inserted in order of first appearance, so seed files
+  # keep predictable ids. Returns (words added, links added).
+  connection.execute('DELETE FROM temp.vocab_import_rows')
+  connection.executemany('''
+    INSERT INTO temp.vocab_import_rows (line, english, spanish, group_name, english_folded, spanish_folded)
+    VALUES (?, ?, ?, ?, ?, ?)
+  ''', staged)
+
+  connection.execute('''
+    INSERT INTO groups (name)
+    SELECT t.group_name FROM temp.vocab_import_rows t
+    WHERE t.group_name IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM groups g WHERE g.name = t.group_name)
+    GROUP BY t.group_name
+    ORDER BY MIN(t.line)
+  ''')
+
+  words_added = connection.execute('''
+    INSERT INTO words (english, spanish, english_folded, spanish_folded)
+    SELECT t.english, t.spanish, t.english_folded, t.spanish_folded FROM temp.vocab_import_rows t
+    WHERE NOT EXISTS (
+      SELECT 1 FROM words w WHERE w.english = t.english AND w.spanish = t.spanish
+    )
+    GROUP BY t.english, t.spanish
+    ORDER BY MIN(t.line)
+  ''').rowcount
+
+  links_added = connection.execute('''
+    INSERT INTO word_groups (word_id, group_id)
+    SELECT DISTINCT w.id, g.id
+    FROM temp.vocab_import_rows t
+    JOIN words w ON w.english = t.english AND w.spanish = t.spanish
+    JOIN groups g ON g.name = t.group_name
+    WHERE NOT EXISTS (
+      SELECT 1 FROM word_groups wg WHERE wg.word_id = w.id AND wg.group_id = g.id
+    )
+  ''').rowcount
+  return words_added, links_added
+
+# Streams vocabulary rows into words/word_groups. Each chunk of rows is one
+# transaction: rows are staged with executemany into a temp table, then
+# merged with set-based INSERT ... SELECT statements that skip words already
+# present (deduplicated on english + spanish) and links that already exist.
+#
+# rows is any iterable of dicts with english, spanish and optional groups;
+# groups lists group names every row is added to. When source is given
+# (see import_vocab_file) progress is recorded in vocab_imports so a rerun
+# skips the rows already committed. defer_indexes drops the indexes the
+# import doesn't need and rebuilds them once at the end.
+def import_vocab(connection, rows, groups=(), source=None, fingerprint=None, restart=False,
+                 chunk_size=IMPORT_CHUNK_SIZE, defer_indexes=False, progress=None):
+  result = {
+    'rows': 0,
+    'resumed_at': 0,
+    'invalid': 0,
+    'words_added': 0,
+    'links_added': 0,
+    'errors': []
+  }
+  deferred = []
+  if source is not None:
+    state = load_import_state(connection, source)
+    if state:
+      # Indexes dropped by an earlier, interrupted run are still missing
+      deferred = json.loads(state[2] or '[]')
+      if not restart and state[0] == fingerprint:
+        result['resumed_at'] = state[1]
+
+  if defer_indexes:
+    deferred_names = {name for name, _ in deferred}
+    dropping = [index for index in secondary_indexes(connection) if index[0] not in deferred_names]
+    deferred += dropping
+    if source is not None:
+      # Record the definitions before dropping anything
+      save_import_state(connection, source, fingerprint, result['resumed_at'], deferred)
+      connection.commit()
+    drop_indexes(connection, dropping)
+
+  connection.execute('''
+    CREATE TEMP TABLE IF NOT EXISTS vocab_import_rows (
+      line INTEGER NOT NULL,
+      english TEXT NOT NULL,
+      spanish TEXT NOT NULL,
+      group_name TEXT,
+      english_folded TEXT NOT NULL,
+      spanish_folded TEXT NOT NULL
+    )
+  ''')
+  line = result['resumed_at']
+  started = time.perf_counter()
+  try:
+    for chunk in chunked(itertools.islice(rows, line, None), chunk_size):
+      staged = []
+      for item in chunk:
+        try:
+          english, spanish, names = parse_vocab_row(item, groups)
+        except ValueError as e:
+          result['invalid'] += 1
+          if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'row': line, 'error': str(e)})
+        else:
+          english_folded, spanish_folded = fold(english), fold(spanish)
+          staged.extend((line, english, spanish, name, english_folded, spanish_folded) for name in names or [None])
+        line += 1
+
+      try:
+        words_added, links_added = load_chunk(connection, staged)
+        if source is not None:
+          save_import_state(connection, source, fingerprint, line, deferred)
+        connection.commit()
+      except Exception:
+        connection.rollback()
+        raise
+
+      result['rows'] += len(chunk)
+      result['words_added'] += words_added
+      result['links_added'] += links_added
+      if progress:
+        progress(line, result['rows'] / max(time.perf_counter() - started, 1e-9))
+  finally:
+    connection.execute('DROP TABLE IF EXISTS temp.vocab_import_rows')
+    if deferred:
+      rebuild_indexes(connection, deferred)
+      if source is not None:
+        connection.execute('UPDATE vocab_imports SET deferred_indexes = NULL WHERE source = ?', (source,))
+      connection.commit()
+
+  if source is not None:
+    save_import_state(connection, source, fingerprint, line, None, completed=True)
+  connection.commit()
+
+  result['seconds'] = time.perf_counter() - started
+  result['rows_per_sec'] = result['rows'] / result['seconds'] if result['seconds'] else 0
+  return result
+
+def import_vocab_file(connection, path, format=None, **options):
+  # Imports a JSON array, NDJSON or CSV file of words. Progress is keyed on
+  # the file's absolute path, so rerunning the same command resumes it.
+  source = os.path.abspath(path)
+  with open(path, 'r', encoding='utf-8', newline='') as file:
+    rows = iter_vocab_file(file, format or detect_format(path))
+    return import_vocab(connection, rows, source=source, fingerprint=file_fingerprint(path), **options)
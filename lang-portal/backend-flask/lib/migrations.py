@@ -0,0 +1,58 @@
+import os
+import re
+
+# Migrations live in sql/migrations as NNNN_description.sql and are applied
+# in version order. Each one runs in its own transaction together with the
+# schema_migrations row that records it.
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'migrations')
+
+MIGRATION_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+def ensure_migrations_table(connection):
+  connection.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+  ''')
+  connection.commit()
+
+def available_migrations(directory=MIGRATIONS_DIR):
+  migrations = []
+  for filename in os.listdir(directory):
+    match = MIGRATION_FILENAME.match(filename)
+    if match:
+      migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+  return sorted(migrations)
+
+def current_version(connection):
+  ensure_migrations_table(connection)
+  row = connection.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+  return row[0] or 0
+
+def pending_migrations(connection, directory=MIGRATIONS_DIR):
+  version = current_version(connection)
+  return [m for m in available_migrations(directory) if m[0] > version]
+
+def migrate(connection, directory=MIGRATIONS_DIR, verbose=False):
+  applied = []
+  for version, name, path in pending_migrations(connection, directory):
+    with open(path, 'r') as file:
+      script = file.read()
+    try:
+      # executescript commits anything pending first, so open the
+      # transaction inside the script to keep the migration atomic
+      connection.executescript('BEGIN;\n' + script)
+      connection.execute(
+        'INSERT INTO schema_migrations (version, name) VALUES (?, ?)',
+        (version, name)
+      )
+      connection.commit()
+    except Exception:
+      connection.rollback()
+      raise
+    applied.append((version, name))
+    if verbose:
+      print(f"Applied migration {version:04d} {name}")
+  return applied
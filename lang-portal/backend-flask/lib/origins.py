@@ -0,0 +1,117 @@
+import logging
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Development frontends that call the API from the browser: the React portal
+# (vite) and the typing tutor
+DEFAULT_CORS_ORIGINS = [
+  'http://localhost:5173',
+  'http://127.0.0.1:5173',
+  'http://localhost:8080',
+  'http://127.0.0.1:8080'
+]
+
+CORS_METHODS = 'GET, POST, PUT, DELETE, OPTIONS'
+CORS_HEADERS = 'Content-Type, Authorization'
+CORS_MAX_AGE = 600
+
+def origin_of(url):
+  # https://example.com/app -> https://example.com
+  parsed = urlparse(url)
+  if not parsed.scheme or not parsed.netloc:
+    return None
+  return f'{parsed.scheme}://{parsed.netloc}'
+
+# Origins allowed to call the API: the origin of every study activity URL
+# plus the configured CORS_ORIGINS. Nothing is read at startup; the list is
+# loaded on first use and afterwards rechecked at most every refresh_interval
+# seconds, and only from requests that already hold a database connection.
+# A recheck is one lookup of study_activities in table_versions; the
+# activities are reread only when that version moved.
+#
+# An empty allowlist, or '*' in CORS_ORIGINS, allows every origin.
+class OriginAllowlist:
+  def __init__(self, db, extra_origins=(), refresh_interval=5):
+    self.db = db
+    self.extra_origins = set(extra_origins)
+    self.refresh_interval = refresh_interval
+    self._lock = threading.Lock()
+    self._origins = None
+    self._version = None
+    self._checked_at = 0.0
+
+  def _load(self):
+    try:
+      cursor = self.db.cursor()
+      row = cursor.execute("SELECT version FROM table_versions WHERE name = 'study_activities'").fetchone()
+      version = row[0] if row else None
+      with self._lock:
+        unchanged = self._origins is not None and version is not None and version == self._version
+        if unchanged:
+          self._checked_at = time.monotonic()
+          return
+      cursor.execute('SELECT url FROM study_activities')
+      origins = {origin_of(row[0]) for row in cursor.fetchall() if row[0]}
+      origins.discard(None)
+    except sqlite3.Error as e:
+      # Database not set up yet: allow all origins until the next check
+      logger.warning("Could not load allowed origins, allowing all: %s", e)
+      version = None
+      origins = {'*'}
+    with self._lock:
+      self._origins = frozenset(origins | self.extra_origins)
+      self._version = version
+      self._checked_at = time.monotonic()
+
+  def refresh_if_due(self):
+    if self._origins is None or time.monotonic() - self._checked_at >= self.refresh_interval:
+      self._load()
+
+  def origins(self):
+    if self._origins is None:
+      self._load()
+    return self._origins
+
+  def allows(self, origin):
+    origins = self.origins()
+    return not origins or '*' in origins or origin in origins
+
+  def invalidate(self):
+    with self._lock:
+      self._origins = None
+
+def init_cors(app, allowlist, allow_headers=CORS_HEADERS):
+  # Preflight requests are answered here before routing, from the cached
+  # allowlist; other responses get Access-Control-Allow-Origin added when
+  # the request's Origin is allowed.
+  def allow_origin(response, origin):
+    response.headers['Access-Control-Allow-Origin'] = origin
+    response.vary.add('Origin')
+
+  @app.before_request
+  def answer_preflight():
+    if request.method != 'OPTIONS' or 'Access-Control-Request-Method' not in request.headers:
+      return None
+    response = app.make_default_options_response()
+    origin = request.headers.get('Origin')
+    if origin and allowlist.allows(origin):
+      allow_origin(response, origin)
+      response.headers['Access-Control-Allow-Methods'] = CORS_METHODS
+      response.headers['Access-Control-Allow-Headers'] = allow_headers
+      response.headers['Access-Control-Max-Age'] = str(CORS_MAX_AGE)
+    return response
+
+  @app.after_request
+  def add_cors_headers(response):
+    if request.method != 'OPTIONS' and 'db' in g:
+      allowlist.refresh_if_due()
+    origin = request.headers.get('Origin')
+    if origin and allowlist.allows(origin):
+      allow_origin(response, origin)
+    return response
@@ -0,0 +1,73 @@
+import base64
+import json
+import threading
+import time
+
+# Opaque cursors for keyset pagination. A cursor holds the sort value and id
+# of the last row on the previous page; the next page starts strictly after it.
+def encode_cursor(sort_value, row_id):
+  raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode('utf-8')
+  return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+  except Exception:
+    raise ValueError("Invalid cursor")
+  if not isinstance(row_id, int):
+    raise ValueError("Invalid cursor")
+  return sort_value, row_id
+
+# Word listing sort keys mapped to the expression used for keyset seeks.
+# Expects words aliased as w and word_reviews as r.
+word_sort_expressions = {
+  'english': 'w.english',
+  'spanish': 'w.spanish',
+  'correct_count': 'COALESCE(r.correct_count, 0)',
+  'wrong_count': 'COALESCE(r.wrong_count, 0)'
+}
+
+def keyset_condition(sort_expression, id_column, order):
+  # Row-value comparison so SQLite can seek the (sort column, id) index
+  operator = '>' if order == 'asc' else '<'
+  return f'({sort_expression}, {id_column}) {operator} (?, ?)'
+
+def keyset_order(sort_expression, id_column, order):
+  return f'{sort_expression} {order}, {id_column} {order}'
+
+def keyset_page(rows, per_page, sort_key):
+  # Rows were fetched with LIMIT per_page + 1 to tell whether another page exists
+  has_more = len(rows) > per_page
+  rows = rows[:per_page]
+  next_cursor = None
+  if has_more and rows:
+    last = rows[-1]
+    next_cursor = encode_cursor(last[sort_key], last['id'])
+  return rows, next_cursor
+
+# Caches total row counts for paginated listings for a few seconds so paging
+# through a large table doesn't recount it on every request
+class CountCache:
+  def __init__(self, ttl=60):
+    self.ttl = ttl
+    self._lock = threading.Lock()
+    self._counts = {}
+
+  def get(self, key, compute):
+    now = time.monotonic()
+    with self._lock:
+      cached = self._counts.get(key)
+    if cached and now - cached[1] < self.ttl:
+      return cached[0]
+    count = compute()
+    with self._lock:
+      self._counts[key] = (count, now)
+    return count
+
+  def invalidate(self, key=None):
+    with self._lock:
+      if key is None:
+        self._counts.clear()
+      else:
+        self._counts.pop(key, None)
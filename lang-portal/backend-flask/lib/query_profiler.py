@@ -0,0 +1,246 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from flask import g
+
+# Per-statement query profiling for cursors handed out by Db.cursor().
+#
+# Each statement is timed from execute() through the last row fetched and
+# recorded under its normalized SQL (literals replaced by ?, whitespace
+# collapsed), together with the rows it returned or changed. Timings of the
+# current request feed its Server-Timing header; the last samples_per_statement
+# timings of each statement feed the percentiles at /api/_debug/queries.
+# Statements slower than slow_ms are written to the slow query log with their
+# EXPLAIN QUERY PLAN.
+SLOW_LOGGER = 'lang_portal.slow_queries'
+
+# Statements listed individually in Server-Timing, slowest first
+SERVER_TIMING_STATEMENTS = 3
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+def normalize_sql(sql):
+  sql = STRING_LITERAL.sub('?', sql)
+  sql = NUMBER_LITERAL.sub('?', sql)
+  sql = PLACEHOLDER_LIST.sub('(?, ...)', sql)
+  return WHITESPACE.sub(' ', sql).strip()
+
+def percentile(values, fraction):
+  if not values:
+    return 0
+  values = sorted(values)
+  return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class QueryProfiler:
+  def __init__(self, slow_ms=100, slow_log=None, slow_log_bytes=10 * 1024 * 1024, slow_log_backups=5,
+               samples_per_statement=1000):
+    self.slow_ms = slow_ms
+    self.samples_per_statement = samples_per_statement
+    self._lock = threading.Lock()
+    self._statements = {}
+    self.slow_logger = logging.getLogger(SLOW_LOGGER)
+    self._handler = None
+    if slow_log:
+      self._handler = RotatingFileHandler(slow_log, maxBytes=slow_log_bytes, backupCount=slow_log_backups, encoding='utf-8')
+      self._handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+      self.slow_logger.addHandler(self._handler)
+      self.slow_logger.setLevel(logging.INFO)
+      self.slow_logger.propagate = False
+
+  def cursor(self, connection):
+    return connection.cursor(factory=lambda connection: ProfiledCursor(connection, self))
+
+  def request_statements(self):
+    # Statements run so far in the current request or app context
+    if 'query_profile' not in g:
+      g.query_profile = []
+    return g.query_profile
+
+  def finish_request(self):
+    # Records statements whose rows were never read to the end (e.g. a
+    # fetchone() lookup). Called by Db.close() before the connection goes
+    # back to the pool, so slow statements can still be explained.
+    for statement in g.pop('query_profile', []):
+      if not statement.finished:
+        statement.finish()
+
+  def record(self, statement):
+    elapsed_ms = statement.elapsed * 1000
+    with self._lock:
+      entry = self._statements.get(statement.sql)
+      if entry is None:
+        entry = self._statements[statement.sql] = {
+          'calls': 0,
+          'rows': 0,
+          'total_ms': 0.0,
+          'max_ms': 0.0,
+          'samples': deque(maxlen=self.samples_per_statement)
+        }
+      entry['calls'] += 1
+      entry['rows'] += statement.rows
+      entry['total_ms'] += elapsed_ms
+      entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+      entry['samples'].append(elapsed_ms)
+    if elapsed_ms >= self.slow_ms:
+      self.log_slow(statement, elapsed_ms)
+
+  def log_slow(self, statement, elapsed_ms):
+    plan = statement.explain()
+    self.slow_logger.info(
+      "%.1fms rows=%d %s\n%s",
+      elapsed_ms, statement.rows, statement.sql, '\n'.join(f'  {line}' for line in plan)
+    )
+
+  def summary(self):
+    # Per-statement stats, most total time first
+    with self._lock:
+      entries = [(sql, dict(entry, samples=list(entry['samples']))) for sql, entry in self._statements.items()]
+    statements = []
+    for sql, entry in entries:
+      statements.append({
+        'sql': sql,
+        'calls': entry['calls'],
+        'rows': entry['rows'],
+        'total_ms': round(entry['total_ms'], 3),
+        'p50_ms': round(percentile(entry['samples'], 0.50), 3),
+        'p95_ms': round(percentile(entry['samples'], 0.95), 3),
+        'max_ms': round(entry['max_ms'], 3)
+      })
+    statements.sort(key=lambda statement: statement['total_ms'], reverse=True)
+    return statements
+
+  def reset(self):
+    with self._lock:
+      self._statements = {}
+
+  def server_timing(self, statements):
+    # Server-Timing header value for one request's statements
+    if not statements:
+      return None
+    total = sum(statement.elapsed for statement in statements) * 1000
+    metrics = [f'db;dur={total:.2f};desc="{len(statements)} queries"']
+    slowest = sorted(statements, key=lambda statement: statement.elapsed, reverse=True)
+    for index, statement in enumerate(slowest[:SERVER_TIMING_STATEMENTS], 1):
+      desc = statement.sql[:80].replace('\\', '').replace('"', "'")
+      metrics.append(f'sql{index};dur={statement.elapsed * 1000:.2f};desc="{desc}"')
+    return ', '.join(metrics)
+
+  def close(self):
+    if self._handler is not None:
+      self.slow_logger.removeHandler(self._handler)
+      self._handler.close()
+      self._handler = None
+
+class ProfiledStatement:
+  __slots__ = ('profiler', 'connection', 'raw_sql', 'params', 'sql', 'elapsed', 'rows', 'finished')
+
+  def __init__(self, profiler, connection, raw_sql, params):
+    self.profiler = profiler
+    self.connection = connection
+    self.raw_sql = raw_sql
+    self.params = params
+    self.sql = normalize_sql(raw_sql)
+    self.elapsed = 0.0
+    self.rows = 0
+    self.finished = False
+
+  def finish(self):
+    self.finished = True
+    self.profiler.record(self)
+
+  def explain(self):
+    if self.params is None:
+      return []
+    try:
+      return [row[3] for row in self.connection.execute('EXPLAIN QUERY PLAN ' + self.raw_sql, self.params)]
+    except sqlite3.Error as e:
+      return [f'(no plan: {e})']
+
+class ProfiledCursor(sqlite3.Cursor):
+  def __init__(self, connection, profiler):
+    super().__init__(connection)
+    self.profiler = profiler
+    self.statement = None
+
+  def _start(self, sql, params):
+    if self.statement is not None and not self.statement.finished:
+      self.statement.finish()
+    self.statement = ProfiledStatement(self.profiler, self.connection, sql, params)
+    self.profiler.request_statements().append(self.statement)
+    return self.statement
+
+  def _timed(self, call, *args):
+    statement = self.statement
+    started = time.perf_counter()
+    try:
+      return call(*args)
+    finally:
+      if statement is not None and not statement.finished:
+        statement.elapsed += time.perf_counter() - started
+
+  def execute(self, sql, params=()):
+    statement = self._start(sql, params)
+    self._timed(super().execute, sql, params)
+    if self.description is None:
+      # Not a query: nothing to fetch, the work is done
+      statement.rows = max(self.rowcount, 0)
+      statement.finish()
+    return self
+
+  def executemany(self, sql, seq_of_params):
+    # Plans are not explained for executemany (there is no single set of
+    # parameters to explain with)
+    statement = self._start(sql, None)
+    self._timed(super().executemany, sql, seq_of_params)
+    statement.rows = max(self.rowcount, 0)
+    statement.finish()
+    return self
+
+  def _fetched(self, rows, done):
+    statement = self.statement
+    if statement is not None and not statement.finished:
+      statement.rows += rows
+      if done:
+        statement.finish()
+
+  def fetchone(self):
+    row = self._timed(super().fetchone)
+    self._fetched(row is not None, row is None)
+    return row
+
+  def fetchmany(self, size=None):
+    rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+    self._fetched(len(rows), not rows)
+    return rows
+
+  def fetchall(self):
+    rows = self._timed(super().fetchall)
+    self._fetched(len(rows), True)
+    return rows
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    row = self.fetchone()
+    if row is None:
+      raise StopIteration
+    return row
+
+def init_profiling(app, profiler):
+  # Adds a Server-Timing header with the request's database time and its
+  # slowest statements
+  @app.after_request
+  def add_server_timing(response):
+    value = profiler.server_timing(g.get('query_profile', []))
+    if value:
+      response.headers['Server-Timing'] = value
+    return response
@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import current_app, request
+
+from lib.shards import LEARNER_TABLES, current_shard
+
+# Caches the serialized body of read-heavy GET routes, keyed by path and
+# query args. Each entry remembers the table_versions (see
+# sql/migrations/0006_table_versions.sql) it was built from; a request reads
+# the current versions with one primary-key query and only reruns the view
+# when one of them moved. Responses carry an ETag, so a client that sends
+# If-None-Match gets a bodiless 304 when nothing changed.
+#
+# max_entries caps the cache with LRU eviction (None for no cap). max_age is
+# sent as Cache-Control; 0 sends no-cache, meaning clients revalidate with
+# the ETag on every use.
+#
+# A route that reads learner tables is cached per learner shard, from the
+# versions in that shard's shard_table_versions.
+class ResponseCache:
+  def __init__(self, db, max_entries=1024, max_age=0):
+    self.db = db
+    self.max_entries = max_entries
+    self.max_age = max_age
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def table_versions(self, tables):
+    cursor = self.db.cursor()
+    placeholders = ', '.join('?' for _ in tables)
+    rows = cursor.execute(
+      f'SELECT name, version FROM table_versions WHERE name IN ({placeholders})',
+      tables
+    ).fetchall()
+    versions = {row[0]: row[1] for row in rows}
+    learner_tables = [table for table in tables if table in LEARNER_TABLES]
+    if learner_tables and current_shard() is not None:
+      rows = cursor.execute(
+        f"SELECT name, version FROM shard_table_versions WHERE name IN ({', '.join('?' for _ in learner_tables)})",
+        learner_tables
+      ).fetchall()
+      versions.update((row[0], row[1]) for row in rows)
+    return tuple(versions.get(table) for table in tables)
+
+  def _get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+      return entry
+
+  def _put(self, key, entry):
+    with self._lock:
+      self._entries[key] = entry
+      self._entries.move_to_end(key)
+      if self.max_entries is not None:
+        while len(self._entries) > self.max_entries:
+          self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self):
+    with self._lock:
+      return len(self._entries)
+
+  def cached(self, *tables, versions=None):
+    # Decorates a GET view whose response depends only on the given tables,
+    # the path and the query args. versions is an optional callable for
+    # state outside the database (e.g. reviews pending in the review log).
+    def decorator(view):
+      @functools.wraps(view)
+      def wrapper(*args, **kwargs):
+        # Versions are read before the view runs, so a write racing with it
+        # can only make the stored body newer than its key, never older
+        current = self.table_versions(tables)
+        if versions is not None:
+          current += (versions(),)
+        shard = current_shard() if LEARNER_TABLES.intersection(tables) else None
+        key = (shard, request.path, tuple(sorted(request.args.items(multi=True))))
+
+        entry = self._get(key)
+        if entry is not None and entry[0] == current:
+          self.hits += 1
+          body, mimetype, etag = entry[1:]
+        else:
+          self.misses += 1
+          response = current_app.make_response(view(*args, **kwargs))
+          if response.status_code != 200:
+            return response
+          body = response.get_data()
+          mimetype = response.mimetype
+          etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+          self._put(key, (current, body, mimetype, etag))
+
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.no_cache = self.max_age == 0 or None
+        if self.max_age:
+          response.cache_control.max_age = self.max_age
+        return response.make_conditional(request)
+      return wrapper
+    return decorator
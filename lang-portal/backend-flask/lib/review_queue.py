@@ -0,0 +1,284 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+
+from lib.scheduler import LOOKUP_CHUNK_SIZE, schedule_reviews
+from lib.shards import current_shard
+
+try:
+  import fcntl
+except ImportError:  # Windows: journals are not shared between processes
+  fcntl = None
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_COMPACT_BYTES = 8 * 1024 * 1024
+
+# Write-behind log for review submissions.
+#
+# append() writes each review to an append-only journal file (fsynced) and an
+# in-memory queue, then returns without touching SQLite. A background thread
+# batch-commits queued reviews into word_review_items, where the existing
+# triggers maintain word_reviews and the rollups. Every entry carries a
+# journal_id with a unique index, so replaying the journal after a crash or
+# restart inserts each review exactly once. The journal is truncated once
+# everything in it has been committed.
+#
+# Until a review is committed, pending_word_counts()/pending_session_counts()
+# expose it so reads can merge it into what they return from the database.
+#
+# With learner shards (lib/shards.py) each entry records the learner it
+# belongs to and is committed to that learner's shard; the pending overlay is
+# kept per learner.
+#
+# The journal belongs to one process. claim_journal() picks a journal slot no
+# other live process holds, so several server workers (see asgi.py) can share
+# one REVIEW_JOURNAL setting, and a crashed worker's journal is replayed by
+# the next process that claims its slot.
+class ReviewQueue:
+  def __init__(self, db, journal_path, flush_interval=0.5, batch_size=1000, shards=None):
+    self.db = db
+    self.shards = shards
+    self.journal_path = journal_path
+    self.flush_interval = flush_interval
+    self.batch_size = batch_size
+    self._lock = threading.Lock()
+    # Held while a batch is being committed so the flusher thread and an
+    # explicit flush() never write (and untrack) the same entries twice
+    self._flush_lock = threading.Lock()
+    self._wakeup = threading.Condition(self._lock)
+    self._pending = []
+    self._by_word = {}
+    self._by_session = {}
+    # Bumped whenever the pending overlay changes, for caches of responses
+    # that merge it in
+    self.version = 0
+    self._thread = None
+    self._stopping = False
+    self._journal_lock = None
+
+  def claim_journal(self, slots=64):
+    # Tries journal_path, then name.1.ext, name.2.ext, ... and keeps an
+    # exclusive lock on the first free one for the life of the process. The
+    # lock lives in a separate .lock file because compaction replaces the
+    # journal file itself.
+    if fcntl is None or self._journal_lock is not None:
+      return self.journal_path
+    root, extension = os.path.splitext(self.journal_path)
+    for slot in range(slots):
+      path = self.journal_path if slot == 0 else f'{root}.{slot}{extension}'
+      lock = open(path + '.lock', 'a')
+      try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+      except OSError:
+        lock.close()
+        continue
+      self._journal_lock = lock
+      self.journal_path = path
+      return path
+    raise RuntimeError(f"All {slots} review journal slots for {self.journal_path} are in use")
+
+  def start(self):
+    with self._lock:
+      if self._thread is not None:
+        return
+      self._replay_journal()
+      self._thread = threading.Thread(target=self._run, name='review-queue-flusher', daemon=True)
+      self._thread.start()
+    atexit.register(self.stop)
+
+  def start_if_journal_exists(self):
+    # Reviews left in the journal by a previous run still need committing
+    if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0:
+      self.start()
+
+  def append(self, session_id, reviews, created_at):
+    # reviews is a list of (word_id, correct); returns their journal ids
+    self.start()
+    shard = current_shard()
+    entries = [{
+      'journal_id': uuid.uuid4().hex,
+      'shard': shard,
+      'study_session_id': session_id,
+      'word_id': word_id,
+      'correct': correct,
+      'created_at': created_at
+    } for word_id, correct in reviews]
+    with self._lock:
+      with open(self.journal_path, 'a', encoding='utf-8') as journal:
+        for entry in entries:
+          journal.write(json.dumps(entry) + '\n')
+        journal.flush()
+        os.fsync(journal.fileno())
+      for entry in entries:
+        self._track(entry)
+      self._pending.extend(entries)
+      self.version += 1
+      self._wakeup.notify()
+    return [entry['journal_id'] for entry in entries]
+
+  def pending_count(self):
+    with self._lock:
+      return len(self._pending)
+
+  def pending_word_counts(self, word_id):
+    # (correct, wrong) reviews of a word that are not yet committed
+    with self._lock:
+      return tuple(self._by_word.get((current_shard(), word_id), (0, 0)))
+
+  def pending_session_counts(self, session_id):
+    # (review_count, correct, wrong) for a session that are not yet committed
+    with self._lock:
+      return tuple(self._by_session.get((current_shard(), int(session_id)), (0, 0, 0)))
+
+  def merge_word_counts(self, words):
+    # Adds pending reviews to correct_count/wrong_count of word dicts in place
+    shard = current_shard()
+    with self._lock:
+      if not self._by_word:
+        return words
+      for word in words:
+        correct, wrong = self._by_word.get((shard, word['id']), (0, 0))
+        word['correct_count'] += correct
+        word['wrong_count'] += wrong
+    return words
+
+  def flush(self):
+    # Commit everything queued so far; returns the number of reviews written
+    written = 0
+    with self._flush_lock:
+      while True:
+        with self._lock:
+          batch = self._pending[:self.batch_size]
+        if not batch:
+          return written
+        self._commit(batch)
+        written += len(batch)
+
+  def stop(self):
+    with self._lock:
+      self._stopping = True
+      self._wakeup.notify()
+    if self._thread is not None:
+      self._thread.join(timeout=10)
+    try:
+      self.flush()
+    except Exception as e:
+      logger.error("Could not flush review queue on shutdown, reviews stay in %s: %s", self.journal_path, e)
+    if self._journal_lock is not None:
+      self._journal_lock.close()
+      self._journal_lock = None
+
+  def _track(self, entry, sign=1):
+    # Entries journaled before sharding have no shard: the primary
+    word_key = (entry.get('shard'), entry['word_id'])
+    word = self._by_word.setdefault(word_key, [0, 0])
+    word[0 if entry['correct'] else 1] += sign
+    if word == [0, 0]:
+      del self._by_word[word_key]
+    session_key = (entry.get('shard'), entry['study_session_id'])
+    session = self._by_session.setdefault(session_key, [0, 0, 0])
+    session[0] += sign
+    session[1 if entry['correct'] else 2] += sign
+    if session == [0, 0, 0]:
+      del self._by_session[session_key]
+
+  def _replay_journal(self):
+    if not os.path.exists(self.journal_path):
+      return
+    with open(self.journal_path, 'r', encoding='utf-8') as journal:
+      for line in journal:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          # A torn final line from a crash mid-write was never acknowledged
+          continue
+        self._track(entry)
+        self._pending.append(entry)
+    if self._pending:
+      logger.info("Replaying %d reviews from %s", len(self._pending), self.journal_path)
+
+  def _commit(self, batch):
+    # Each database in the batch (the primary or a learner's shard) is
+    # committed, and its entries untracked, on its own
+    by_shard = {}
+    for entry in batch:
+      by_shard.setdefault(entry.get('shard'), []).append(entry)
+    for shard, entries in by_shard.items():
+      self._commit_to(self._pool(shard), entries)
+
+  def _pool(self, shard):
+    if shard is None:
+      return self.db.pool
+    if self.shards is None:
+      raise RuntimeError(f"{self.journal_path} has reviews for learner {shard} but sharding is off (set SHARD_DIRECTORY)")
+    # Reviews are only accepted for sessions in an existing shard; create
+    # keeps a missing file from resolving to the read-only empty shard
+    return self.shards.pool(shard, create=True)
+
+  def _commit_to(self, pool, batch):
+    with pool.connection() as connection:
+      try:
+        # Entries replayed from the journal may already be in the database;
+        # those are ignored by the insert and must not move schedules again
+        replayed = self._committed_journal_ids(connection, batch)
+        connection.executemany('''
+          INSERT OR IGNORE INTO word_review_items (journal_id, study_session_id, word_id, correct, created_at)
+          VALUES (:journal_id, :study_session_id, :word_id, :correct, :created_at)
+        ''', batch)
+        schedule_reviews(connection.cursor(), [
+          (entry['word_id'], entry['correct'], entry['created_at'])
+          for entry in batch if entry['journal_id'] not in replayed
+        ])
+        connection.commit()
+      except Exception:
+        connection.rollback()
+        raise
+    committed = {entry['journal_id'] for entry in batch}
+    with self._lock:
+      self._pending = [entry for entry in self._pending if entry['journal_id'] not in committed]
+      for entry in batch:
+        self._track(entry, sign=-1)
+      self.version += 1
+      if not self._pending:
+        # Everything journaled so far is in the database
+        open(self.journal_path, 'w').close()
+      elif os.path.getsize(self.journal_path) > JOURNAL_COMPACT_BYTES:
+        # Under steady load the queue may never drain; rewrite the journal
+        # with just the uncommitted entries so it doesn't grow unbounded
+        compacted = self.journal_path + '.tmp'
+        with open(compacted, 'w', encoding='utf-8') as journal:
+          for entry in self._pending:
+            journal.write(json.dumps(entry) + '\n')
+          journal.flush()
+          os.fsync(journal.fileno())
+        os.replace(compacted, self.journal_path)
+
+  def _committed_journal_ids(self, connection, batch):
+    journal_ids = [entry['journal_id'] for entry in batch]
+    committed = set()
+    for start in range(0, len(journal_ids), LOOKUP_CHUNK_SIZE):
+      chunk = journal_ids[start:start + LOOKUP_CHUNK_SIZE]
+      rows = connection.execute(
+        f"SELECT journal_id FROM word_review_items WHERE journal_id IN ({', '.join('?' * len(chunk))})",
+        chunk
+      ).fetchall()
+      committed.update(row[0] for row in rows)
+    return committed
+
+  def _run(self):
+    while True:
+      with self._lock:
+        if not self._pending and not self._stopping:
+          self._wakeup.wait(self.flush_interval)
+        if self._stopping:
+          return
+      try:
+        self.flush()
+      except Exception as e:
+        logger.error("Review queue flush failed, will retry: %s", e)
+        with self._lock:
+          self._wakeup.wait(self.flush_interval)
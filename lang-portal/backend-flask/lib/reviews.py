@@ -0,0 +1,109 @@
+import json
+import threading
+
+from lib.scheduler import schedule_reviews
+
+# Number of reviews sent to executemany at a time when streaming NDJSON
+REVIEW_CHUNK_SIZE = 1000
+
+# Known word ids, used to validate review submissions without a query per
+# word. Word ids only grow (AUTOINCREMENT), so a miss refreshes the cache by
+# loading ids above the highest one already seen.
+class WordIdCache:
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._ids = set()
+    self._max_id = 0
+
+  def _load_newer(self, cursor):
+    cursor.execute('SELECT id FROM words WHERE id > ? ORDER BY id', (self._max_id,))
+    ids = [row[0] for row in cursor.fetchall()]
+    if ids:
+      self._ids.update(ids)
+      self._max_id = ids[-1]
+
+  def unknown(self, cursor, word_ids):
+    with self._lock:
+      missing = {word_id for word_id in word_ids if word_id not in self._ids}
+      if missing:
+        self._load_newer(cursor)
+        missing = {word_id for word_id in missing if word_id not in self._ids}
+      return missing
+
+  def clear(self):
+    with self._lock:
+      self._ids = set()
+      self._max_id = 0
+
+def parse_review(item):
+  # Returns (word_id, correct) or raises ValueError describing the problem
+  if not isinstance(item, dict):
+    raise ValueError("Review must be an object")
+  word_id = item.get('word_id')
+  correct = item.get('correct')
+  if word_id is None or correct is None:
+    raise ValueError("word_id and correct are required")
+  if isinstance(word_id, bool) or not isinstance(word_id, int):
+    raise ValueError("word_id must be an integer")
+  if not isinstance(correct, (bool, int)):
+    raise ValueError("correct must be a boolean")
+  return word_id, bool(correct)
+
+def iter_ndjson(stream):
+  # Yields one decoded item per non-blank line, or the ValueError for a bad line
+  for line in stream:
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      yield json.loads(line)
+    except ValueError:
+      yield ValueError("Invalid JSON")
+
+def chunked(items, size=REVIEW_CHUNK_SIZE):
+  chunk = []
+  for item in items:
+    chunk.append(item)
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+def validate_reviews(cursor, word_ids, items):
+  # Checks one chunk of (index, raw item) pairs. Returns a result per item in
+  # input order and the (word_id, correct) pairs that passed.
+  results = []
+  valid = []
+  for index, item in items:
+    try:
+      if isinstance(item, Exception):
+        raise item
+      word_id, correct = parse_review(item)
+      valid.append((index, word_id, correct))
+    except ValueError as e:
+      results.append({'index': index, 'status': 'error', 'error': str(e)})
+
+  unknown = word_ids.unknown(cursor, {word_id for _, word_id, _ in valid})
+  reviews = []
+  for index, word_id, correct in valid:
+    if word_id in unknown:
+      results.append({'index': index, 'word_id': word_id, 'status': 'error', 'error': "Word not found"})
+    else:
+      results.append({'index': index, 'word_id': word_id, 'status': 'ok'})
+      reviews.append((word_id, correct))
+  results.sort(key=lambda result: result['index'])
+  return results, reviews
+
+def record_reviews(cursor, word_ids, session_id, items, reviewed_at):
+  # Validates and inserts one chunk of raw review items for a session.
+  # The trigger on word_review_items maintains word_reviews and the
+  # rollups; the reviewed words' schedules are updated in the same
+  # transaction.
+  results, reviews = validate_reviews(cursor, word_ids, items)
+  cursor.executemany('''
+    INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+    VALUES (?, ?, ?, ?)
+  ''', [(session_id, word_id, correct, reviewed_at) for word_id, correct in reviews])
+  schedule_reviews(cursor, [(word_id, correct, reviewed_at) for word_id, correct in reviews])
+  return results
@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+
+# Spaced repetition (SM-2). Every reviewed word has a row in word_schedules
+# with its ease factor, current interval and the time it is next due. Reviews
+# are binary, so a correct answer is graded as quality 5 and a wrong one as 2.
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# Intervals stop growing at roughly a century, so a word answered correctly
+# over and over can't push its due date past what datetime can hold
+MAX_INTERVAL_DAYS = 36500
+CORRECT_QUALITY = 5
+WRONG_QUALITY = 2
+
+# Words returned by /api/groups/<id>/due when no limit is given, and the most
+# a single request may ask for
+DEFAULT_DUE_LIMIT = 10
+MAX_DUE_LIMIT = 100
+
+# Bound parameters per IN (...) lookup, below SQLite's variable limit
+LOOKUP_CHUNK_SIZE = 500
+
+def as_datetime(value):
+  if isinstance(value, datetime):
+    return value
+  return datetime.fromisoformat(value)
+
+def format_due(value):
+  # Same text layout as SQLite's datetime(), so due_at compares as a string
+  return value.isoformat(sep=' ', timespec='seconds')
+
+def next_schedule(schedule, correct, reviewed_at):
+  # schedule is (ease, interval_days, repetitions) or None for a word that
+  # has never been reviewed. Returns the new (ease, interval_days,
+  # repetitions, due_at).
+  ease, interval, repetitions = schedule or (DEFAULT_EASE, 0, 0)
+  quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+  if correct:
+    repetitions += 1
+    if repetitions == 1:
+      interval = 1
+    elif repetitions == 2:
+      interval = 6
+    else:
+      interval = min(MAX_INTERVAL_DAYS, round(interval * ease))
+  else:
+    repetitions = 0
+    interval = 1
+  ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+  due_at = as_datetime(reviewed_at) + timedelta(days=interval)
+  return round(ease, 4), interval, repetitions, format_due(due_at)
+
+def load_schedules(cursor, word_ids):
+  word_ids = list(word_ids)
+  schedules = {}
+  for start in range(0, len(word_ids), LOOKUP_CHUNK_SIZE):
+    chunk = word_ids[start:start + LOOKUP_CHUNK_SIZE]
+    cursor.execute(f'''
+      SELECT word_id, ease, interval_days, repetitions
+      FROM word_schedules
+      WHERE word_id IN ({', '.join('?' * len(chunk))})
+    ''', chunk)
+    for row in cursor.fetchall():
+      schedules[row[0]] = (row[1], row[2], row[3])
+  return schedules
+
+def schedule_reviews(cursor, reviews):
+  # Applies (word_id, correct, reviewed_at) reviews, in order, to the
+  # schedules of the words they touch: one lookup and one upsert per chunk of
+  # reviews rather than per word. Runs in the caller's transaction.
+  if not reviews:
+    return
+  schedules = load_schedules(cursor, {word_id for word_id, _, _ in reviews})
+  updated = {}
+  for word_id, correct, reviewed_at in reviews:
+    ease, interval, repetitions, due_at = next_schedule(schedules.get(word_id), correct, reviewed_at)
+    schedules[word_id] = (ease, interval, repetitions)
+    updated[word_id] = (word_id, ease, interval, repetitions, due_at, str(reviewed_at))
+  cursor.executemany('''
+    INSERT INTO word_schedules (word_id, ease, interval_days, repetitions, due_at, last_reviewed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(word_id) DO UPDATE SET
+      ease = excluded.ease,
+      interval_days = excluded.interval_days,
+      repetitions = excluded.repetitions,
+      due_at = excluded.due_at,
+      last_reviewed_at = excluded.last_reviewed_at
+  ''', list(updated.values()))
+
+DUE_COLUMNS = '''
+  SELECT
+    w.id,
+    w.english,
+    w.spanish,
+    wg.due_at,
+    COALESCE(ws.ease, ?) AS ease,
+    COALESCE(ws.interval_days, 0) AS interval_days,
+    COALESCE(ws.repetitions, 0) AS repetitions
+  FROM word_groups wg
+  JOIN words w ON w.id = wg.word_id
+  LEFT JOIN word_schedules ws ON ws.word_id = wg.word_id
+'''
+
+# Due words from a learner shard's own schedules: word_groups.due_at lives
+# in the shared catalog and only follows the primary's schedules
+SHARD_DUE_COLUMNS = '''
+  SELECT
+    w.id,
+    w.english,
+    w.spanish,
+    ws.due_at,
+    COALESCE(ws.ease, ?) AS ease,
+    COALESCE(ws.interval_days, 0) AS interval_days,
+    COALESCE(ws.repetitions, 0) AS repetitions
+'''
+
+def due_words(cursor, group_id, limit=DEFAULT_DUE_LIMIT, now=None, include_new=True, learner_schedules=False):
+  # The next words to study in a group: reviewed words whose due time has
+  # passed, most overdue first, then (if include_new) words never reviewed,
+  # oldest first. word_groups carries a copy of each word's due_at so both
+  # halves are a range read of idx_word_groups_group_due that stops after
+  # limit rows, however large the group is.
+  now = format_due(now or datetime.now())
+  if learner_schedules:
+    return shard_due_words(cursor, group_id, limit, now, include_new)
+  cursor.execute(f'''
+    {DUE_COLUMNS}
+    WHERE wg.group_id = ? AND wg.due_at <= ?
+    ORDER BY wg.due_at, wg.word_id
+    LIMIT ?
+  ''', (DEFAULT_EASE, group_id, now, limit))
+  words = [due_json(row) for row in cursor.fetchall()]
+  if include_new and len(words) < limit:
+    cursor.execute(f'''
+      {DUE_COLUMNS}
+      WHERE wg.group_id = ? AND wg.due_at IS NULL
+      ORDER BY wg.word_id
+      LIMIT ?
+    ''', (DEFAULT_EASE, group_id, limit - len(words)))
+    words.extend(due_json(row) for row in cursor.fetchall())
+  return words
+
+def shard_due_words(cursor, group_id, limit, now, include_new):
+  # As due_words, for a learner shard. Overdue words walk the shard's
+  # idx_word_schedules_due_at and check group membership per word, so the
+  # cost follows the learner's due words rather than the group size.
+  cursor.execute(f'''
+    {SHARD_DUE_COLUMNS}
+    FROM word_schedules ws
+    CROSS JOIN word_groups wg ON wg.word_id = ws.word_id AND wg.group_id = ?
+    JOIN words w ON w.id = ws.word_id
+    WHERE ws.due_at <= ?
+    ORDER BY ws.due_at, ws.word_id
+    LIMIT ?
+  ''', (DEFAULT_EASE, group_id, now, limit))
+  words = [due_json(row) for row in cursor.fetchall()]
+  if include_new and len(words) < limit:
+    cursor.execute(f'''
+      {SHARD_DUE_COLUMNS}
+      FROM word_groups wg
+      JOIN words w ON w.id = wg.word_id
+      LEFT JOIN word_schedules ws ON ws.word_id = wg.word_id
+      WHERE wg.group_id = ? AND ws.word_id IS NULL
+      ORDER BY wg.word_id
+      LIMIT ?
+    ''', (DEFAULT_EASE, group_id, limit - len(words)))
+    words.extend(due_json(row) for row in cursor.fetchall())
+  return words
+
+def due_json(row):
+  return {
+    'id': row['id'],
+    'english': row['english'],
+    'spanish': row['spanish'],
+    'due_at': row['due_at'],
+    'ease': row['ease'],
+    'interval_days': row['interval_days'],
+    'repetitions': row['repetitions'],
+    'new': row['due_at'] is None
+  }
@@ -0,0 +1,97 @@
+import re
+import unicodedata
+
+# Word search over the FTS5 tables from sql/migrations/0008_word_search.sql.
+# A query is first matched as whole words, with the last word as a prefix
+# (autocomplete) against words_fts; if that finds fewer than limit words and
+# the query is at least TRIGRAM_MIN_LENGTH characters, words containing it
+# anywhere are added from words_trigram. Both ignore accents and case:
+# words_fts through its tokenizer, words_trigram by indexing the
+# english_folded and spanish_folded columns, fold() of each word
+# (sql/migrations/0011_folded_word_columns.sql).
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+SEARCH_FIELDS = ('english', 'spanish')
+TRIGRAM_MIN_LENGTH = 3
+
+TOKEN = re.compile(r'\w+')
+
+def fold(text):
+  # "Árbol" -> "arbol", matching how both tables index words
+  decomposed = unicodedata.normalize('NFKD', text)
+  return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+def fold_words(connection):
+  # Sets english_folded/spanish_folded wherever they are missing or out of
+  # date, e.g. for words written by tools outside the app. Returns the
+  # number of words refolded.
+  changed = []
+  for word_id, english, spanish, english_folded, spanish_folded in connection.execute(
+    'SELECT id, english, spanish, english_folded, spanish_folded FROM words'
+  ):
+    folded = (fold(english), fold(spanish))
+    if folded != (english_folded, spanish_folded):
+      changed.append(folded + (word_id,))
+  connection.executemany('UPDATE words SET english_folded = ?, spanish_folded = ? WHERE id = ?', changed)
+  connection.commit()
+  return len(changed)
+
+def column_filter(query, field):
+  return f'{field} : ({query})' if field else query
+
+def prefix_query(text, field=None):
+  # words_fts folds the query terms with its own tokenizer
+  tokens = TOKEN.findall(unicodedata.normalize('NFC', text))
+  if not tokens:
+    return None
+  terms = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+  return column_filter(' '.join(terms), field)
+
+def substring_query(text, field=None):
+  folded = ' '.join(fold(text).split())
+  if len(folded) < TRIGRAM_MIN_LENGTH:
+    return None
+  return column_filter('"' + folded.replace('"', '""') + '"', field and f'{field}_folded')
+
+def search_words(cursor, text, limit=DEFAULT_SEARCH_LIMIT, field=None):
+  # Matches come back in word id order rather than by rank: ranking has to
+  # score every match, which a one letter prefix makes most of the table
+  words = []
+  seen = set()
+  query = prefix_query(text, field)
+  if query:
+    cursor.execute('''
+      SELECT w.id, w.english, w.spanish
+      FROM words_fts
+      JOIN words w ON w.id = words_fts.rowid
+      WHERE words_fts MATCH ?
+      LIMIT ?
+    ''', (query, limit))
+    for row in cursor.fetchall():
+      seen.add(row['id'])
+      words.append(search_json(row, 'prefix'))
+
+  query = substring_query(text, field)
+  if query and len(words) < limit:
+    cursor.execute('''
+      SELECT w.id, w.english, w.spanish
+      FROM words_trigram
+      JOIN words w ON w.id = words_trigram.rowid
+      WHERE words_trigram MATCH ?
+      LIMIT ?
+    ''', (query, limit + len(seen)))
+    for row in cursor.fetchall():
+      if row['id'] in seen:
+        continue
+      words.append(search_json(row, 'substring'))
+      if len(words) == limit:
+        break
+  return words
+
+def search_json(row, match):
+  return {
+    'id': row['id'],
+    'english': row['english'],
+    'spanish': row['spanish'],
+    'match': match
+  }
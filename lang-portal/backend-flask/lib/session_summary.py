@@ -0,0 +1,119 @@
+# Shared query for study session listings. Review totals come from the
+# study_session_stats rollup (maintained by the trigger on word_review_items),
+# so every listing is one statement: no per-session subqueries and no extra
+# round trip to work out an end time. A session without reviews ends 30
+# minutes after it started.
+
+SESSION_COLUMNS = '''
+  SELECT
+    ss.id,
+    ss.group_id,
+    g.name AS group_name,
+    ss.study_activity_id AS activity_id,
+    sa.name AS activity_name,
+    ss.created_at AS start_time,
+    COALESCE(sst.last_review_at, datetime(ss.created_at, '+30 minutes')) AS end_time,
+    COALESCE(sst.review_count, 0) AS review_items_count,
+    COALESCE(sst.correct_count, 0) AS correct_count,
+    COALESCE(sst.wrong_count, 0) AS wrong_count
+'''
+
+SESSION_JOINS = '''
+  JOIN groups g ON g.id = ss.group_id
+  JOIN study_activities sa ON sa.id = ss.study_activity_id
+  LEFT JOIN study_session_stats sst ON sst.study_session_id = ss.id
+'''
+
+# Filters a listing can be narrowed by, mapped to their column
+SESSION_FILTERS = {
+  'id': 'ss.id',
+  'group_id': 'ss.group_id',
+  'activity_id': 'ss.study_activity_id'
+}
+
+# Sort keys accepted from clients (snake_case as in the response, plus the
+# camelCase keys the group sessions page has always sent)
+SESSION_SORT_COLUMNS = {
+  'id': 'ss.id',
+  'start_time': 'ss.created_at',
+  'created_at': 'ss.created_at',
+  'end_time': 'end_time',
+  'activity_name': 'activity_name',
+  'group_name': 'group_name',
+  'review_items_count': 'review_items_count',
+  'startTime': 'ss.created_at',
+  'endTime': 'end_time',
+  'activityName': 'activity_name',
+  'groupName': 'group_name',
+  'reviewItemsCount': 'review_items_count'
+}
+
+def session_filter(filters):
+  # Returns (WHERE clause, params) for the given filter values
+  conditions = []
+  params = []
+  for name, value in filters.items():
+    if value is None:
+      continue
+    conditions.append(f'{SESSION_FILTERS[name]} = ?')
+    params.append(value)
+  if not conditions:
+    return '', params
+  return 'WHERE ' + ' AND '.join(conditions), params
+
+def count_sessions(cursor, **filters):
+  where, params = session_filter(filters)
+  cursor.execute(f'SELECT COUNT(*) FROM study_sessions ss {where}', params)
+  return cursor.fetchone()[0]
+
+def list_sessions(cursor, sort_by='start_time', order='desc', limit=10, offset=0, **filters):
+  sort_column = SESSION_SORT_COLUMNS.get(sort_by, 'ss.created_at')
+  if order not in ('asc', 'desc'):
+    order = 'desc'
+  order_by = f'{sort_column} {order}, ss.id {order}'
+  where, params = session_filter(filters)
+  if sort_column.startswith('ss.'):
+    # The sort only needs study_sessions, so page through its index first
+    # and join names and totals for the returned rows alone rather than for
+    # every row OFFSET skips
+    cursor.execute(f'''
+      {SESSION_COLUMNS}
+      FROM (
+        SELECT ss.id FROM study_sessions ss
+        {where}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+      ) page
+      JOIN study_sessions ss ON ss.id = page.id
+      {SESSION_JOINS}
+      ORDER BY {order_by}
+    ''', params + [limit, offset])
+  else:
+    cursor.execute(f'''
+      {SESSION_COLUMNS}
+      FROM study_sessions ss
+      {SESSION_JOINS}
+      {where}
+      ORDER BY {order_by}
+      LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+  return [session_json(row) for row in cursor.fetchall()]
+
+def get_session(cursor, session_id):
+  cursor.execute(f'{SESSION_COLUMNS} FROM study_sessions ss {SESSION_JOINS} WHERE ss.id = ?', (session_id,))
+  row = cursor.fetchone()
+  return session_json(row) if row else None
+
+def session_json(row):
+  return {
+    'id': row['id'],
+    'group_id': row['group_id'],
+    'group_name': row['group_name'],
+    'activity_id': row['activity_id'],
+    'activity_name': row['activity_name'],
+    'start_time': row['start_time'],
+    'end_time': row['end_time'],
+    'review_items_count': row['review_items_count'],
+    'correct_count': row['correct_count'],
+    'wrong_count': row['wrong_count']
+  }
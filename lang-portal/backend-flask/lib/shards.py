@@ -0,0 +1,200 @@
+import functools
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import current_app, g, has_app_context, jsonify, request
+
+from lib.db import CONNECTION_PRAGMAS, ConnectionPool
+from lib.migrations import migrate
+
+SHARD_MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'shard_migrations')
+
+# Learner ids name the shard files, so only a file-safe alphabet is accepted
+LEARNER_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Schema-only shard that reads for learners without a shard of their own are
+# served from; the '.' keeps it out of the learner id alphabet
+EMPTY_SHARD = '.empty'
+
+# Tables each shard has its own copy of (see sql/shard_migrations)
+LEARNER_TABLES = frozenset({
+  'study_sessions',
+  'word_review_items',
+  'word_reviews',
+  'study_session_stats',
+  'daily_review_stats',
+  'dashboard_stats',
+  'word_schedules'
+})
+
+class ShardLimitError(Exception):
+  pass
+
+def current_shard():
+  # Learner id of the shard the current request selected, None for the
+  # primary database
+  return g.get('shard') if has_app_context() else None
+
+# Connections to one learner's shard, each with words.db attached read-only
+# as "catalog" for the vocabulary
+class ShardPool(ConnectionPool):
+  def __init__(self, path, catalog, read_only=False, **kwargs):
+    pragmas = CONNECTION_PRAGMAS + ('PRAGMA query_only=ON',) if read_only else CONNECTION_PRAGMAS
+    super().__init__(f'file:{quote(os.path.abspath(path))}', uri=True, pragmas=pragmas, **kwargs)
+    self.catalog_uri = f'file:{quote(os.path.abspath(catalog))}?mode=ro'
+
+  def _connect(self):
+    connection = super()._connect()
+    connection.execute('ATTACH DATABASE ? AS catalog', (self.catalog_uri,))
+    return connection
+
+# Per-learner database shards.
+#
+# A request naming a learner in the shard header (X-Learner-Id by default)
+# reads and writes that learner's study history in <directory>/<learner>.db,
+# while vocabulary comes from the shared words.db. Requests without the
+# header use words.db for both, as before sharding. Each shard is its own
+# file with its own write lock and WAL, so review writes from different
+# learners never wait on each other.
+#
+# Learner ids are not authenticated, so a shard is only created by a write
+# that starts a learner's history (routes wrapped in creates_shard), and at
+# most max_shards are ever created. Reads for a learner without a shard are
+# served from one read-only, schema-only shard, so they find no history and
+# leave nothing on disk. Existing shards are migrated when opened.
+#
+# At most max_open shard pools stay open, least recently used closed first; a
+# pool closed while a request still holds one of its connections closes that
+# connection on checkin.
+class ShardRouter:
+  def __init__(self, directory, catalog, header='X-Learner-Id', pool_size=2, pool_timeout=30, max_open=64, max_shards=10000):
+    self.directory = directory
+    self.catalog = catalog
+    self.header = header
+    self.pool_size = pool_size
+    self.pool_timeout = pool_timeout
+    self.max_open = max_open
+    self.max_shards = max_shards
+    self._lock = threading.Lock()
+    self._pools = OrderedDict()
+    self._create_lock = threading.Lock()
+    self._empty = None
+    os.makedirs(directory, exist_ok=True)
+
+  def path(self, learner_id):
+    return os.path.join(self.directory, f'{learner_id}.db')
+
+  def learner_ids(self):
+    # Learners that have a shard on disk
+    return sorted(name[:-3] for name in os.listdir(self.directory) if name.endswith('.db') and not name.startswith('.'))
+
+  def exists(self, learner_id):
+    with self._lock:
+      if learner_id in self._pools:
+        return True
+    return os.path.exists(self.path(learner_id))
+
+  def pool(self, learner_id, create=False):
+    # The learner's shard pool; without create, the empty shard's pool if the
+    # learner has none yet
+    with self._lock:
+      pool = self._pools.get(learner_id)
+      if pool is not None:
+        self._pools.move_to_end(learner_id)
+        return pool
+    # Opened outside the lock: opening a shard runs its migrations
+    if os.path.exists(self.path(learner_id)):
+      pool = self._open(learner_id)
+    elif create:
+      pool = self._create(learner_id)
+    else:
+      return self.empty_pool()
+    with self._lock:
+      existing = self._pools.get(learner_id)
+      if existing is not None:
+        # Another thread opened it first
+        evicted = [pool]
+        pool = existing
+      else:
+        self._pools[learner_id] = pool
+        evicted = []
+        while len(self._pools) > self.max_open:
+          evicted.append(self._pools.popitem(last=False)[1])
+    for old in evicted:
+      old.retire()
+    return pool
+
+  def _create(self, learner_id):
+    # Counted from disk so shards created by other processes count too;
+    # serialized so threads creating different learners cannot overshoot
+    with self._create_lock:
+      if not os.path.exists(self.path(learner_id)) and len(self.learner_ids()) >= self.max_shards:
+        raise ShardLimitError(f"No more learners can be added (limit {self.max_shards})")
+      return self._open(learner_id)
+
+  def _open(self, learner_id):
+    pool = ShardPool(self.path(learner_id), self.catalog, size=self.pool_size, timeout=self.pool_timeout)
+    with pool.connection() as connection:
+      try:
+        migrate(connection, SHARD_MIGRATIONS_DIR)
+      except sqlite3.IntegrityError:
+        # Another process applied the same migration first
+        migrate(connection, SHARD_MIGRATIONS_DIR)
+    return pool
+
+  def empty_pool(self):
+    with self._create_lock:
+      if self._empty is None:
+        # Migrated through a writable pool, then only ever read
+        self._open(EMPTY_SHARD).retire()
+        self._empty = ShardPool(
+          self.path(EMPTY_SHARD), self.catalog, read_only=True, size=self.pool_size, timeout=self.pool_timeout
+        )
+      return self._empty
+
+  def learner_id(self):
+    # The learner named by the request, None if it names none
+    value = request.headers.get(self.header, '').strip()
+    if not value:
+      return None
+    if not LEARNER_ID.match(value):
+      raise ValueError(f"{self.header} must be 1-64 letters, digits, '-' or '_'")
+    return value
+
+  def close_all(self):
+    with self._lock:
+      pools = list(self._pools.values())
+      self._pools.clear()
+    with self._create_lock:
+      if self._empty is not None:
+        pools.append(self._empty)
+        self._empty = None
+    for pool in pools:
+      pool.retire()
+
+def creates_shard(view):
+  # For write routes that start a learner's history: creates the request's
+  # shard, if it has none yet, before the view runs
+  @functools.wraps(view)
+  def wrapper(*args, **kwargs):
+    shard = current_shard()
+    if shard is not None and current_app.shards is not None:
+      try:
+        current_app.shards.pool(shard, create=True)
+      except ShardLimitError as e:
+        return jsonify({"error": str(e)}), 503
+    return view(*args, **kwargs)
+  return wrapper
+
+def init_sharding(app, router):
+  # Selects the request's shard before anything opens a connection
+  @app.before_request
+  def select_shard():
+    try:
+      g.shard = router.learner_id()
+    except ValueError as e:
+      return jsonify({"error": str(e)}), 400
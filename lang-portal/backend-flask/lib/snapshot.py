@@ -0,0 +1,195 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import quote
+
+from flask import g
+
+from lib.db import ConnectionPool
+from lib.shards import current_shard
+
+try:
+  import fcntl
+except ImportError:  # Windows: refreshes are only serialized within a process
+  fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Pragmas for the read-only snapshot connections (journal_mode and
+# synchronous are the refresher's business)
+SNAPSHOT_PRAGMAS = (
+  'PRAGMA cache_size=-20000',
+  'PRAGMA mmap_size=268435456',
+  'PRAGMA temp_store=MEMORY',
+  'PRAGMA busy_timeout=5000',
+  'PRAGMA query_only=ON',
+)
+
+def snapshot_path(database):
+  # words.db -> words.snapshot.db
+  root, extension = os.path.splitext(database)
+  return f'{root}.snapshot{extension or ".db"}'
+
+# Read-only copy of the database for dashboard and listing queries.
+#
+# A background thread copies the primary into the snapshot file with the
+# SQLite backup API every max_staleness / 2 seconds, skipping the copy when
+# nothing was committed since the last one (PRAGMA data_version). The copy
+# is one write transaction on the snapshot, so readers see either the old or
+# the new copy, never a mix, and never hold up writers on the primary or its
+# WAL checkpoints. The time each copy was taken is kept as the mtime of
+# <snapshot>.refreshed, so several server processes can share one snapshot
+# file and each of them knows how old it is.
+#
+# A copy costs time proportional to the database size (about 1s for 1M
+# reviews while serving traffic), so a large database wants a larger
+# max_staleness.
+#
+# get()/cursor()/close() mirror Db. A request is served from the snapshot
+# only while it is at most max_staleness seconds old; otherwise (first copy
+# not taken yet, refresher behind) it uses the primary connection. The
+# snapshot copies words.db only, so requests for a learner shard always read
+# the shard.
+class SnapshotDb:
+  def __init__(self, primary, path=None, max_staleness=5, pool_size=5, pool_timeout=30):
+    self.primary = primary
+    self.path = path or snapshot_path(primary.database)
+    self.state_path = self.path + '.refreshed'
+    self.max_staleness = max_staleness
+    self.refresh_interval = max_staleness / 2
+    self.pool = ConnectionPool(
+      f'file:{quote(os.path.abspath(self.path))}?mode=ro',
+      size=pool_size,
+      timeout=pool_timeout,
+      uri=True,
+      pragmas=SNAPSHOT_PRAGMAS
+    )
+    self._refresh_lock = threading.Lock()
+    self._source = None
+    self._target = None
+    self._data_version = None
+    self._thread = None
+    self._stopping = threading.Event()
+    self.refreshes = 0
+    self.fallbacks = 0
+
+  @property
+  def profiler(self):
+    return self.primary.profiler
+
+  def get(self):
+    if current_shard() is not None:
+      return self.primary.get()
+    if 'snapshot_db' not in g:
+      g.snapshot_db = self._checkout_fresh()
+      if g.snapshot_db is None:
+        self.fallbacks += 1
+    return g.snapshot_db or self.primary.get()
+
+  def cursor(self):
+    connection = self.get()
+    if self.profiler is not None:
+      return self.profiler.cursor(connection)
+    return connection.cursor()
+
+  def close(self):
+    if self.profiler is not None:
+      self.profiler.finish_request()
+    connection = g.pop('snapshot_db', None)
+    if connection is not None:
+      self.pool.checkin(connection)
+
+  def _checkout_fresh(self):
+    # A snapshot connection if the snapshot is recent enough, else None
+    age = self.age()
+    if age is None or age > self.max_staleness:
+      return None
+    try:
+      return self.pool.checkout()
+    except sqlite3.OperationalError:
+      # Snapshot file removed from under us
+      return None
+
+  def age(self):
+    # Seconds since the snapshot was taken, None if there is none
+    try:
+      return time.time() - os.stat(self.state_path).st_mtime
+    except FileNotFoundError:
+      return None
+
+  def refresh(self):
+    # Copies the primary into the snapshot, or only marks the snapshot as
+    # current when the primary hasn't changed since the last copy. Returns
+    # True if a copy was made.
+    with self._refresh_lock:
+      if self._source is None:
+        self._source = sqlite3.connect(self.primary.database, check_same_thread=False)
+        self._source.execute('PRAGMA busy_timeout=5000')
+      if self._target is None:
+        self._target = sqlite3.connect(self.path, check_same_thread=False)
+        self._target.execute('PRAGMA busy_timeout=5000')
+      lock = self._lock_file()
+      try:
+        taken_at = time.time()
+        data_version = self._source.execute('PRAGMA data_version').fetchone()[0]
+        copied = data_version != self._data_version or self.age() is None
+        if copied:
+          self._source.backup(self._target)
+          self._data_version = data_version
+          self.refreshes += 1
+        # Until this runs a new copy still reports the previous copy's age,
+        # which errs towards reading the primary
+        with open(self.state_path, 'a'):
+          pass
+        os.utime(self.state_path, (taken_at, taken_at))
+        return copied
+      finally:
+        if lock is not None:
+          lock.close()
+
+  def _lock_file(self):
+    # Serializes refreshes across processes sharing the snapshot file, so a
+    # slow copy can't land after (and overwrite) a newer one
+    if fcntl is None:
+      return None
+    lock = open(self.path + '.lock', 'a')
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+  def start(self):
+    if self._thread is not None:
+      return
+    self._thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+    self._thread.start()
+    atexit.register(self.stop)
+
+  def _run(self):
+    while not self._stopping.is_set():
+      started = time.monotonic()
+      try:
+        # Skip if another process refreshed the shared snapshot in the last
+        # half interval; the snapshot is then still younger than
+        # max_staleness by the next check
+        age = self.age()
+        if age is None or age >= self.refresh_interval / 2:
+          self.refresh()
+      except Exception as e:
+        logger.error("Snapshot refresh failed, reads use the primary until it succeeds: %s", e)
+      # Refreshes start every refresh_interval however long the copy took,
+      # so the snapshot is at most one interval plus one copy old
+      self._stopping.wait(max(0, self.refresh_interval - (time.monotonic() - started)))
+
+  def stop(self):
+    self._stopping.set()
+    if self._thread is not None:
+      self._thread.join(timeout=10)
+      self._thread = None
+    with self._refresh_lock:
+      for connection in (self._source, self._target):
+        if connection is not None:
+          connection.close()
+      self._source = self._target = None
+    self.pool.close_all()
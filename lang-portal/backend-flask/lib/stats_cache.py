@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from lib.shards import current_shard
+
+# Caches the /api/dashboard/stats payload keyed by dashboard_stats.version.
+# The totals themselves are maintained incrementally by triggers (see
+# sql/migrations/0003_dashboard_stats.sql), so a cache hit costs one
+# primary-key lookup and a miss adds only the 30-day active group count.
+#
+# Each learner shard has its own dashboard_stats and so its own entry (the
+# most recently used max_entries are kept). A shard's total_vocabulary comes
+# from the catalog's dashboard_stats, whose version is part of the key.
+class StatsCache:
+  def __init__(self, max_entries=256):
+    self.max_entries = max_entries
+    self._lock = threading.Lock()
+    self._entries = OrderedDict()
+
+  def get(self, cursor):
+    shard = current_shard()
+    cursor.execute('SELECT * FROM dashboard_stats WHERE id = 1')
+    totals = cursor.fetchone()
+    if shard is None:
+      total_vocabulary, catalog_version = totals['total_vocabulary'], None
+    else:
+      cursor.execute('SELECT total_vocabulary, version FROM catalog.dashboard_stats WHERE id = 1')
+      total_vocabulary, catalog_version = cursor.fetchone()
+    # Active groups depend on the date as well as the data
+    key = (totals['version'], catalog_version, date.today())
+    with self._lock:
+      entry = self._entries.get(shard)
+      if entry is not None and entry[0] == key:
+        self._entries.move_to_end(shard)
+        return entry[1]
+
+    # Get number of groups with activity in the last 30 days
+    cursor.execute('''
+      SELECT COUNT(DISTINCT group_id) as active_groups
+      FROM study_sessions
+      WHERE created_at >= date('now', '-30 days')
+    ''')
+    active_groups = cursor.fetchone()['active_groups']
+
+    stats = {
+      "total_vocabulary": total_vocabulary,
+      "total_words_studied": totals['words_studied'],
+      "mastered_words": totals['mastered_words'],
+      "success_rate": totals['correct_reviews'] * 1.0 / totals['total_reviews'] if totals['total_reviews'] else 0,
+      "total_sessions": totals['total_sessions'],
+      "active_groups": active_groups,
+      "current_streak": totals['current_streak']
+    }
+    with self._lock:
+      self._entries[shard] = (key, stats)
+      self._entries.move_to_end(shard)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+    return stats
+
+  def invalidate(self):
+    with self._lock:
+      self._entries.clear()
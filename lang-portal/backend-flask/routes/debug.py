@@ -0,0 +1,20 @@
+from flask import jsonify
+
+def load(app):
+    # Per-statement query stats collected by app.query_profiler; only
+    # available when QUERY_PROFILING is enabled
+    @app.route('/api/_debug/queries', methods=['GET'])
+    def get_query_stats():
+        if app.query_profiler is None:
+            return jsonify({"error": "Query profiling is disabled (set QUERY_PROFILING)"}), 404
+        return jsonify({
+            'slow_ms': app.query_profiler.slow_ms,
+            'statements': app.query_profiler.summary()
+        })
+
+    @app.route('/api/_debug/queries', methods=['DELETE'])
+    def reset_query_stats():
+        if app.query_profiler is None:
+            return jsonify({"error": "Query profiling is disabled (set QUERY_PROFILING)"}), 404
+        app.query_profiler.reset()
+        return jsonify({"message": "Query stats cleared"})
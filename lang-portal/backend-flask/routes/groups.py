@@ -1,10 +1,15 @@
 from flask import request, jsonify, g
-from flask_cors import cross_origin
 import json
 
+from lib.export import export_format
+from lib.pagination import decode_cursor, keyset_condition, keyset_order, keyset_page, word_sort_expressions
+from lib.scheduler import DEFAULT_DUE_LIMIT, MAX_DUE_LIMIT, due_words
+from lib.shards import current_shard
+from lib.session_summary import count_sessions, list_sessions
+
 def load(app):
   @app.route('/api/groups', methods=['GET'])
-  @cross_origin()
+  @app.response_cache.cached('groups')
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -25,12 +30,11 @@ def load(app):
       if order not in ['asc', 'desc']:
         order = 'asc'
 
-      # Query to fetch groups with sorting and the cached word count
+      # Query to fetch groups with sorting and the cached word count, kept
+      # current by the triggers on word_groups (both sorts are indexed)
       cursor.execute(f'''
-        SELECT g.id, g.name, COUNT(wg.word_id) as words_count
-        FROM groups g
-        LEFT JOIN word_groups wg ON g.id = wg.group_id
-        GROUP BY g.id, g.name
+        SELECT id, name, words_count
+        FROM groups
         ORDER BY {sort_by} {order}
         LIMIT ? OFFSET ?
       ''', (groups_per_page, offset))
@@ -61,19 +65,12 @@ def load(app):
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/groups/<int:id>', methods=['GET'])
-  @cross_origin()
   def get_group(id):
     try:
       cursor = app.db.cursor()
 
       # Get group details
-      cursor.execute('''
-        SELECT g.id, g.name, COUNT(wg.word_id) as words_count
-        FROM groups g
-        LEFT JOIN word_groups wg ON g.id = wg.group_id
-        WHERE g.id = ?
-        GROUP BY g.id, g.name
-      ''', (id,))
+      cursor.execute('SELECT id, name, words_count FROM groups WHERE id = ?', (id,))
       
       group = cursor.fetchone()
       if not group:
@@ -87,8 +84,8 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Pass ?cursor= (empty for the first page) to page by keyset instead of offset
   @app.route('/api/groups/<int:id>/words', methods=['GET'])
-  @cross_origin()
   def get_group_words(id):
     try:
       cursor = app.db.cursor()
@@ -97,6 +94,7 @@ def load(app):
       page = int(request.args.get('page', 1))
       words_per_page = 10
       offset = (page - 1) * words_per_page
+      page_cursor = request.args.get('cursor')
 
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'english')
@@ -110,33 +108,38 @@ def load(app):
         order = 'asc'
 
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
+      cursor.execute('SELECT name, words_count FROM groups WHERE id = ?', (id,))
       group = cursor.fetchone()
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      # Query to fetch words with pagination and sorting
-      cursor.execute(f'''
+      query = '''
         SELECT w.id, w.english, w.spanish, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
+               COALESCE(r.correct_count, 0) as correct_count,
+               COALESCE(r.wrong_count, 0) as wrong_count
         FROM words w
         JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
+        LEFT JOIN word_reviews r ON w.id = r.word_id
         WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
-      
-      words = cursor.fetchall()
+      '''
 
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
+      if page_cursor is not None:
+        # Keyset mode: seek past the last row of the previous page
+        sort_expression = word_sort_expressions[sort_by]
+        params = [id]
+        if page_cursor:
+          query += ' AND ' + keyset_condition(sort_expression, 'w.id', order)
+          params.extend(decode_cursor(page_cursor))
+        query += f' ORDER BY {keyset_order(sort_expression, "w.id", order)} LIMIT ?'
+        cursor.execute(query, params + [words_per_page + 1])
+        words, next_cursor = keyset_page(cursor.fetchall(), words_per_page, sort_by)
+      else:
+        # Query to fetch words with pagination and sorting
+        cursor.execute(query + f' ORDER BY {sort_by} {order} LIMIT ? OFFSET ?', (id, words_per_page, offset))
+        words = cursor.fetchall()
+
+      # Total words for pagination from the group's word count
+      total_words = group['words_count']
       total_pages = (total_words + words_per_page - 1) // words_per_page
 
       # Format the response
@@ -149,17 +152,28 @@ def load(app):
           "correct_count": word["correct_count"],
           "wrong_count": word["wrong_count"]
         })
+      # Include reviews still waiting in the review log
+      app.review_queue.merge_word_counts(words_data)
+
+      if page_cursor is not None:
+        return jsonify({
+          'words': words_data,
+          'next_cursor': next_cursor,
+          'total_pages': total_pages
+        })
 
       return jsonify({
         'words': words_data,
         'total_pages': total_pages,
         'current_page': page
       })
+    except ValueError as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/groups/<id>/words/raw', methods=['GET'])
-  @cross_origin()
+  @app.response_cache.cached('groups', 'words', 'word_groups', 'word_reviews', versions=lambda: app.review_queue.version)
   def get_group_words_raw(id):
     try:
       cursor = app.db.cursor()
@@ -187,24 +201,91 @@ def load(app):
       
       words = cursor.fetchall()
       
+      words_data = [{
+        'id': word['id'],
+        'english': word['english'],
+        'spanish': word['spanish'],
+        'correct_count': word['correct_count'],
+        'wrong_count': word['wrong_count']
+      } for word in words]
+      # Include reviews still waiting in the review log
+      app.review_queue.merge_word_counts(words_data)
+
       return jsonify({
-        'words': [{
-          'id': word['id'],
-          'english': word['english'],
-          'spanish': word['spanish'],
-          'correct_count': word['correct_count'],
-          'wrong_count': word['wrong_count']
-        } for word in words]
+        'words': words_data
       })
 
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Streams every word in the group with its review counts as NDJSON
+  # (default) or CSV, in word id order so no sort has to buffer the group
+  @app.route('/api/groups/<int:id>/words/export', methods=['GET'])
+  def export_group_words(id):
+    try:
+      format = export_format(request.args.get('format'))
+      if not format:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+      cursor = app.db.cursor()
+
+      # Verify group exists
+      cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      # Commit reviews still waiting in the review log so the counts include them
+      app.review_queue.flush()
+
+      return app.exports.response(format, f'group-{id}-words', '''
+        SELECT
+          w.id,
+          w.english,
+          w.spanish,
+          COALESCE(wr.correct_count, 0) as correct_count,
+          COALESCE(wr.wrong_count, 0) as wrong_count
+        FROM word_groups wg
+        JOIN words w ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON w.id = wr.word_id
+        WHERE wg.group_id = ?
+        ORDER BY wg.word_id
+      ''', (id,))
+
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Next words to study in the group by their spaced repetition schedule:
+  # overdue words first, then words never reviewed
+  @app.route('/api/groups/<int:id>/due', methods=['GET'])
+  def get_group_due_words(id):
+    try:
+      cursor = app.db.cursor()
+
+      # Verify group exists
+      cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      limit = request.args.get('limit', DEFAULT_DUE_LIMIT, type=int)
+      limit = max(1, min(limit, MAX_DUE_LIMIT))
+      include_new = request.args.get('include_new', 'true').lower() != 'false'
+
+      return jsonify({
+        'words': due_words(
+          cursor,
+          id,
+          limit=limit,
+          include_new=include_new,
+          learner_schedules=current_shard() is not None
+        )
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/api/groups/<int:id>/study_sessions', methods=['GET'])
-  @cross_origin()
   def get_group_study_sessions(id):
     try:
-      cursor = app.db.cursor()
+      cursor = app.read_db.cursor()
       
       # Get pagination parameters
       page = int(request.args.get('page', 1))
@@ -212,76 +293,24 @@ def load(app):
       offset = (page - 1) * sessions_per_page
 
       # Get sorting parameters
-      sort_by = request.args.get('sort_by', 'created_at')
+      sort_by = request.args.get('sort_by', 'start_time')
       order = request.args.get('order', 'desc')  # Default to newest first
 
-      # Map frontend sort keys to database columns
-      sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
-        'activityName': 'a.name',
-        'groupName': 'g.name',
-        'reviewItemsCount': 'review_count'
-      }
-
-      # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
-
       # Get total count for pagination
-      cursor.execute('''
-        SELECT COUNT(*)
-        FROM study_sessions
-        WHERE group_id = ?
-      ''', (id,))
-      total_sessions = cursor.fetchone()[0]
+      total_sessions = count_sessions(cursor, group_id=id)
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
-      cursor.execute(f'''
-        SELECT 
-          s.id,
-          s.group_id,
-          s.study_activity_id,
-          s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
-          a.name as activity_name,
-          g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
-        FROM study_sessions s
-        JOIN study_activities a ON s.study_activity_id = a.id
-        JOIN groups g ON s.group_id = g.id
-        WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, sessions_per_page, offset))
-      
-      sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
-        })
+      # Sessions with their review totals and end time in one query
+      sessions_data = list_sessions(
+        cursor,
+        sort_by=sort_by,
+        order=order,
+        limit=sessions_per_page,
+        offset=offset,
+        group_id=id
+      )
+      for session in sessions_data:
+        session['study_activity_id'] = session['activity_id']
 
       return jsonify({
         'study_sessions': sessions_data,
@@ -1,10 +1,11 @@
 from flask import jsonify, request
-from flask_cors import cross_origin
 import math
 
+from lib.session_summary import count_sessions, list_sessions
+
 def load(app):
     @app.route('/api/study_activities', methods=['GET'])
-    @cross_origin()
+    @app.response_cache.cached('study_activities')
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
@@ -18,7 +19,6 @@ def load(app):
         } for activity in activities])
 
     @app.route('/api/study_activities/<int:id>', methods=['GET'])
-    @cross_origin()
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -35,9 +35,8 @@ def load(app):
         })
 
     @app.route('/api/study_activities/<int:id>/sessions', methods=['GET'])
-    @cross_origin()
     def get_study_activity_sessions(id):
-        cursor = app.db.cursor()
+        cursor = app.read_db.cursor()
         
         # Verify activity exists
         cursor.execute('SELECT id FROM study_activities WHERE id = ?', (id,))
@@ -50,46 +49,13 @@ def load(app):
         offset = (page - 1) * per_page
 
         # Get total count
-        cursor.execute('''
-            SELECT COUNT(*) as count 
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            WHERE ss.study_activity_id = ?
-        ''', (id,))
-        total_count = cursor.fetchone()['count']
+        total_count = count_sessions(cursor, activity_id=id)
 
-        # Get paginated sessions
-        cursor.execute('''
-            SELECT 
-                ss.id,
-                ss.group_id,
-                g.name as group_name,
-                sa.name as activity_name,
-                ss.created_at,
-                ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-            WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
-            ORDER BY ss.created_at DESC
-            LIMIT ? OFFSET ?
-        ''', (id, per_page, offset))
-        sessions = cursor.fetchall()
+        # Get paginated sessions with their review totals
+        sessions = list_sessions(cursor, limit=per_page, offset=offset, activity_id=id)
 
         return jsonify({
-            'items': [{
-                'id': session['id'],
-                'group_id': session['group_id'],
-                'group_name': session['group_name'],
-                'activity_id': session['activity_id'],
-                'activity_name': session['activity_name'],
-                'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-                'review_items_count': session['review_items_count']
-            } for session in sessions],
+            'items': sessions,
             'total': total_count,
             'page': page,
             'per_page': per_page,
@@ -97,7 +63,6 @@ def load(app):
         })
 
     @app.route('/api/study_activities/<int:id>/launch', methods=['GET'])
-    @cross_origin()
     def get_study_activity_launch_data(id):
         cursor = app.db.cursor()
         
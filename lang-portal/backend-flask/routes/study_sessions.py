@@ -1,15 +1,18 @@
 from flask import request, jsonify, g
-from flask_cors import cross_origin
 from datetime import datetime
 import math
 
+from lib.export import export_format
+from lib.reviews import chunked, iter_ndjson, record_reviews, validate_reviews
+from lib.session_summary import count_sessions, get_session, list_sessions
+from lib.shards import creates_shard, current_shard
+
 def load(app):
 
   @app.route('/api/study_sessions', methods=['GET'])
-  @cross_origin()
   def get_study_sessions():
     try:
-      cursor = app.db.cursor()
+      cursor = app.read_db.cursor()
       
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
@@ -17,45 +20,13 @@ def load(app):
       offset = (page - 1) * per_page
 
       # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      total_count = count_sessions(cursor)
 
-      # Get paginated sessions
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
-        LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      # Get paginated sessions with their review totals
+      sessions = list_sessions(cursor, limit=per_page, offset=offset)
 
       return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+        'items': sessions,
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -65,7 +36,7 @@ def load(app):
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study_sessions', methods=['POST'])
-  @cross_origin()
+  @creates_shard
   def create_study_session():
     try:
       # Get request data
@@ -104,24 +75,7 @@ def load(app):
       app.db.commit()
 
       # Get the created session details
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        WHERE ss.id = ?
-        GROUP BY ss.id
-      ''', (session_id,))
-      
-      session = cursor.fetchone()
+      session = get_session(cursor, session_id)
 
       return jsonify({
         'id': session['id'],
@@ -129,7 +83,7 @@ def load(app):
         'group_name': session['group_name'],
         'activity_id': session['activity_id'],
         'activity_name': session['activity_name'],
-        'start_time': session['created_at'],
+        'start_time': session['start_time'],
         'review_items_count': session['review_items_count']
       }), 201
 
@@ -138,33 +92,21 @@ def load(app):
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study_sessions/<id>', methods=['GET'])
-  @cross_origin()
   def get_study_session(id):
     try:
       cursor = app.db.cursor()
       
       # Get session details
-      cursor.execute('''
-        SELECT 
-          ss.id,
-          ss.group_id,
-          g.name as group_name,
-          sa.id as activity_id,
-          sa.name as activity_name,
-          ss.created_at,
-          COUNT(wri.id) as review_items_count
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        WHERE ss.id = ?
-        GROUP BY ss.id
-      ''', (id,))
-      
-      session = cursor.fetchone()
+      session = get_session(cursor, id)
       if not session:
         return jsonify({"error": "Study session not found"}), 404
 
+      # Include reviews still waiting in the review log
+      pending_reviews, pending_correct, pending_wrong = app.review_queue.pending_session_counts(session['id'])
+      session['review_items_count'] += pending_reviews
+      session['correct_count'] += pending_correct
+      session['wrong_count'] += pending_wrong
+
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
@@ -197,16 +139,7 @@ def load(app):
       total_count = cursor.fetchone()['count']
 
       return jsonify({
-        'session': {
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
-        },
+        'session': session,
         'words': [{
           'id': word['id'],
           'spanish': word['spanish'],
@@ -222,16 +155,52 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
+  # Reads the reviews from a review submission. Accepts a single review
+  # ({"word_id", "correct"}), a batch ({"words": [...]} or a bare array), or an
+  # application/x-ndjson body with one review per line. Returns (items, error).
+  def review_items_from_request():
+    if request.mimetype == 'application/x-ndjson':
+      # Stream the body line by line instead of loading it whole
+      return iter_ndjson(request.stream), None
+
+    if not request.is_json:
+      return None, (jsonify({"error": "Missing JSON in request"}), 400)
+
+    data = request.get_json()
+    if not data:
+      return None, (jsonify({"error": "No review data provided"}), 400)
+
+    # Check if it's a batch review (array of words) or individual review
+    if isinstance(data, list):
+      return data, None
+    if 'words' in data:
+      return data['words'], None
+    # Handle individual word review (from typing tutor)
+    if 'word_id' in data and 'correct' in data:
+      return [data], None
+    return None, (jsonify({"error": "Invalid review data format"}), 400)
+
+  def review_response(results, status, message):
+    accepted = sum(1 for result in results if result['status'] == 'ok')
+    response = {
+      "message": message,
+      "accepted": accepted,
+      "rejected": len(results) - accepted,
+      "results": results
+    }
+    if results and not accepted:
+      response["message"] = "No valid reviews submitted"
+      return jsonify(response), 400
+    return jsonify(response), status
+
+  # Valid reviews are applied in one transaction; the response reports a
+  # result for every item in input order.
   @app.route('/api/study_sessions/<id>/review', methods=['POST'])
-  @cross_origin()
   def submit_session_review(id):
     try:
-      if not request.is_json:
-        return jsonify({"error": "Missing JSON in request"}), 400
-
-      data = request.get_json()
-      if not data:
-        return jsonify({"error": "No review data provided"}), 400
+      items, error = review_items_from_request()
+      if error:
+        return error
 
       cursor = app.db.cursor()
 
@@ -241,91 +210,98 @@ def load(app):
       if not session:
         return jsonify({"error": "Study session not found"}), 404
 
-      # Begin transaction for word reviews
-      cursor.execute('BEGIN TRANSACTION')
-
+      # Record the reviews with one executemany per chunk, all in a single
+      # transaction. The trigger on word_review_items keeps word_reviews and
+      # the session/day rollups current.
+      reviewed_at = datetime.now()
+      results = []
       try:
-        # Check if it's a batch review (array of words) or individual review
-        if 'words' in data:
-          # Process each word review in batch
-          for word_review in data['words']:
-            word_id = word_review.get('word_id')
-            correct = word_review.get('correct')
-
-            if word_id is None or correct is None:
-              raise ValueError("Invalid word review data")
-
-            # Process the word review
-            process_word_review(cursor, id, word_id, correct)
-        
-        # Handle individual word review (from typing tutor)
-        elif 'word_id' in data and 'correct' in data:
-          word_id = data['word_id']
-          correct = data['correct']
-          
-          # Process the individual word review
-          process_word_review(cursor, id, word_id, correct)
-        
-        else:
-          return jsonify({"error": "Invalid review data format"}), 400
-
+        for chunk in chunked(enumerate(items)):
+          results.extend(record_reviews(cursor, app.word_ids, session['id'], chunk, reviewed_at))
         app.db.commit()
-        return jsonify({"message": "Review submitted successfully"}), 200
-
       except Exception as e:
-        cursor.execute('ROLLBACK')
+        app.db.rollback()
         return jsonify({"error": str(e)}), 400
 
+      return review_response(results, 200, "Review submitted successfully")
+
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
-  # Helper function to process a word review
-  def process_word_review(cursor, session_id, word_id, correct):
-    # Check if word review exists
-    cursor.execute('SELECT word_id FROM word_reviews WHERE word_id = ?', (word_id,))
-    review_exists = cursor.fetchone()
+  # Write-behind variant of /review: reviews are validated, journaled and
+  # acknowledged with 202 right away, then committed in the background by
+  # app.review_queue. Reads merge in reviews that are still pending.
+  @app.route('/api/study_sessions/<id>/review_log', methods=['POST'])
+  def append_session_review_log(id):
+    try:
+      items, error = review_items_from_request()
+      if error:
+        return error
 
-    if review_exists:
-      # Update existing review
-      cursor.execute('''
-        UPDATE word_reviews 
-        SET correct_count = correct_count + ?,
-            wrong_count = wrong_count + ?,
-            last_reviewed = ?
-        WHERE word_id = ?
-      ''', (
-        1 if correct else 0,
-        0 if correct else 1,
-        datetime.now(),
-        word_id
-      ))
-    else:
-      # Insert new review
-      cursor.execute('''
-        INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
-        VALUES (?, ?, ?, ?)
-      ''', (
-        word_id,
-        1 if correct else 0,
-        0 if correct else 1,
-        datetime.now()
-      ))
-    
-    # Insert record into word_review_items table to track this review for the session
-    cursor.execute('''
-      INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
-      VALUES (?, ?, ?, ?)
-    ''', (
-      session_id,
-      word_id,
-      correct,
-      datetime.now()
-    ))
+      cursor = app.db.cursor()
+
+      # Verify session exists
+      cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
+      session = cursor.fetchone()
+      if not session:
+        return jsonify({"error": "Study session not found"}), 404
+
+      # Every chunk is validated before anything is journaled, so a failure
+      # part way through accepts none of the request and a retry cannot
+      # record reviews twice
+      results = []
+      accepted = []
+      for chunk in chunked(enumerate(items)):
+        chunk_results, reviews = validate_reviews(cursor, app.word_ids, chunk)
+        results.extend(chunk_results)
+        accepted.extend(reviews)
+
+      created_at = datetime.now().isoformat(sep=' ')
+      journal_ids = iter(app.review_queue.append(session['id'], accepted, created_at) if accepted else [])
+      for result in results:
+        if result['status'] == 'ok':
+          result['journal_id'] = next(journal_ids)
+
+      return review_response(results, 202, "Review accepted")
+
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Streams the review history (word_review_items) as NDJSON (default) or
+  # CSV for analysis, optionally for one session, in the order it was recorded
+  @app.route('/api/study_sessions/reviews/export', methods=['GET'])
+  def export_review_items():
+    try:
+      format = export_format(request.args.get('format'))
+      if not format:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+      session_id = request.args.get('study_session_id', type=int)
+
+      # Commit reviews still waiting in the review log so they are included
+      app.review_queue.flush()
+
+      where = 'WHERE study_session_id = ?' if session_id is not None else ''
+      filename = 'reviews' if session_id is None else f'session-{session_id}-reviews'
+      return app.exports.response(format, filename, f'''
+        SELECT id, study_session_id, word_id, correct, created_at
+        FROM word_review_items
+        {where}
+        ORDER BY id
+      ''', [] if session_id is None else [session_id])
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study_sessions/reset', methods=['POST'])
-  @cross_origin()
   def reset_study_sessions():
     try:
+      # Commit reviews still waiting in the review log so they are cleared too
+      app.review_queue.flush()
+
+      # A learner without a shard has no history to clear
+      shard = current_shard()
+      if shard is not None and not app.shards.exists(shard):
+        return jsonify({"message": "Study history cleared successfully"}), 200
+
       cursor = app.db.cursor()
       
       # First delete all word review items since they have foreign key constraints
@@ -333,6 +309,14 @@ def load(app):
       
       # Then delete all study sessions
       cursor.execute('DELETE FROM study_sessions')
+
+      # And the review rollups built from that history
+      cursor.execute('DELETE FROM study_session_stats')
+      cursor.execute('DELETE FROM daily_review_stats')
+      cursor.execute('DELETE FROM word_reviews')
+
+      # Every word starts over as new
+      cursor.execute('DELETE FROM word_schedules')
       
       app.db.commit()
       
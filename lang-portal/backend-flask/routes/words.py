@@ -1,11 +1,15 @@
 from flask import request, jsonify, g
-from flask_cors import cross_origin
 import json
 
+from lib.export import export_format
+from lib.pagination import decode_cursor, keyset_condition, keyset_order, keyset_page, word_sort_expressions
+from lib.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, SEARCH_FIELDS, search_words
+
 def load(app):
   # Endpoint: GET /api/words with pagination (50 words per page)
+  # Pass ?cursor= (empty for the first page) to page by keyset instead of
+  # offset; each response then carries the next_cursor for the following page.
   @app.route('/api/words', methods=['GET'])
-  @cross_origin()
   def get_words():
     try:
       cursor = app.db.cursor()
@@ -16,6 +20,7 @@ def load(app):
       page = max(1, page)
       words_per_page = 50
       offset = (page - 1) * words_per_page
+      page_cursor = request.args.get('cursor')
 
       # Get sorting parameters from the query string
       sort_by = request.args.get('sort_by', 'english')  # Default to sorting by 'english'
@@ -31,7 +36,7 @@ def load(app):
 
       # Base query for words
       base_query = '''
-        SELECT DISTINCT w.id, w.english, w.spanish, 
+        SELECT {distinct} w.id, w.english, w.spanish, 
             COALESCE(r.correct_count, 0) AS correct_count,
             COALESCE(r.wrong_count, 0) AS wrong_count
         FROM words w
@@ -46,30 +51,44 @@ def load(app):
 
       # Add group filter if specified
       params = []
+      conditions = []
       if group:
         group_join = '''
           JOIN word_groups wg ON w.id = wg.word_id
           JOIN groups g ON wg.group_id = g.id
-          WHERE g.name = ?
         '''
         base_query += group_join
-        count_query += group_join
+        count_query += group_join + ' WHERE g.name = ?'
+        conditions.append('g.name = ?')
         params.append(group)
 
-      # Add sorting and pagination to the base query
-      base_query += f' ORDER BY {sort_by} {order} LIMIT ? OFFSET ?'
-      params_with_limit = params.copy()
-      params_with_limit.extend([words_per_page, offset])
-
-      # Get total words count
-      cursor.execute(count_query, params)
-      total_words = cursor.fetchone()[0]
+      # Get total words count (cached between pages)
+      total_words = app.count_cache.get(
+        ('words', group),
+        lambda: cursor.execute(count_query, params).fetchone()[0]
+      )
       total_pages = (total_words + words_per_page - 1) // words_per_page
 
-      # Get words for current page
-      cursor.execute(base_query, params_with_limit)
-
-      words = cursor.fetchall()
+      if page_cursor is not None:
+        # Keyset mode: seek past the last row of the previous page
+        sort_expression = word_sort_expressions[sort_by]
+        if page_cursor:
+          conditions.append(keyset_condition(sort_expression, 'w.id', order))
+          params.extend(decode_cursor(page_cursor))
+        query = base_query.format(distinct='')
+        if conditions:
+          query += ' WHERE ' + ' AND '.join(conditions)
+        query += f' ORDER BY {keyset_order(sort_expression, "w.id", order)} LIMIT ?'
+        cursor.execute(query, params + [words_per_page + 1])
+        words, next_cursor = keyset_page(cursor.fetchall(), words_per_page, sort_by)
+      else:
+        # Add sorting and pagination to the base query
+        query = base_query.format(distinct='DISTINCT')
+        if conditions:
+          query += ' WHERE ' + ' AND '.join(conditions)
+        query += f' ORDER BY {sort_by} {order} LIMIT ? OFFSET ?'
+        cursor.execute(query, params + [words_per_page, offset])
+        words = cursor.fetchall()
 
       # Format the response
       words_data = []
@@ -81,6 +100,16 @@ def load(app):
           "correct_count": word["correct_count"],
           "wrong_count": word["wrong_count"]
         })
+      # Include reviews still waiting in the review log
+      app.review_queue.merge_word_counts(words_data)
+
+      if page_cursor is not None:
+        return jsonify({
+          "words": words_data,
+          "next_cursor": next_cursor,
+          "total_pages": total_pages,
+          "total_words": total_words
+        })
 
       return jsonify({
         "words": words_data,
@@ -89,14 +118,65 @@ def load(app):
         "total_words": total_words
       })
 
+    except ValueError as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /api/words/export streams every word with its review
+  # counts as NDJSON (default) or CSV (?format=csv), in id order
+  @app.route('/api/words/export', methods=['GET'])
+  def export_words():
+    try:
+      format = export_format(request.args.get('format'))
+      if not format:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+      # Commit reviews still waiting in the review log so the counts include them
+      app.review_queue.flush()
+
+      return app.exports.response(format, 'words', '''
+        SELECT
+          w.id,
+          w.english,
+          w.spanish,
+          COALESCE(wr.correct_count, 0) as correct_count,
+          COALESCE(wr.wrong_count, 0) as wrong_count
+        FROM words w
+        LEFT JOIN word_reviews wr ON w.id = wr.word_id
+        ORDER BY w.id
+      ''')
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /api/words/search?q= for autocomplete and accent-insensitive
+  # search over english and spanish (?field= narrows it to one of them)
+  @app.route('/api/words/search', methods=['GET'])
+  @app.response_cache.cached('words')
+  def search_words_route():
+    try:
+      text = request.args.get('q', '').strip()
+      if not text:
+        return jsonify({"error": "q is required"}), 400
+
+      field = request.args.get('field')
+      if field is not None and field not in SEARCH_FIELDS:
+        return jsonify({"error": f"field must be one of: {', '.join(SEARCH_FIELDS)}"}), 400
+
+      limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+      limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+
+      cursor = app.db.cursor()
+      return jsonify({
+        'query': text,
+        'words': search_words(cursor, text, limit=limit, field=field)
+      })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
 
   # Endpoint: GET /api/words/:id to get a single word with its details
   @app.route('/api/words/<int:word_id>', methods=['GET'])
-  @cross_origin()
+  @app.response_cache.cached('words', 'word_reviews', 'word_groups', 'groups', versions=lambda: app.review_queue.version)
   def get_word(word_id):
     try:
       cursor = app.db.cursor()
@@ -131,16 +211,17 @@ def load(app):
             "name": group_name
           })
       
+      # Include reviews still waiting in the review log
+      pending_correct, pending_wrong = app.review_queue.pending_word_counts(word["id"])
+
       return jsonify({
         "id": word["id"],
         "english": word["english"],
         "spanish": word["spanish"],
-        "correct_count": word["correct_count"],
-        "wrong_count": word["wrong_count"],
+        "correct_count": word["correct_count"] + pending_correct,
+        "wrong_count": word["wrong_count"] + pending_wrong,
         "groups": groups
       })
       
     except Exception as e:
-      return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
\ No newline at end of file
+      return jsonify({"error": str(e)}), 500
\ No newline at end of file
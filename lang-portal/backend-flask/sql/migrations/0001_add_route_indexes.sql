@@ -0,0 +1,26 @@
+-- Covering indexes for the queries in routes/*.py
+
+-- /api/words and /api/groups/<id>/words sort by english or spanish
+CREATE INDEX IF NOT EXISTS idx_words_english ON words(english);
+CREATE INDEX IF NOT EXISTS idx_words_spanish ON words(spanish);
+
+-- /api/groups sorts by name, /api/words filters by group name
+CREATE INDEX IF NOT EXISTS idx_groups_name ON groups(name);
+
+-- Group word listings and the group list on /api/words/<id>
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id ON word_groups(group_id, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id ON word_groups(word_id, group_id);
+
+-- Joined onto every word listing for the correct/wrong counts
+CREATE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id, correct_count, wrong_count);
+
+-- Per-session review counts, results and last activity time
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items(study_session_id, correct, created_at);
+
+-- Per-word review history (words studied, mastered words)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items(word_id, correct);
+
+-- Session listings ordered by start time, optionally filtered by group or activity
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id ON study_sessions(group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id ON study_sessions(study_activity_id, created_at);
@@ -0,0 +1,87 @@
+-- Materialized review statistics maintained by a trigger on word_review_items.
+-- Recording a review is a single INSERT into word_review_items; the trigger
+-- keeps the per-word, per-session and per-day rollups in step.
+
+-- word_reviews becomes one row per word so it can be upserted.
+-- Fold any duplicate rows into the first one before adding the constraint.
+UPDATE word_reviews
+SET correct_count = (SELECT SUM(d.correct_count) FROM word_reviews d WHERE d.word_id = word_reviews.word_id),
+    wrong_count = (SELECT SUM(d.wrong_count) FROM word_reviews d WHERE d.word_id = word_reviews.word_id),
+    last_reviewed = (SELECT MAX(d.last_reviewed) FROM word_reviews d WHERE d.word_id = word_reviews.word_id)
+WHERE word_id IN (SELECT word_id FROM word_reviews GROUP BY word_id HAVING COUNT(*) > 1);
+
+DELETE FROM word_reviews
+WHERE rowid NOT IN (SELECT MIN(rowid) FROM word_reviews GROUP BY word_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id_unique ON word_reviews(word_id);
+
+-- Per-session rollup
+CREATE TABLE IF NOT EXISTS study_session_stats (
+  study_session_id INTEGER PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0,
+  first_review_at DATETIME,
+  last_review_at DATETIME,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+INSERT INTO study_session_stats (study_session_id, review_count, correct_count, wrong_count, first_review_at, last_review_at)
+SELECT
+  study_session_id,
+  COUNT(*),
+  SUM(CASE WHEN correct THEN 1 ELSE 0 END),
+  SUM(CASE WHEN correct THEN 0 ELSE 1 END),
+  MIN(created_at),
+  MAX(created_at)
+FROM word_review_items
+GROUP BY study_session_id;
+
+-- Per-day rollup
+CREATE TABLE IF NOT EXISTS daily_review_stats (
+  study_date DATE PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT INTO daily_review_stats (study_date, review_count, correct_count, wrong_count)
+SELECT
+  date(created_at),
+  COUNT(*),
+  SUM(CASE WHEN correct THEN 1 ELSE 0 END),
+  SUM(CASE WHEN correct THEN 0 ELSE 1 END)
+FROM word_review_items
+GROUP BY date(created_at);
+
+CREATE TRIGGER IF NOT EXISTS word_review_items_rollup_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.word_id, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END, NEW.created_at)
+  ON CONFLICT (word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = excluded.last_reviewed;
+
+  INSERT INTO study_session_stats (study_session_id, review_count, correct_count, wrong_count, first_review_at, last_review_at)
+  VALUES (NEW.study_session_id, 1, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END, NEW.created_at, NEW.created_at)
+  ON CONFLICT (study_session_id) DO UPDATE SET
+    review_count = review_count + 1,
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_review_at = MAX(last_review_at, excluded.last_review_at);
+
+  INSERT INTO daily_review_stats (study_date, review_count, correct_count, wrong_count)
+  VALUES (date(NEW.created_at), 1, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END)
+  ON CONFLICT (study_date) DO UPDATE SET
+    review_count = review_count + 1,
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_rollup_delete
+AFTER DELETE ON study_sessions
+BEGIN
+  DELETE FROM study_session_stats WHERE study_session_id = OLD.id;
+END;
@@ -0,0 +1,150 @@
+-- Single-row table of dashboard totals, kept current by triggers so
+-- /api/dashboard/stats never aggregates the review history. version is
+-- bumped by every write that changes a total and keys the in-process cache.
+
+CREATE TABLE IF NOT EXISTS dashboard_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0,
+  total_vocabulary INTEGER NOT NULL DEFAULT 0,
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  total_reviews INTEGER NOT NULL DEFAULT 0,
+  correct_reviews INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,  -- Words with at least one review
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- At least 5 reviews and >= 80% correct
+  current_streak INTEGER NOT NULL DEFAULT 0,  -- Consecutive study days ending on last_study_date
+  last_study_date DATE
+);
+
+INSERT OR IGNORE INTO dashboard_stats (id) VALUES (1);
+
+UPDATE dashboard_stats SET
+  total_vocabulary = (SELECT COUNT(*) FROM words),
+  total_sessions = (SELECT COUNT(*) FROM study_sessions),
+  total_reviews = (SELECT COUNT(*) FROM word_review_items),
+  correct_reviews = (SELECT COUNT(*) FROM word_review_items WHERE correct),
+  words_studied = (SELECT COUNT(*) FROM word_reviews WHERE correct_count + wrong_count > 0),
+  mastered_words = (
+    SELECT COUNT(*) FROM word_reviews
+    WHERE correct_count + wrong_count >= 5
+    AND correct_count * 1.0 / (correct_count + wrong_count) >= 0.8
+  ),
+  last_study_date = (SELECT MAX(date(created_at)) FROM study_sessions),
+  current_streak = (
+    -- Days in the same run share julianday(day) - row_number
+    WITH days AS (
+      SELECT DISTINCT date(created_at) AS study_date FROM study_sessions
+    ),
+    runs AS (
+      SELECT study_date, julianday(study_date) - ROW_NUMBER() OVER (ORDER BY study_date) AS run
+      FROM days
+    )
+    SELECT COUNT(*) FROM runs
+    WHERE run = (SELECT run FROM runs ORDER BY study_date DESC LIMIT 1)
+  ),
+  version = version + 1
+WHERE id = 1;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_words_insert
+AFTER INSERT ON words
+BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary + 1, version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_words_delete
+AFTER DELETE ON words
+BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary - 1, version = version + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_sessions_insert
+AFTER INSERT ON study_sessions
+BEGIN
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions + 1,
+    current_streak = CASE
+      WHEN last_study_date IS NULL THEN 1
+      WHEN date(NEW.created_at) <= last_study_date THEN current_streak
+      WHEN julianday(date(NEW.created_at)) - julianday(last_study_date) = 1 THEN current_streak + 1
+      ELSE 1
+    END,
+    last_study_date = MAX(COALESCE(last_study_date, date(NEW.created_at)), date(NEW.created_at)),
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_sessions_delete
+AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions - 1,
+    current_streak = CASE WHEN total_sessions = 1 THEN 0 ELSE current_streak END,
+    last_study_date = CASE WHEN total_sessions = 1 THEN NULL ELSE last_study_date END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_review_items_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE dashboard_stats SET
+    total_reviews = total_reviews + 1,
+    correct_reviews = correct_reviews + CASE WHEN NEW.correct THEN 1 ELSE 0 END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_review_items_delete
+AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE dashboard_stats SET
+    total_reviews = total_reviews - 1,
+    correct_reviews = correct_reviews - CASE WHEN OLD.correct THEN 1 ELSE 0 END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+-- word_reviews rows are upserted by the word_review_items trigger; track
+-- how each change moves a word in or out of "studied" and "mastered"
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_insert
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied + (NEW.correct_count + NEW.wrong_count > 0),
+    mastered_words = mastered_words + (
+      NEW.correct_count + NEW.wrong_count >= 5
+      AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+    )
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_update
+AFTER UPDATE ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied
+      + (NEW.correct_count + NEW.wrong_count > 0)
+      - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      + (
+        NEW.correct_count + NEW.wrong_count >= 5
+        AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+      )
+      - (
+        OLD.correct_count + OLD.wrong_count >= 5
+        AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+      )
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_delete
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words - (
+      OLD.correct_count + OLD.wrong_count >= 5
+      AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+    ),
+    version = version + 1
+  WHERE id = 1;
+END;
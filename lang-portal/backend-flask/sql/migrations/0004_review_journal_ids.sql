@@ -0,0 +1,7 @@
+-- Reviews accepted through the write-behind review log carry the id of their
+-- journal entry. The unique index makes replaying the journal after a restart
+-- idempotent: entries that were already committed are ignored.
+ALTER TABLE word_review_items ADD COLUMN journal_id TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_review_items_journal_id
+ON word_review_items(journal_id) WHERE journal_id IS NOT NULL;
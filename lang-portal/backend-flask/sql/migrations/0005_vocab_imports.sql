@@ -0,0 +1,14 @@
+-- Bulk vocabulary imports (lib/importer.py) deduplicate words on
+-- (english, spanish) and look each pair up through this index.
+CREATE INDEX IF NOT EXISTS idx_words_english_spanish ON words(english, spanish);
+
+-- One row per imported file. rows_done is updated in the same transaction as
+-- each chunk, so an interrupted import resumes after the last committed chunk.
+CREATE TABLE IF NOT EXISTS vocab_imports (
+  source TEXT PRIMARY KEY,  -- Absolute path of the imported file
+  fingerprint TEXT NOT NULL,  -- File size and mtime; a changed file is imported from the start
+  rows_done INTEGER NOT NULL DEFAULT 0,
+  deferred_indexes TEXT,  -- JSON list of [name, sql] for indexes dropped until the import ends
+  started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  completed_at DATETIME
+);
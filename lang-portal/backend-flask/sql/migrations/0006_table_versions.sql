@@ -0,0 +1,104 @@
+-- Per-table version counters, bumped by triggers on every write. Cached
+-- responses (lib/response_cache.py) record the versions of the tables they
+-- were built from and are rebuilt once any of them moves.
+CREATE TABLE IF NOT EXISTS table_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_versions (name) VALUES
+  ('words'),
+  ('groups'),
+  ('word_groups'),
+  ('word_reviews'),
+  ('study_activities');
+
+CREATE TRIGGER IF NOT EXISTS words_version_insert
+AFTER INSERT ON words
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'words';
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_version_update
+AFTER UPDATE ON words
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'words';
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_version_delete
+AFTER DELETE ON words
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'words';
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_version_insert
+AFTER INSERT ON groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_version_update
+AFTER UPDATE ON groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_version_delete
+AFTER DELETE ON groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_version_insert
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_version_update
+AFTER UPDATE ON word_groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_version_delete
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_groups';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_insert
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_update
+AFTER UPDATE ON word_reviews
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_delete
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_activities_version_insert
+AFTER INSERT ON study_activities
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'study_activities';
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_activities_version_update
+AFTER UPDATE ON study_activities
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'study_activities';
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_activities_version_delete
+AFTER DELETE ON study_activities
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'study_activities';
+END;
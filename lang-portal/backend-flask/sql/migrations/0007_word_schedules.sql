@@ -0,0 +1,55 @@
+-- Spaced repetition schedules (lib/scheduler.py), one row per reviewed word.
+-- Words without a row have never been reviewed and count as new.
+CREATE TABLE IF NOT EXISTS word_schedules (
+  word_id INTEGER PRIMARY KEY,
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days INTEGER NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  due_at DATETIME NOT NULL,
+  last_reviewed_at DATETIME,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Each word's due time is copied onto its group links so the next due words
+-- of a group are a range read of one index, ordered by due_at
+ALTER TABLE word_groups ADD COLUMN due_at DATETIME;
+
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_due ON word_groups(group_id, due_at, word_id);
+
+CREATE TRIGGER IF NOT EXISTS word_schedules_due_insert
+AFTER INSERT ON word_schedules
+BEGIN
+  UPDATE word_groups SET due_at = NEW.due_at WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_schedules_due_update
+AFTER UPDATE OF due_at ON word_schedules
+BEGIN
+  UPDATE word_groups SET due_at = NEW.due_at WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_schedules_due_delete
+AFTER DELETE ON word_schedules
+BEGIN
+  UPDATE word_groups SET due_at = NULL WHERE word_id = OLD.word_id;
+END;
+
+-- A word added to another group keeps the schedule it already has
+CREATE TRIGGER IF NOT EXISTS word_groups_due_insert
+AFTER INSERT ON word_groups
+WHEN EXISTS (SELECT 1 FROM word_schedules WHERE word_id = NEW.word_id)
+BEGIN
+  UPDATE word_groups
+  SET due_at = (SELECT due_at FROM word_schedules WHERE word_id = NEW.word_id)
+  WHERE word_id = NEW.word_id AND group_id = NEW.group_id;
+END;
+
+-- Copying due_at is not a change to group membership; only bump the
+-- word_groups version when the link itself changes
+DROP TRIGGER IF EXISTS word_groups_version_update;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_version_update
+AFTER UPDATE OF word_id, group_id ON word_groups
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'word_groups';
+END;
@@ -0,0 +1,68 @@
+-- Word search (lib/search.py).
+--
+-- words_fts indexes whole words with accents removed, so "arbol" matches
+-- "árbol". Prefixes of one to three characters expand to the most terms, so
+-- those are indexed directly for autocomplete.
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  english,
+  spanish,
+  content='words',
+  content_rowid='id',
+  tokenize='unicode61 remove_diacritics 2',
+  prefix='1 2 3'
+);
+
+-- The trigram tokenizer matches any substring of three or more characters
+-- but cannot remove diacritics in this SQLite version, so it indexes a
+-- lowercased, accent-free copy of each word from this view
+CREATE VIEW IF NOT EXISTS words_folded AS
+SELECT
+  id,
+  replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(lower(english), 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'a'), 'É', 'e'), 'Í', 'i'), 'Ó', 'o'), 'Ú', 'u'), 'Ü', 'u'), 'Ñ', 'n') AS english,
+  replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(replace(lower(spanish), 'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ü', 'u'), 'ñ', 'n'), 'Á', 'a'), 'É', 'e'), 'Í', 'i'), 'Ó', 'o'), 'Ú', 'u'), 'Ü', 'u'), 'Ñ', 'n') AS spanish
+FROM words;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS words_trigram USING fts5(
+  english,
+  spanish,
+  content='words_folded',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
+INSERT INTO words_trigram (words_trigram) VALUES ('rebuild');
+
+CREATE TRIGGER IF NOT EXISTS words_fts_insert
+AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, english, spanish) VALUES (NEW.id, NEW.english, NEW.spanish);
+  INSERT INTO words_trigram (rowid, english, spanish)
+  SELECT id, english, spanish FROM words_folded WHERE id = NEW.id;
+END;
+
+-- External content tables are told the old values to remove, so these run
+-- before the row changes
+CREATE TRIGGER IF NOT EXISTS words_fts_delete
+BEFORE DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, spanish) VALUES ('delete', OLD.id, OLD.english, OLD.spanish);
+  INSERT INTO words_trigram (words_trigram, rowid, english, spanish)
+  SELECT 'delete', id, english, spanish FROM words_folded WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_update_before
+BEFORE UPDATE OF english, spanish ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, spanish) VALUES ('delete', OLD.id, OLD.english, OLD.spanish);
+  INSERT INTO words_trigram (words_trigram, rowid, english, spanish)
+  SELECT 'delete', id, english, spanish FROM words_folded WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_update_after
+AFTER UPDATE OF english, spanish ON words
+BEGIN
+  INSERT INTO words_fts (rowid, english, spanish) VALUES (NEW.id, NEW.english, NEW.spanish);
+  INSERT INTO words_trigram (rowid, english, spanish)
+  SELECT id, english, spanish FROM words_folded WHERE id = NEW.id;
+END;
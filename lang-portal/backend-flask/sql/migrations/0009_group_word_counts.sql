@@ -0,0 +1,27 @@
+-- groups.words_count is kept equal to the group's word_groups rows by these
+-- triggers, in the same transaction as the link change, and read directly
+-- by the group endpoints. `invoke check-group-counts` reports and repairs
+-- drift (e.g. from writes made with the triggers missing).
+UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id);
+
+CREATE INDEX IF NOT EXISTS idx_groups_words_count ON groups(words_count, name);
+
+CREATE TRIGGER IF NOT EXISTS word_groups_count_insert
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_count_delete
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_count_update
+AFTER UPDATE OF group_id ON word_groups
+WHEN NEW.group_id IS NOT OLD.group_id
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
@@ -0,0 +1,6 @@
+-- Superseded by 0011_folded_word_columns.sql. This migration used to index
+-- words through a view calling a fold() function registered from Python,
+-- which left words unwritable from any connection without it. It is kept,
+-- empty, so databases that applied it and new ones number migrations alike;
+-- 0011 replaces whatever it created.
+SELECT 1;
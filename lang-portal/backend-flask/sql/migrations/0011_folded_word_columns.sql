@@ -0,0 +1,80 @@
+-- Word search (lib/search.py) without functions outside SQLite.
+--
+-- words_fts indexes english and spanish as written; its tokenizer removes
+-- accents and case from the words and from queries alike. The trigram
+-- tokenizer cannot remove diacritics in this SQLite version, so words carry
+-- english_folded and spanish_folded, lib/search.py fold() of each, which the
+-- app fills when it writes words and Db.migrate() refills for rows written
+-- or changed by other tools (fold_words). words_trigram indexes those.
+DROP TRIGGER IF EXISTS words_fts_insert;
+DROP TRIGGER IF EXISTS words_fts_delete;
+DROP TRIGGER IF EXISTS words_fts_update_before;
+DROP TRIGGER IF EXISTS words_fts_update_after;
+DROP TABLE IF EXISTS words_fts;
+DROP TABLE IF EXISTS words_trigram;
+DROP VIEW IF EXISTS words_folded;
+
+ALTER TABLE words ADD COLUMN english_folded TEXT;
+ALTER TABLE words ADD COLUMN spanish_folded TEXT;
+
+CREATE VIRTUAL TABLE words_fts USING fts5(
+  english,
+  spanish,
+  content='words',
+  content_rowid='id',
+  tokenize='unicode61 remove_diacritics 2',
+  prefix='1 2 3'
+);
+
+CREATE VIRTUAL TABLE words_trigram USING fts5(
+  english_folded,
+  spanish_folded,
+  content='words',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
+-- Every word gets a row, empty until fold_words() fills its columns, so
+-- the update triggers always delete values the index holds
+INSERT INTO words_trigram (words_trigram) VALUES ('rebuild');
+
+CREATE TRIGGER words_fts_insert
+AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, english, spanish) VALUES (NEW.id, NEW.english, NEW.spanish);
+  INSERT INTO words_trigram (rowid, english_folded, spanish_folded) VALUES (NEW.id, NEW.english_folded, NEW.spanish_folded);
+END;
+
+-- External content tables are told the old values to remove, so these run
+-- before the row changes
+CREATE TRIGGER words_fts_delete
+BEFORE DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, spanish) VALUES ('delete', OLD.id, OLD.english, OLD.spanish);
+  INSERT INTO words_trigram (words_trigram, rowid, english_folded, spanish_folded) VALUES ('delete', OLD.id, OLD.english_folded, OLD.spanish_folded);
+END;
+
+CREATE TRIGGER words_fts_update_before
+BEFORE UPDATE OF english, spanish ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, english, spanish) VALUES ('delete', OLD.id, OLD.english, OLD.spanish);
+END;
+
+CREATE TRIGGER words_fts_update_after
+AFTER UPDATE OF english, spanish ON words
+BEGIN
+  INSERT INTO words_fts (rowid, english, spanish) VALUES (NEW.id, NEW.english, NEW.spanish);
+END;
+
+CREATE TRIGGER words_trigram_update_before
+BEFORE UPDATE OF english_folded, spanish_folded ON words
+BEGIN
+  INSERT INTO words_trigram (words_trigram, rowid, english_folded, spanish_folded) VALUES ('delete', OLD.id, OLD.english_folded, OLD.spanish_folded);
+END;
+
+CREATE TRIGGER words_trigram_update_after
+AFTER UPDATE OF english_folded, spanish_folded ON words
+BEGIN
+  INSERT INTO words_trigram (rowid, english_folded, spanish_folded) VALUES (NEW.id, NEW.english_folded, NEW.spanish_folded);
+END;
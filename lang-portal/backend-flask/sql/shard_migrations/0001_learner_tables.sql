@@ -0,0 +1,239 @@
+-- A learner's shard (lib/shards.py) holds that learner's study history. The
+-- vocabulary (words, groups, word_groups, study_activities and the search
+-- indexes) stays in words.db, attached read-only to every shard connection
+-- as "catalog". Unqualified names resolve to the shard first, so the tables
+-- below shadow their copies in words.db and route queries run unchanged.
+--
+-- Mirrors the learner side of sql/setup and sql/migrations 0001-0007; keep
+-- them in step. Triggers may only touch tables in their own database, so
+-- nothing here maintains vocabulary totals or word_groups.due_at.
+
+CREATE TABLE IF NOT EXISTS study_sessions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  group_id INTEGER NOT NULL,  -- catalog.groups
+  study_activity_id INTEGER NOT NULL,  -- catalog.study_activities
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS word_review_items (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  word_id INTEGER NOT NULL,  -- catalog.words
+  study_session_id INTEGER NOT NULL,
+  correct BOOLEAN NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  journal_id TEXT,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS word_reviews (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  word_id INTEGER NOT NULL,  -- catalog.words
+  correct_count INTEGER DEFAULT 0,
+  wrong_count INTEGER DEFAULT 0,
+  last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS study_session_stats (
+  study_session_id INTEGER PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0,
+  first_review_at DATETIME,
+  last_review_at DATETIME,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_review_stats (
+  study_date DATE PRIMARY KEY,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- As in words.db without total_vocabulary, which is read from
+-- catalog.dashboard_stats
+CREATE TABLE IF NOT EXISTS dashboard_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  version INTEGER NOT NULL DEFAULT 0,
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  total_reviews INTEGER NOT NULL DEFAULT 0,
+  correct_reviews INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,
+  mastered_words INTEGER NOT NULL DEFAULT 0,
+  current_streak INTEGER NOT NULL DEFAULT 0,
+  last_study_date DATE
+);
+
+INSERT OR IGNORE INTO dashboard_stats (id) VALUES (1);
+
+CREATE TABLE IF NOT EXISTS word_schedules (
+  word_id INTEGER PRIMARY KEY,  -- catalog.words
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days INTEGER NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  due_at DATETIME NOT NULL,
+  last_reviewed_at DATETIME
+);
+
+-- Versions of the learner tables cached responses depend on. Named apart
+-- from table_versions so that name still finds the catalog's vocabulary
+-- versions.
+CREATE TABLE IF NOT EXISTS shard_table_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO shard_table_versions (name) VALUES ('word_reviews');
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id_unique ON word_reviews(word_id);
+CREATE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id, correct_count, wrong_count);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items(study_session_id, correct, created_at);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items(word_id, correct);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_review_items_journal_id
+ON word_review_items(journal_id) WHERE journal_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id ON study_sessions(group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id ON study_sessions(study_activity_id, created_at);
+-- Due words are found from the learner's schedules, not word_groups.due_at
+CREATE INDEX IF NOT EXISTS idx_word_schedules_due_at ON word_schedules(due_at, word_id);
+
+CREATE TRIGGER IF NOT EXISTS word_review_items_rollup_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.word_id, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END, NEW.created_at)
+  ON CONFLICT (word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = excluded.last_reviewed;
+
+  INSERT INTO study_session_stats (study_session_id, review_count, correct_count, wrong_count, first_review_at, last_review_at)
+  VALUES (NEW.study_session_id, 1, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END, NEW.created_at, NEW.created_at)
+  ON CONFLICT (study_session_id) DO UPDATE SET
+    review_count = review_count + 1,
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_review_at = MAX(last_review_at, excluded.last_review_at);
+
+  INSERT INTO daily_review_stats (study_date, review_count, correct_count, wrong_count)
+  VALUES (date(NEW.created_at), 1, CASE WHEN NEW.correct THEN 1 ELSE 0 END, CASE WHEN NEW.correct THEN 0 ELSE 1 END)
+  ON CONFLICT (study_date) DO UPDATE SET
+    review_count = review_count + 1,
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_rollup_delete
+AFTER DELETE ON study_sessions
+BEGIN
+  DELETE FROM study_session_stats WHERE study_session_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_sessions_insert
+AFTER INSERT ON study_sessions
+BEGIN
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions + 1,
+    current_streak = CASE
+      WHEN last_study_date IS NULL THEN 1
+      WHEN date(NEW.created_at) <= last_study_date THEN current_streak
+      WHEN julianday(date(NEW.created_at)) - julianday(last_study_date) = 1 THEN current_streak + 1
+      ELSE 1
+    END,
+    last_study_date = MAX(COALESCE(last_study_date, date(NEW.created_at)), date(NEW.created_at)),
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_sessions_delete
+AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions - 1,
+    current_streak = CASE WHEN total_sessions = 1 THEN 0 ELSE current_streak END,
+    last_study_date = CASE WHEN total_sessions = 1 THEN NULL ELSE last_study_date END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_review_items_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE dashboard_stats SET
+    total_reviews = total_reviews + 1,
+    correct_reviews = correct_reviews + CASE WHEN NEW.correct THEN 1 ELSE 0 END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_review_items_delete
+AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE dashboard_stats SET
+    total_reviews = total_reviews - 1,
+    correct_reviews = correct_reviews - CASE WHEN OLD.correct THEN 1 ELSE 0 END,
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_insert
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied + (NEW.correct_count + NEW.wrong_count > 0),
+    mastered_words = mastered_words + (
+      NEW.correct_count + NEW.wrong_count >= 5
+      AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+    )
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_update
+AFTER UPDATE ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied
+      + (NEW.correct_count + NEW.wrong_count > 0)
+      - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      + (
+        NEW.correct_count + NEW.wrong_count >= 5
+        AND NEW.correct_count * 1.0 / (NEW.correct_count + NEW.wrong_count) >= 0.8
+      )
+      - (
+        OLD.correct_count + OLD.wrong_count >= 5
+        AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+      )
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dashboard_stats_word_reviews_delete
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    words_studied = words_studied - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words - (
+      OLD.correct_count + OLD.wrong_count >= 5
+      AND OLD.correct_count * 1.0 / (OLD.correct_count + OLD.wrong_count) >= 0.8
+    ),
+    version = version + 1
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_insert
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE shard_table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_update
+AFTER UPDATE ON word_reviews
+BEGIN
+  UPDATE shard_table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_delete
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE shard_table_versions SET version = version + 1 WHERE name = 'word_reviews';
+END;
@@ -6,4 +6,98 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task
+def migrate(c):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    applied = db.migrate(verbose=True)
+  if not applied:
+    print("Database schema is up to date.")
+
+@task(help={
+  'path': 'JSON array, NDJSON or CSV file of words (english, spanish, optional groups)',
+  'group': 'Group every imported word is added to',
+  'format': 'json, ndjson or csv; detected from the file extension by default',
+  'chunk-size': 'Rows committed per transaction',
+  'restart': 'Import from the first row instead of resuming',
+  'defer-indexes': 'Drop secondary indexes during the import and rebuild them at the end'
+})
+def import_vocab(c, path, group=None, format=None, chunk_size=10000, restart=False, defer_indexes=True):
+  from flask import Flask
+  from lib.importer import import_vocab_file
+  app = Flask(__name__)
+  with app.app_context():
+    db.migrate()
+
+    def progress(rows_done, rows_per_sec):
+      print(f"{rows_done:>12,} rows  {rows_per_sec:>10,.0f} rows/sec")
+
+    result = import_vocab_file(
+      db.get(),
+      path,
+      format=format,
+      groups=[group] if group else [],
+      restart=restart,
+      chunk_size=int(chunk_size),
+      defer_indexes=defer_indexes,
+      progress=progress
+    )
+  if result['resumed_at']:
+    print(f"Resumed after row {result['resumed_at']:,}")
+  for error in result['errors']:
+    print(f"Row {error['row']}: {error['error']}")
+  print(
+    f"Imported {result['rows']:,} rows in {result['seconds']:.1f}s ({result['rows_per_sec']:,.0f} rows/sec): "
+    f"{result['words_added']:,} new words, {result['links_added']:,} group links, {result['invalid']:,} invalid rows"
+  )
+
+@task(help={
+  'repair': 'Rewrite the counts that have drifted'
+})
+def check_group_counts(c, repair=False):
+  from flask import Flask
+  from lib.group_counts import group_count_drift, repair_group_counts
+  app = Flask(__name__)
+  with app.app_context():
+    db.migrate()
+    connection = db.get()
+    drift = repair_group_counts(connection) if repair else group_count_drift(connection)
+  for group_id, name, stored, actual in drift:
+    print(f"Group {group_id} ({name}): words_count {stored}, actual {actual}")
+  if not drift:
+    print("All group word counts are correct.")
+  elif repair:
+    print(f"Repaired {len(drift)} group word counts.")
+  else:
+    print(f"{len(drift)} group word counts have drifted; rerun with --repair to fix them.")
+
+@task(help={
+  'path': 'Database file to create (must not exist)',
+  'words': 'Words to generate',
+  'groups': 'Groups the words are spread across',
+  'sessions': 'Study sessions to generate',
+  'reviews': 'Review items to generate'
+})
+def generate_data(c, path, words=100000, groups=20, sessions=10000, reviews=1000000):
+  import time
+  from benchmarks.generate_data import generate_database, print_progress
+  started = time.perf_counter()
+  generate_database(path, int(words), int(groups), int(sessions), int(reviews), progress=print_progress)
+  print(f"Generated {path} in {time.perf_counter() - started:.1f}s")
+
+@task(help={
+  'workers': 'Server processes',
+  'threads': 'Request threads per process (also used as the database pool size unless FLASK_DATABASE_POOL_SIZE is set)',
+  'host': 'Interface to bind',
+  'port': 'Port to listen on'
+})
+def serve(c, workers=1, threads=8, host='127.0.0.1', port=5000):
+  import os
+  import uvicorn
+  # Worker processes build the app from the environment (see asgi.py)
+  os.environ['FLASK_ASGI_THREADS'] = str(threads)
+  os.environ.setdefault('FLASK_DATABASE_POOL_SIZE', str(threads))
+  uvicorn.run('asgi:application', host=host, port=int(port), workers=int(workers))
@@ -0,0 +1,37 @@
+import os
+import pytest
+
+from app import create_app
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+  # Db.init loads sql/ and seed/ relative to the backend directory
+  monkeypatch.chdir(BACKEND_DIR)
+  app = create_app({
+    'DATABASE': str(tmp_path / 'test_words.db'),
+    'DATABASE_POOL_SIZE': 1,
+    'REVIEW_JOURNAL': str(tmp_path / 'review_journal.ndjson'),
+    'TESTING': True
+  })
+  app.db.init(app)
+  yield app
+  app.review_queue.stop()
+  app.db.pool.close_all()
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
+
+@pytest.fixture
+def study_session(client):
+  # A session with a few reviews so the session and dashboard queries have rows to plan against
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  session_id = response.get_json()['id']
+  client.post(f'/api/study_sessions/{session_id}/review', json={'words': [
+    {'word_id': 1, 'correct': True},
+    {'word_id': 2, 'correct': False},
+    {'word_id': 3, 'correct': True}
+  ]})
+  return session_id
@@ -0,0 +1,20 @@
+def test_stats_follow_reviews_and_reset(client, study_session):
+  stats = client.get('/api/dashboard/stats').get_json()
+  assert stats['total_sessions'] == 1
+  assert stats['total_words_studied'] == 3
+  assert stats['mastered_words'] == 0
+  assert stats['current_streak'] == 1
+
+  client.post(f'/api/study_sessions/{study_session}/review', json={'words': [{'word_id': 1, 'correct': True}] * 4})
+  stats = client.get('/api/dashboard/stats').get_json()
+  assert stats['mastered_words'] == 1
+  assert stats['success_rate'] == 6 / 7
+
+  client.post('/api/study_sessions/reset')
+  stats = client.get('/api/dashboard/stats').get_json()
+  assert stats['total_sessions'] == 0
+  assert stats['total_words_studied'] == 0
+  assert stats['mastered_words'] == 0
+  assert stats['success_rate'] == 0
+  assert stats['current_streak'] == 0
+  assert stats['total_vocabulary'] == 110
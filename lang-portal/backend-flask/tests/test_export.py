@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+
+from lib.export import Exports, iter_export
+
+def ndjson(response):
+  return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_group_words_export_matches_raw_listing(client):
+  response = client.get('/api/groups/1/words/export')
+  assert response.status_code == 200
+  assert response.is_streamed
+  assert response.mimetype == 'application/x-ndjson'
+  assert 'Content-Length' not in response.headers
+  assert response.headers['Content-Disposition'] == 'attachment; filename="group-1-words.ndjson"'
+
+  exported = ndjson(response)
+  raw = client.get('/api/groups/1/words/raw').get_json()['words']
+  assert [word['id'] for word in exported] == sorted(word['id'] for word in raw)
+  assert sorted(exported, key=lambda word: word['id']) == sorted(raw, key=lambda word: word['id'])
+
+def test_words_export_as_csv_includes_review_log(client, study_session):
+  client.post(f'/api/study_sessions/{study_session}/review_log', json={'word_id': 1, 'correct': False})
+  response = client.get('/api/words/export?format=csv')
+  assert response.mimetype == 'text/csv'
+  rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+  assert len(rows) == 110
+  assert (rows[0]['id'], rows[0]['correct_count'], rows[0]['wrong_count']) == ('1', '1', '1')
+
+def test_review_export_flushes_the_review_log(client, study_session):
+  client.post(f'/api/study_sessions/{study_session}/review_log', json={'word_id': 4, 'correct': True})
+  reviews = ndjson(client.get(f'/api/study_sessions/reviews/export?study_session_id={study_session}'))
+  assert [(review['word_id'], review['correct']) for review in reviews] == [(1, 1), (2, 0), (3, 1), (4, 1)]
+  assert ndjson(client.get('/api/study_sessions/reviews/export?study_session_id=999999')) == []
+
+def test_export_reads_rows_a_chunk_at_a_time(app):
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('SELECT id FROM words ORDER BY id')
+    chunks = iter_export(cursor, 'ndjson', chunk_size=50)
+    assert next(chunks).count('\n') == 50
+    # Nothing beyond the first chunk has been read yet
+    assert len(cursor.fetchmany(100)) == 60
+    app.db.close()
+
+def test_export_rejects_unknown_formats(client):
+  assert client.get('/api/words/export?format=xml').status_code == 400
+  assert client.get('/api/groups/999/words/export').status_code == 404
+
+def test_exports_beyond_the_limit_are_turned_away(app, client):
+  app.exports = Exports(app.db, max_concurrent=1)
+  streaming = client.get('/api/words/export')
+  assert streaming.status_code == 200
+  busy = client.get('/api/groups/1/words/export')
+  assert busy.status_code == 503
+  assert busy.headers['Retry-After']
+  # Reading the stream to the end frees its slot and closes its connection
+  assert len(ndjson(streaming)) == 110
+  assert client.get('/api/groups/1/words/export').status_code == 200
+  # Exports do not hold connections from the request pool
+  assert app.db.pool.stats()['in_use'] == 0
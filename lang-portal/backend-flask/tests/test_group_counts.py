@@ -0,0 +1,51 @@
+from lib.group_counts import group_count_drift, repair_group_counts
+
+def group_word_count(client, group_id):
+  return client.get(f'/api/groups/{group_id}').get_json()['word_count']
+
+def test_counts_follow_group_links(app, client):
+  assert group_word_count(client, 1) == len(client.get('/api/groups/1/words/raw').get_json()['words'])
+  before = (group_word_count(client, 1), group_word_count(client, 2))
+
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute("INSERT INTO words (english, spanish) VALUES ('tree', 'árbol')")
+    word_id = cursor.lastrowid
+    cursor.execute('INSERT INTO word_groups (word_id, group_id) VALUES (?, 1)', (word_id,))
+    app.db.commit()
+    app.db.close()
+  assert group_word_count(client, 1) == before[0] + 1
+
+  with app.app_context():
+    app.db.cursor().execute('UPDATE word_groups SET group_id = 2 WHERE word_id = ?', (word_id,))
+    app.db.commit()
+    app.db.close()
+  assert (group_word_count(client, 1), group_word_count(client, 2)) == (before[0], before[1] + 1)
+
+  with app.app_context():
+    app.db.cursor().execute('DELETE FROM word_groups WHERE word_id = ?', (word_id,))
+    app.db.commit()
+    assert group_count_drift(app.db.get()) == []
+    app.db.close()
+  assert group_word_count(client, 2) == before[1]
+
+def test_repair_fixes_drift(app):
+  with app.app_context():
+    connection = app.db.get()
+    actual = connection.execute('SELECT words_count FROM groups WHERE id = 1').fetchone()[0]
+    connection.execute('UPDATE groups SET words_count = 3 WHERE id = 1')
+    connection.commit()
+
+    assert [tuple(row)[2:] for row in group_count_drift(connection)] == [(3, actual)]
+    assert len(repair_group_counts(connection)) == 1
+    assert group_count_drift(connection) == []
+    app.db.close()
+
+def test_sorting_by_count_reads_the_index(app):
+  with app.app_context():
+    plan = [row[3] for row in app.db.get().execute(
+      'EXPLAIN QUERY PLAN SELECT id, name, words_count FROM groups ORDER BY words_count desc LIMIT 10'
+    )]
+    app.db.close()
+  assert any('idx_groups_words_count' in detail for detail in plan)
+  assert not any('TEMP B-TREE' in detail for detail in plan)
@@ -0,0 +1,82 @@
+import io
+import json
+
+import pytest
+
+from lib.importer import import_vocab, import_vocab_file, iter_json_array
+
+def group_words(connection, name):
+  return connection.execute('''
+    SELECT w.english, w.spanish FROM words w
+    JOIN word_groups wg ON wg.word_id = w.id
+    JOIN groups g ON g.id = wg.group_id
+    WHERE g.name = ?
+    ORDER BY w.id
+  ''', (name,)).fetchall()
+
+def test_json_array_is_decoded_across_buffer_boundaries():
+  words = [{'english': f'word {i}', 'spanish': f'palabra {i}'} for i in range(50)]
+  assert list(iter_json_array(io.StringIO(json.dumps(words)), buffer_size=7)) == words
+  rows = [{'english': 'yes', 'spanish': 'sí', 'known': True, 'note': None, 'level': -1.5e3, 'tags': ['a\u00e9']}] * 20
+  for size in range(1, 12):
+    assert list(iter_json_array(io.StringIO(json.dumps(rows)), buffer_size=size)) == rows
+
+def test_malformed_json_element_fails_without_reading_on():
+  class CountingReader(io.StringIO):
+    reads = 0
+    def read(self, size=-1):
+      self.reads += 1
+      return super().read(size)
+
+  words = [{'english': f'word {i}', 'spanish': f'palabra {i}'} for i in range(1000)]
+  text = json.dumps(words)
+  broken = text.replace('"word 3"', 'word 3', 1)
+  file = CountingReader(broken)
+  with pytest.raises(ValueError, match=r'element 3 at offset \d+'):
+    list(iter_json_array(file, buffer_size=256))
+  assert file.reads <= 2
+  with pytest.raises(ValueError, match='ends inside element 1000'):
+    list(iter_json_array(io.StringIO(text[:-1]), buffer_size=256))
+
+def test_import_deduplicates_words_and_links(app):
+  with app.app_context():
+    connection = app.db.get()
+    rows = [
+      {'english': 'to write', 'spanish': 'escribir', 'groups': ['Travel']},
+      {'english': 'ticket', 'spanish': 'billete'},
+      {'english': 'ticket', 'spanish': 'billete', 'group': 'Tickets'},
+      {'english': 'ticket'},
+    ]
+    result = import_vocab(connection, rows, groups=['Travel'], chunk_size=2)
+    assert (result['rows'], result['invalid']) == (4, 1)
+    assert (result['words_added'], result['links_added']) == (1, 3)
+    assert [tuple(row) for row in group_words(connection, 'Travel')] == [('to write', 'escribir'), ('ticket', 'billete')]
+    count = connection.execute("SELECT words_count FROM groups WHERE name = 'Tickets'").fetchone()[0]
+    assert count == 1
+
+    # Importing the same rows again changes nothing
+    result = import_vocab(connection, rows, groups=['Travel'])
+    assert (result['words_added'], result['links_added']) == (0, 0)
+    app.db.close()
+
+def test_interrupted_file_import_resumes(app, tmp_path):
+  path = tmp_path / 'vocab.csv'
+  path.write_text('english,spanish,groups\n' + ''.join(f'word {i},palabra {i},Bulk;Extra\n' for i in range(25)))
+
+  with app.app_context():
+    connection = app.db.get()
+
+    def interrupt(rows_done, rows_per_sec):
+      if rows_done == 10:
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+      import_vocab_file(connection, str(path), chunk_size=5, defer_indexes=True, progress=interrupt)
+    # Indexes dropped for the import are rebuilt even when it stops early
+    assert connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_words_spanish'").fetchone()
+
+    result = import_vocab_file(connection, str(path), chunk_size=5)
+    assert (result['resumed_at'], result['rows'], result['words_added']) == (10, 15, 15)
+    assert len(group_words(connection, 'Bulk')) == 25
+    assert len(group_words(connection, 'Extra')) == 25
+    app.db.close()
@@ -0,0 +1,36 @@
+PREFLIGHT = {'Access-Control-Request-Method': 'POST', 'Access-Control-Request-Headers': 'Content-Type'}
+
+def preflight(client, origin):
+  return client.options('/api/study_sessions', headers=dict(PREFLIGHT, Origin=origin))
+
+def test_preflight_is_answered_from_memory(app, client):
+  # Loading the allowlist is the only database work
+  client.get('/api/study_activities', headers={'Origin': 'http://localhost:8501'})
+  checkouts = app.db.pool.stats()['checkouts']
+
+  response = preflight(client, 'http://localhost:8501')
+  assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:8501'
+  assert 'POST' in response.headers['Access-Control-Allow-Methods']
+  assert 'Access-Control-Allow-Origin' not in preflight(client, 'http://evil.example').headers
+  assert app.db.pool.stats()['checkouts'] == checkouts
+
+def test_allowlist_follows_study_activity_changes(app, client):
+  app.origins.refresh_interval = 0
+  assert 'Access-Control-Allow-Origin' not in preflight(client, 'https://tutor.example').headers
+
+  with app.app_context():
+    app.db.cursor().execute(
+      "UPDATE study_activities SET url = 'https://tutor.example/start' WHERE name = 'Typing Tutor'"
+    )
+    app.db.commit()
+    app.db.close()
+
+  # The next request that uses the database picks up the new origin
+  client.get('/api/study_activities')
+  assert preflight(client, 'https://tutor.example').headers['Access-Control-Allow-Origin'] == 'https://tutor.example'
+
+def test_app_creation_does_no_database_work(tmp_path):
+  from app import create_app
+  app = create_app({'DATABASE': str(tmp_path / 'cold.db'), 'REVIEW_JOURNAL': str(tmp_path / 'journal.ndjson')})
+  assert app.db.pool.stats()['checkouts'] == 0
+  app.review_queue.stop()
@@ -0,0 +1,95 @@
+import re
+
+# Every GET route, exercised with the parameters that change the SQL it runs
+ROUTE_URLS = [
+  '/api/words',
+  '/api/words?sort_by=spanish&order=desc',
+  '/api/words?sort_by=correct_count',
+  '/api/words?group=Core%20Verbs',
+  '/api/words?cursor=',
+  '/api/words?cursor=WyJiIiwxXQ',
+  '/api/words?cursor=WyJiIiwxXQ&sort_by=spanish&order=desc',
+  '/api/words/1',
+  '/api/words/search?q=habl',
+  '/api/words/search?q=ablar&field=spanish',
+  '/api/groups',
+  '/api/groups?sort_by=words_count&order=desc',
+  '/api/groups/1',
+  '/api/groups/1/words',
+  '/api/groups/1/words?sort_by=spanish&order=desc',
+  '/api/groups/1/words?cursor=WyJiIiwxXQ',
+  '/api/groups/1/words/raw',
+  '/api/groups/1/words/export',
+  '/api/groups/1/due',
+  '/api/groups/1/due?include_new=false',
+  '/api/groups/1/study_sessions',
+  '/api/groups/1/study_sessions?sort_by=reviewItemsCount',
+  '/api/study_sessions',
+  '/api/study_sessions/{session_id}',
+  '/api/study_activities',
+  '/api/study_activities/1',
+  '/api/study_activities/1/sessions',
+  '/api/study_activities/1/launch',
+  '/api/dashboard/recent_session',
+  '/api/dashboard/stats',
+]
+
+# Lookup tables that routes intentionally return in full
+FULL_SCAN_ALLOWED = {'study_activities'}
+
+# Statements that cannot be served from an index, matched by substring.
+# Ordering every word by its review counts sorts on a LEFT JOINed value.
+KNOWN_FULL_SCANS = [
+  'ORDER BY correct_count',
+  'ORDER BY wrong_count',
+]
+
+SCAN = re.compile(r'^SCAN (\S+)$')
+SUBQUERY = re.compile(r'^(?:CO-ROUTINE|MATERIALIZE) (\S+)$')
+
+def resolve_table(sql, name, tables):
+  if name in tables:
+    return name
+  match = re.search(r'(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?' + re.escape(name) + r'\b', sql, re.IGNORECASE)
+  return match.group(1) if match else name
+
+def full_scans(connection, sql):
+  tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+  plan = [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql)]
+  subqueries = {m.group(1) for m in map(SUBQUERY.match, plan) if m}
+  scans = []
+  for detail in plan:
+    match = SCAN.match(detail)
+    if not match or match.group(1) in subqueries or match.group(1).startswith('('):
+      continue
+    table = resolve_table(sql, match.group(1), tables)
+    if table not in FULL_SCAN_ALLOWED:
+      scans.append(table)
+  return scans
+
+def test_route_queries_use_indexes(app, client, study_session):
+  statements = []
+  with app.app_context():
+    connection = app.db.get()
+    connection.set_trace_callback(statements.append)
+    app.db.close()
+
+  for url in ROUTE_URLS:
+    response = client.get(url.format(session_id=study_session))
+    assert response.status_code == 200, url
+
+  with app.app_context():
+    connection = app.db.get()
+    connection.set_trace_callback(None)
+    failures = {}
+    for sql in statements:
+      if not re.match(r'\s*(SELECT|WITH)\b', sql, re.IGNORECASE):
+        continue
+      if any(pattern in sql for pattern in KNOWN_FULL_SCANS):
+        continue
+      scans = full_scans(connection, sql)
+      if scans:
+        failures[' '.join(sql.split())] = scans
+    app.db.close()
+
+  assert not failures, "\n".join(f"{scans}: {sql}" for sql, scans in failures.items())
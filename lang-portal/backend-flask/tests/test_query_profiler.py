@@ -0,0 +1,58 @@
+import pytest
+
+from app import create_app
+from lib.query_profiler import normalize_sql
+from tests.conftest import BACKEND_DIR
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+  monkeypatch.chdir(BACKEND_DIR)
+  app = create_app({
+    'DATABASE': str(tmp_path / 'test_words.db'),
+    'DATABASE_POOL_SIZE': 1,
+    'REVIEW_JOURNAL': str(tmp_path / 'review_journal.ndjson'),
+    'QUERY_PROFILING': True,
+    'SLOW_QUERY_MS': 0,
+    'SLOW_QUERY_LOG': str(tmp_path / 'slow_queries.log'),
+    'TESTING': True
+  })
+  app.db.init(app)
+  yield app
+  app.query_profiler.close()
+  app.review_queue.stop()
+  app.db.pool.close_all()
+
+def test_normalize_sql_replaces_literals():
+  assert normalize_sql("SELECT *  FROM words\n WHERE id = 42 AND english = 'it''s'") == \
+    'SELECT * FROM words WHERE id = ? AND english = ?'
+  assert normalize_sql('SELECT id FROM words WHERE id IN (?, ?, ?)') == 'SELECT id FROM words WHERE id IN (?, ...)'
+  assert normalize_sql('SELECT w1.id FROM words w1') == 'SELECT w1.id FROM words w1'
+
+def test_responses_carry_server_timing(profiled_app):
+  response = profiled_app.test_client().get('/api/groups/1/study_sessions')
+  timing = response.headers['Server-Timing']
+  assert timing.startswith('db;dur=')
+  assert 'sql1;dur=' in timing
+
+def test_debug_endpoint_reports_percentiles(profiled_app, tmp_path):
+  client = profiled_app.test_client()
+  for word_id in (1, 2, 3):
+    client.get(f'/api/words/{word_id}')
+  statements = client.get('/api/_debug/queries').get_json()['statements']
+  lookups = [s for s in statements if 'FROM words w' in s['sql'] and 'WHERE w.id = ?' in s['sql']]
+  assert len(lookups) == 1
+  assert lookups[0]['calls'] == 3
+  assert lookups[0]['rows'] == 3
+  assert 0 <= lookups[0]['p50_ms'] <= lookups[0]['p95_ms'] <= lookups[0]['max_ms']
+
+  # With a 0ms threshold every statement is logged with its plan
+  log = (tmp_path / 'slow_queries.log').read_text()
+  assert 'WHERE w.id = ?' in log
+  assert 'SEARCH w USING INTEGER PRIMARY KEY' in log
+
+  assert client.delete('/api/_debug/queries').status_code == 200
+  assert client.get('/api/_debug/queries').get_json()['statements'] == []
+
+def test_debug_endpoint_is_off_by_default(client):
+  assert client.get('/api/_debug/queries').status_code == 404
+  assert 'Server-Timing' not in client.get('/api/groups').headers
@@ -0,0 +1,35 @@
+def test_unchanged_response_is_not_modified(client):
+  first = client.get('/api/groups/1/words/raw')
+  assert first.status_code == 200
+  assert first.headers['Cache-Control'] == 'no-cache'
+  etag = first.headers['ETag']
+
+  again = client.get('/api/groups/1/words/raw', headers={'If-None-Match': etag})
+  assert again.status_code == 304
+  assert again.data == b''
+
+def test_writes_invalidate_cached_responses(app, client, study_session):
+  etag = client.get('/api/words/9').headers['ETag']
+
+  client.post(f'/api/study_sessions/{study_session}/review', json={'word_id': 9, 'correct': True})
+  response = client.get('/api/words/9', headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.get_json()['correct_count'] == 1
+
+  # Reviews still pending in the review log change the response too
+  etag = response.headers['ETag']
+  client.post(f'/api/study_sessions/{study_session}/review_log', json={'word_id': 9, 'correct': True})
+  response = client.get('/api/words/9', headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.get_json()['correct_count'] == 2
+
+def test_cache_size_is_capped(app, client):
+  app.response_cache.max_entries = 2
+  for page in (1, 2, 3):
+    client.get(f'/api/groups?page={page}')
+  assert len(app.response_cache) == 2
+
+  misses = app.response_cache.misses
+  client.get('/api/groups?page=3')
+  client.get('/api/groups?page=1')
+  assert app.response_cache.misses == misses + 1
@@ -0,0 +1,74 @@
+from lib.review_queue import ReviewQueue
+
+def word_counts(client, word_id):
+  word = client.get(f'/api/words/{word_id}').get_json()
+  return word['correct_count'], word['wrong_count']
+
+def committed_reviews(app, word_id):
+  with app.app_context():
+    count = app.db.cursor().execute(
+      'SELECT COUNT(*) FROM word_review_items WHERE word_id = ?', (word_id,)
+    ).fetchone()[0]
+    app.db.close()
+  return count
+
+def test_review_log_is_visible_before_and_after_flush(app, client, study_session):
+  response = client.post(f'/api/study_sessions/{study_session}/review_log', json={'words': [
+    {'word_id': 7, 'correct': True},
+    {'word_id': 7, 'correct': False},
+    {'word_id': 999999, 'correct': True}
+  ]})
+  body = response.get_json()
+  assert response.status_code == 202
+  assert (body['accepted'], body['rejected']) == (2, 1)
+  assert all('journal_id' in result for result in body['results'] if result['status'] == 'ok')
+
+  # Pending reviews are merged into reads whether or not they are committed yet
+  assert word_counts(client, 7) == (1, 1)
+  app.review_queue.flush()
+  assert word_counts(client, 7) == (1, 1)
+  assert committed_reviews(app, 7) == 2
+  assert app.review_queue.pending_count() == 0
+
+def test_review_log_accepts_all_chunks_or_none(app, client, study_session, monkeypatch):
+  import routes.study_sessions
+  validate = routes.study_sessions.validate_reviews
+  calls = []
+  def fail_on_second_chunk(*args):
+    calls.append(1)
+    if len(calls) == 2:
+      raise RuntimeError('database is locked')
+    return validate(*args)
+  monkeypatch.setattr(routes.study_sessions, 'validate_reviews', fail_on_second_chunk)
+
+  words = [{'word_id': 7, 'correct': True}] * 1500
+  response = client.post(f'/api/study_sessions/{study_session}/review_log', json={'words': words})
+  assert response.status_code == 500
+  assert app.review_queue.pending_count() == 0
+  assert word_counts(client, 7) == (0, 0)
+
+def test_journal_replay_commits_each_review_once(app, study_session):
+  journal = app.config['REVIEW_JOURNAL']
+  first = ReviewQueue(app.db, journal)
+  first.append(study_session, [(8, True), (8, True)], '2025-03-01 10:00:00')
+  first._commit(first._pending[:1])
+
+  # Simulate a crash after one commit: the journal still lists both reviews
+  with open(journal, 'a') as file:
+    file.write(open(journal).read())
+  restarted = ReviewQueue(app.db, journal)
+  restarted._replay_journal()
+  restarted.flush()
+  assert committed_reviews(app, 8) == 2
+
+def test_each_process_claims_its_own_journal(app, tmp_path):
+  base = str(tmp_path / 'workers.ndjson')
+  first = ReviewQueue(app.db, base)
+  second = ReviewQueue(app.db, base)
+  assert first.claim_journal() == base
+  assert second.claim_journal() == str(tmp_path / 'workers.1.ndjson')
+
+  # A stopped (or crashed) owner frees its slot for the next process
+  first.stop()
+  assert ReviewQueue(app.db, base).claim_journal() == base
+  second.stop()
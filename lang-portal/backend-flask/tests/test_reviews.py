@@ -0,0 +1,35 @@
+import json
+
+def word_counts(client, word_id):
+  word = client.get(f'/api/words/{word_id}').get_json()
+  return word['correct_count'], word['wrong_count']
+
+def test_batch_review_reports_each_item(client, study_session):
+  response = client.post(f'/api/study_sessions/{study_session}/review', json={'words': [
+    {'word_id': 4, 'correct': True},
+    {'word_id': 999999, 'correct': True},
+    {'word_id': 4},
+    {'word_id': 4, 'correct': False}
+  ]})
+  body = response.get_json()
+  assert response.status_code == 200
+  assert (body['accepted'], body['rejected']) == (2, 2)
+  assert [result['status'] for result in body['results']] == ['ok', 'error', 'error', 'ok']
+  assert word_counts(client, 4) == (1, 1)
+
+def test_ndjson_review_stream(client, study_session):
+  lines = [json.dumps({'word_id': 5, 'correct': True})] * 3 + ['not json']
+  response = client.post(
+    f'/api/study_sessions/{study_session}/review',
+    data='\n'.join(lines),
+    content_type='application/x-ndjson'
+  )
+  body = response.get_json()
+  assert (body['accepted'], body['rejected']) == (3, 1)
+  assert word_counts(client, 5) == (3, 0)
+  session = client.get(f'/api/study_sessions/{study_session}').get_json()['session']
+  assert session['review_items_count'] == 6
+
+def test_single_invalid_review_is_rejected(client, study_session):
+  response = client.post(f'/api/study_sessions/{study_session}/review', json={'word_id': 999999, 'correct': True})
+  assert response.status_code == 400
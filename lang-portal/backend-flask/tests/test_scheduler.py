@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+from lib.scheduler import MAX_INTERVAL_DAYS, MIN_EASE, next_schedule
+
+REVIEWED_AT = datetime(2025, 3, 1, 9, 30)
+
+def test_intervals_grow_with_correct_answers():
+  schedule = None
+  intervals = []
+  for _ in range(4):
+    ease, interval, repetitions, due_at = next_schedule(schedule, True, REVIEWED_AT)
+    schedule = (ease, interval, repetitions)
+    intervals.append(interval)
+  assert intervals == [1, 6, 16, 45]
+  assert due_at == '2025-04-15 09:30:00'
+
+def test_intervals_stop_growing_at_the_cap():
+  ease, interval, repetitions, due_at = next_schedule((2.5, MAX_INTERVAL_DAYS - 1, 40), True, REVIEWED_AT)
+  assert interval == MAX_INTERVAL_DAYS
+  assert due_at == '2125-02-05 09:30:00'
+
+def test_wrong_answer_resets_interval_and_lowers_ease():
+  ease, interval, repetitions, due_at = next_schedule((2.5, 16, 3), False, REVIEWED_AT)
+  assert (interval, repetitions) == (1, 0)
+  assert ease < 2.5
+  assert due_at == '2025-03-02 09:30:00'
+  assert next_schedule((MIN_EASE, 1, 0), False, REVIEWED_AT)[0] == MIN_EASE
+
+def test_due_words_come_before_new_words(app, client, study_session):
+  # study_session reviewed words 1-3 just now, so they are scheduled for
+  # later and the group's queue starts with words never reviewed
+  words = client.get('/api/groups/1/due?limit=5').get_json()['words']
+  assert [word['new'] for word in words] == [True] * 5
+  assert not {1, 2, 3} & {word['id'] for word in words}
+
+  with app.app_context():
+    connection = app.db.get()
+    connection.execute("UPDATE word_schedules SET due_at = '2000-01-01 00:00:00' WHERE word_id = 2")
+    connection.commit()
+    app.db.close()
+  words = client.get('/api/groups/1/due?limit=2').get_json()['words']
+  assert words[0]['id'] == 2 and words[0]['due_at'] == '2000-01-01 00:00:00'
+  assert words[1]['new']
+
+  words = client.get('/api/groups/1/due?include_new=false').get_json()['words']
+  assert [word['id'] for word in words] == [2]
+
+def test_reviews_update_schedules(app, client, study_session):
+  client.post(f'/api/study_sessions/{study_session}/review_log', json={'word_id': 1, 'correct': True})
+  app.review_queue.flush()
+
+  # Replaying a journal entry that is already committed must not move the
+  # schedule again
+  with app.app_context():
+    entry = app.db.get().execute('''
+      SELECT journal_id, study_session_id, word_id, correct, created_at
+      FROM word_review_items WHERE journal_id IS NOT NULL
+    ''').fetchone()
+    app.db.close()
+  app.review_queue._commit([dict(entry)])
+
+  with app.app_context():
+    connection = app.db.get()
+    rows = connection.execute(
+      'SELECT word_id, interval_days, repetitions, due_at FROM word_schedules ORDER BY word_id'
+    ).fetchall()
+    group_due = connection.execute('SELECT due_at FROM word_groups WHERE word_id = 1').fetchone()[0]
+    app.db.close()
+  schedules = {row[0]: (row[1], row[2]) for row in rows}
+  assert schedules == {1: (6, 2), 2: (1, 0), 3: (1, 1)}
+  assert group_due == rows[0][3]
+  assert rows[0][3] > (datetime.now() + timedelta(days=5)).isoformat(sep=' ')
+
+  client.post('/api/study_sessions/reset')
+  assert client.get('/api/groups/1/due?include_new=false').get_json()['words'] == []
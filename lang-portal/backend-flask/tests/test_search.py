@@ -0,0 +1,75 @@
+import sqlite3
+
+from lib.search import fold
+
+def search(client, **params):
+  return client.get('/api/words/search', query_string=params).get_json()['words']
+
+def test_fold_removes_accents_and_case():
+  assert fold('Árbol') == 'arbol'
+  assert fold('AÑO pingüino') == 'ano pinguino'
+
+def test_prefix_search_ignores_accents(client):
+  words = search(client, q='FRIO')
+  assert [(word['spanish'], word['match']) for word in words] == [('frío', 'prefix')]
+  assert [word['spanish'] for word in search(client, q='habl')] == ['hablar']
+
+def test_substring_matches_follow_prefix_matches(client):
+  words = search(client, q='ablar', field='spanish')
+  assert [(word['spanish'], word['match']) for word in words] == [('hablar', 'substring')]
+  # A field narrows matching to that column only
+  assert search(client, q='speak', field='spanish') == []
+
+def test_index_follows_word_changes(app, client):
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute(
+      'INSERT INTO words (english, spanish, english_folded, spanish_folded) VALUES (?, ?, ?, ?)',
+      ('tree', 'árbol', fold('tree'), fold('árbol'))
+    )
+    word_id = cursor.lastrowid
+    app.db.commit()
+    app.db.close()
+  assert [word['id'] for word in search(client, q='arbol')] == [word_id]
+  assert [word['id'] for word in search(client, q='RBOL')] == [word_id]
+
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute("UPDATE words SET spanish = 'pino', spanish_folded = 'pino' WHERE id = ?", (word_id,))
+    app.db.commit()
+    app.db.close()
+  assert search(client, q='arbol') == []
+  assert [word['id'] for word in search(client, q='pin', field='spanish')] == [word_id]
+
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('DELETE FROM words WHERE id = ?', (word_id,))
+    app.db.commit()
+    app.db.close()
+  assert search(client, q='pino') == []
+
+def test_words_written_by_other_tools_are_folded_on_migrate(app, client):
+  # The schema needs nothing from Python: a plain connection can edit words
+  connection = sqlite3.connect(app.config['DATABASE'])
+  word_id = connection.execute("INSERT INTO words (english, spanish) VALUES ('Crème brûlée', 'crema')").lastrowid
+  connection.execute("UPDATE words SET spanish = 'crema catalana' WHERE id = ?", (word_id,))
+  connection.execute("DELETE FROM words WHERE english = 'to write'")
+  connection.commit()
+  connection.close()
+  # Whole words match straight away; substrings once migrate folds the word
+  assert [word['id'] for word in search(client, q='creme brul')] == [word_id]
+  assert search(client, q='RULEE') == []
+  with app.app_context():
+    app.db.migrate()
+    app.db.close()
+  assert [word['id'] for word in search(client, q='RULEE')] == [word_id]
+  assert [word['id'] for word in search(client, q='atalan', field='spanish')] == [word_id]
+  connection = sqlite3.connect(app.config['DATABASE'])
+  for table in ('words_fts', 'words_trigram'):
+    connection.execute(f"INSERT INTO {table} ({table}) VALUES ('integrity-check')")
+  connection.close()
+
+def test_search_validates_parameters(client):
+  assert client.get('/api/words/search').status_code == 400
+  assert client.get('/api/words/search?q=a&field=groups').status_code == 400
+  assert len(search(client, q='a', limit=1000)) <= 50
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+def test_listings_share_session_summaries(client, study_session):
+  # A second session without reviews ends 30 minutes after it starts
+  empty = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['id']
+
+  listed = client.get('/api/study_sessions').get_json()['items']
+  by_group = client.get('/api/groups/1/study_sessions').get_json()['study_sessions']
+  by_activity = client.get('/api/study_activities/1/sessions').get_json()['items']
+  detail = client.get(f'/api/study_sessions/{study_session}').get_json()['session']
+
+  reviewed = next(session for session in listed if session['id'] == study_session)
+  assert (reviewed['review_items_count'], reviewed['correct_count'], reviewed['wrong_count']) == (3, 2, 1)
+  assert reviewed == detail
+  assert [session['id'] for session in by_group] == [session['id'] for session in by_activity]
+
+  unreviewed = next(session for session in by_group if session['id'] == empty)
+  assert unreviewed['review_items_count'] == 0
+  duration = datetime.fromisoformat(unreviewed['end_time']) - datetime.fromisoformat(unreviewed['start_time'])
+  assert duration == timedelta(minutes=30)
+
+def test_group_sessions_accept_response_sort_keys(client, study_session):
+  client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  for sort_by in ('reviewItemsCount', 'review_items_count'):
+    sessions = client.get(f'/api/groups/1/study_sessions?sort_by={sort_by}&order=desc').get_json()['study_sessions']
+    assert [session['review_items_count'] for session in sessions] == [3, 0]
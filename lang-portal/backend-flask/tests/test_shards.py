@@ -0,0 +1,131 @@
+import pytest
+
+from app import create_app
+from tests.conftest import BACKEND_DIR
+
+@pytest.fixture
+def shard_app(tmp_path, monkeypatch):
+  monkeypatch.chdir(BACKEND_DIR)
+  app = create_app({
+    'DATABASE': str(tmp_path / 'test_words.db'),
+    'DATABASE_POOL_SIZE': 1,
+    'REVIEW_JOURNAL': str(tmp_path / 'review_journal.ndjson'),
+    'SHARD_DIRECTORY': str(tmp_path / 'learners'),
+    'TESTING': True
+  })
+  app.db.init(app)
+  yield app
+  app.review_queue.stop()
+  app.shards.close_all()
+  app.db.pool.close_all()
+
+def as_learner(learner_id):
+  return {'X-Learner-Id': learner_id}
+
+def start_session(client, headers):
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1}, headers=headers)
+  assert response.status_code == 201
+  return response.get_json()['id']
+
+def test_learners_have_separate_study_histories(shard_app):
+  client = shard_app.test_client()
+  session_id = start_session(client, as_learner('ana'))
+  response = client.post(f'/api/study_sessions/{session_id}/review', json={'words': [
+    {'word_id': 1, 'correct': True},
+    {'word_id': 2, 'correct': False}
+  ]}, headers=as_learner('ana'))
+  assert response.status_code == 200
+  shard_app.review_queue.flush()
+
+  ana = client.get('/api/dashboard/stats', headers=as_learner('ana')).get_json()
+  ben = client.get('/api/dashboard/stats', headers=as_learner('ben')).get_json()
+  primary = client.get('/api/dashboard/stats').get_json()
+  assert (ana['total_sessions'], ana['total_words_studied']) == (1, 2)
+  assert (ben['total_sessions'], ben['total_words_studied']) == (0, 0)
+  assert primary['total_sessions'] == 0
+  # The vocabulary is shared
+  assert ana['total_vocabulary'] == ben['total_vocabulary'] == primary['total_vocabulary'] > 0
+
+  assert client.get('/api/study_sessions', headers=as_learner('ana')).get_json()['total'] == 1
+  assert client.get('/api/study_sessions', headers=as_learner('ben')).get_json()['total'] == 0
+  assert client.get(f'/api/study_sessions/{session_id}', headers=as_learner('ben')).status_code == 404
+
+  word = client.get('/api/words/1', headers=as_learner('ana')).get_json()
+  assert word['correct_count'] == 1
+  assert client.get('/api/words/1', headers=as_learner('ben')).get_json()['correct_count'] == 0
+  # Reads alone never create a shard
+  assert shard_app.shards.learner_ids() == ['ana']
+
+def test_due_words_follow_the_learners_schedules(shard_app):
+  client = shard_app.test_client()
+  session_id = start_session(client, as_learner('ana'))
+  client.post(f'/api/study_sessions/{session_id}/review', json={'words': [
+    {'word_id': 1, 'correct': True}
+  ]}, headers=as_learner('ana'))
+  shard_app.review_queue.flush()
+
+  ana = client.get('/api/groups/1/due?limit=100', headers=as_learner('ana')).get_json()['words']
+  ben = client.get('/api/groups/1/due?limit=100', headers=as_learner('ben')).get_json()['words']
+  assert 1 not in [word['id'] for word in ana]
+  assert ben[0]['id'] == 1 and ben[0]['new']
+  assert len(ben) == len(ana) + 1
+
+def test_pending_reviews_are_merged_for_their_learner_only(shard_app):
+  client = shard_app.test_client()
+  session_id = start_session(client, as_learner('ana'))
+  client.post(f'/api/study_sessions/{session_id}/review_log', json={'words': [
+    {'word_id': 3, 'correct': True}
+  ]}, headers=as_learner('ana'))
+  assert client.get('/api/words/3', headers=as_learner('ana')).get_json()['correct_count'] == 1
+  assert client.get('/api/words/3').get_json()['correct_count'] == 0
+
+  shard_app.review_queue.flush()
+  with shard_app.shards.pool('ana').connection() as connection:
+    assert connection.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0] == 1
+  with shard_app.db.pool.connection() as connection:
+    assert connection.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0] == 0
+
+def test_reads_for_unknown_learners_leave_nothing_on_disk(shard_app):
+  client = shard_app.test_client()
+  for url in ('/api/dashboard/stats', '/api/study_sessions', '/api/words/1', '/api/groups/1/due', '/api/study_sessions/reviews/export'):
+    assert client.get(url, headers=as_learner('carla')).status_code == 200
+  assert client.post('/api/study_sessions/1/review', json={'words': [
+    {'word_id': 1, 'correct': True}
+  ]}, headers=as_learner('carla')).status_code == 404
+  assert client.post('/api/study_sessions/reset', headers=as_learner('carla')).status_code == 200
+  assert shard_app.shards.learner_ids() == []
+
+def test_shard_creation_is_capped(shard_app):
+  shard_app.shards.max_shards = 1
+  client = shard_app.test_client()
+  start_session(client, as_learner('ana'))
+  start_session(client, as_learner('ana'))
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1}, headers=as_learner('ben'))
+  assert response.status_code == 503
+  assert shard_app.shards.learner_ids() == ['ana']
+
+def test_invalid_learner_id_is_rejected(shard_app):
+  response = shard_app.test_client().get('/api/dashboard/stats', headers=as_learner('../words'))
+  assert response.status_code == 400
+
+def test_least_recently_used_shards_are_closed(shard_app):
+  shard_app.shards.max_open = 2
+  first = shard_app.shards.pool('a', create=True)
+  shard_app.shards.pool('b', create=True)
+  shard_app.shards.pool('a')
+  shard_app.shards.pool('c', create=True)
+  assert list(shard_app.shards._pools) == ['a', 'c']
+  assert shard_app.shards.pool('a') is first
+  # A reopened shard keeps its data
+  client = shard_app.test_client()
+  start_session(client, as_learner('b'))
+  shard_app.shards.max_open = 1
+  shard_app.shards.pool('d', create=True)
+  assert client.get('/api/study_sessions', headers=as_learner('b')).get_json()['total'] == 1
+
+def test_preflight_allows_the_learner_header(shard_app):
+  response = shard_app.test_client().options('/api/words', headers={
+    'Origin': 'http://localhost:5173',
+    'Access-Control-Request-Method': 'GET'
+  })
+  assert 'X-Learner-Id' in response.headers['Access-Control-Allow-Headers']
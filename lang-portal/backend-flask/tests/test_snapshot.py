@@ -0,0 +1,61 @@
+import pytest
+
+from app import create_app
+from tests.conftest import BACKEND_DIR
+
+@pytest.fixture
+def snapshot_app(tmp_path, monkeypatch):
+  monkeypatch.chdir(BACKEND_DIR)
+  app = create_app({
+    'DATABASE': str(tmp_path / 'test_words.db'),
+    'DATABASE_POOL_SIZE': 1,
+    'REVIEW_JOURNAL': str(tmp_path / 'review_journal.ndjson'),
+    'READ_SNAPSHOT': True,
+    'READ_SNAPSHOT_MAX_STALENESS': 60,
+    'TESTING': True
+  })
+  app.db.init(app)
+  app.read_db.refresh()
+  yield app
+  app.read_db.stop()
+  app.review_queue.stop()
+  app.db.pool.close_all()
+
+def total_sessions(client):
+  return client.get('/api/dashboard/stats').get_json()['total_sessions']
+
+def test_snapshot_is_next_to_the_database(snapshot_app, tmp_path):
+  assert snapshot_app.read_db.path == str(tmp_path / 'test_words.snapshot.db')
+  assert 0 <= snapshot_app.read_db.age() < 60
+
+def test_listings_read_the_snapshot_until_it_is_refreshed(snapshot_app):
+  client = snapshot_app.test_client()
+  before = total_sessions(client)
+  response = client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  assert response.status_code == 201
+  session_id = response.get_json()['id']
+
+  # Written to the primary, not yet in the snapshot
+  assert client.get(f'/api/study_sessions/{session_id}').status_code == 200
+  assert total_sessions(client) == before
+  assert client.get('/api/study_sessions').get_json()['total'] == before
+
+  assert snapshot_app.read_db.refresh() is True
+  assert total_sessions(client) == before + 1
+  assert client.get('/api/groups/1/study_sessions').get_json()['study_sessions'][0]['id'] == session_id
+  assert snapshot_app.read_db.fallbacks == 0
+
+def test_unchanged_primary_is_not_copied_again(snapshot_app):
+  assert snapshot_app.read_db.refresh() is False
+
+def test_stale_snapshot_falls_back_to_the_primary(snapshot_app):
+  client = snapshot_app.test_client()
+  before = total_sessions(client)
+  client.post('/api/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+
+  snapshot_app.read_db.max_staleness = 0
+  assert total_sessions(client) == before + 1
+  assert snapshot_app.read_db.fallbacks == 1
+
+def test_snapshot_is_off_by_default(app):
+  assert app.read_db is app.db
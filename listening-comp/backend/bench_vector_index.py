@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from vector_index import NumpyIndex
+
+
+PRACTICE_TYPES = ("Vocabulario", "Conversación")
+FILTER = {"practice_type": "Vocabulario"}
+
+
+def clustered_vectors(count, dimensions, topics, random):
+    """Unit vectors around `topics` centres, roughly how question embeddings group"""
+    centres = random.standard_normal((topics, dimensions)).astype(np.float32)
+    vectors = np.empty((count, dimensions), dtype=np.float32)
+    for start in range(0, count, 100000):
+        end = min(start + 100000, count)
+        block = centres[random.integers(0, topics, end - start)]
+        block += 0.6 * random.standard_normal((end - start, dimensions)).astype(np.float32)
+        vectors[start:end] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def time_queries(index, queries, k, where=None):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.query([query.tolist()], n_results=k, where=where)['ids'][0])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return results, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark NumpyIndex top-k search, exhaustive and IVF, with and without a filter')
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--dimensions', type=int, default=1024, help='Titan v2 returns 256, 512 or 1024')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', type=int, default=16)
+    args = parser.parse_args()
+
+    random = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex(directory, nprobe=args.nprobe)
+        started = time.perf_counter()
+        for start in range(0, args.count, 100000):
+            end = min(start + 100000, args.count)
+            vectors = clustered_vectors(end - start, args.dimensions, 1000, np.random.default_rng(start))
+            index.add(
+                ids=[f"q{n}" for n in range(start, end)],
+                embeddings=vectors,
+                documents=[""] * (end - start),
+                # Half the rows match the filtered queries
+                metadatas=[{"practice_type": PRACTICE_TYPES[n % 2]} for n in range(start, end)]
+            )
+        print(f"Indexed {args.count:,} x {args.dimensions} vectors in {time.perf_counter() - started:.1f}s")
+        queries = index.get([f"q{n}" for n in random.integers(0, args.count, args.queries)], include_embeddings=True)
+        queries = np.asarray(queries['embeddings'], dtype=np.float32)
+        queries += 0.05 * random.standard_normal(queries.shape).astype(np.float32)
+
+        exact, p50, p95 = time_queries(index, queries, args.k)
+        print(f"exhaustive  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms")
+        exact_filtered, p50, p95 = time_queries(index, queries, args.k, FILTER)
+        print(f"exh. filter p50 {p50:8.2f} ms  p95 {p95:8.2f} ms")
+
+        started = time.perf_counter()
+        index.train_ivf()
+        print(f"Trained IVF ({len(index._ivf['centroids'])} lists) in {time.perf_counter() - started:.1f}s")
+        approximate, p50, p95 = time_queries(index, queries, args.k)
+        recall = np.mean([len(set(a) & set(e)) / args.k for a, e in zip(approximate, exact)])
+        print(f"IVF         p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  recall@{args.k} {recall:.3f}  (nprobe {args.nprobe})")
+        approximate, p50, p95 = time_queries(index, queries, args.k, FILTER)
+        recall = np.mean([len(set(a) & set(e)) / args.k for a, e in zip(approximate, exact_filtered)])
+        print(f"IVF filter  p50 {p50:8.2f} ms  p95 {p95:8.2f} ms  recall@{args.k} {recall:.3f}  ({FILTER})")
+
+        # All queries in one call, as find_similar_questions_batch issues them
+        started = time.perf_counter()
+        index.query(queries.tolist(), n_results=args.k)
+        print(f"IVF batch   {(time.perf_counter() - started) * 1000 / len(queries):8.2f} ms per query ({len(queries)} per call)")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
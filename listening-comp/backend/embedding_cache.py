@@ -0,0 +1,158 @@
+from typing import List, Dict, Optional
+from array import array
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Text as it is embedded: NFC, surrounding and repeated whitespace removed"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model_id: str, text: str) -> str:
+    """Stable key for an embedding: BLAKE2b of the model id and normalized text"""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embeddings on disk in SQLite, keyed by cache_key() and stored as float32
+    blobs. Holds at most `max_entries` embeddings; the least recently used
+    are evicted first. Counts hits and misses.
+
+    The row count is read once when the cache opens and then tracked, so a
+    put only touches the last_used index when it takes the cache over the
+    limit. Processes sharing the file each evict against their own count.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = 1_000_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._connection.commit()
+        self._count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Cached embeddings for the keys that have one"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            # Chunked below SQLite's bound parameter limit
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._connection.commit()
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        if not embeddings:
+            return
+        now = time.time()
+        keys = list(embeddings)
+        with self._lock:
+            existing = 0
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                existing += self._connection.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                ).fetchone()[0]
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                [(key, array("f", embedding).tobytes(), now) for key, embedding in embeddings.items()]
+            )
+            self._count += len(keys) - existing
+            if self.max_entries is not None and self._count > self.max_entries:
+                evicted = self._connection.execute("""
+                    DELETE FROM embeddings WHERE key IN (
+                        SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?
+                    )
+                """, (self._count - self.max_entries,)).rowcount
+                self._count -= evicted
+            self._connection.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class CachedEmbeddingFunction:
+    """
+    Embedding function that answers from an EmbeddingCache and passes only
+    texts it has not seen (once each) to the wrapped function
+    """
+
+    def __init__(self, embedding_function, cache: EmbeddingCache):
+        self.embedding_function = embedding_function
+        self.cache = cache
+        self.model_id = embedding_function.model_id
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_id, text) for text in input]
+        cached = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, input):
+            if key not in cached and key not in missing:
+                missing[key] = normalize_text(text)
+        if missing:
+            # Rounded to float32 as the cache stores them, so a miss returns
+            # the same values a later hit will
+            embedded = {
+                key: array("f", embedding).tolist()
+                for key, embedding in zip(missing, self.embedding_function(list(missing.values())))
+            }
+            self.cache.put_many(embedded)
+            cached.update(embedded)
+        return [cached[key] for key in keys]
@@ -0,0 +1,166 @@
+from typing import List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import random
+import threading
+import time
+
+# Titan Text Embeddings v2
+MODEL_ID = "amazon.titan-embed-text-v2:0"
+
+# Bedrock error codes worth retrying: the request was fine, the service was
+# busy or slow
+RETRYABLE_ERRORS = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+}
+THROTTLING_ERRORS = {"ThrottlingException", "TooManyRequestsException"}
+
+
+class EmbeddingError(Exception):
+    """Raised when some texts could not be embedded after all retries"""
+
+    def __init__(self, failures: Dict[int, Exception]):
+        self.failures = failures
+        first_index = min(failures)
+        super().__init__(
+            f"Failed to embed {len(failures)} text(s) (first: input {first_index}: {failures[first_index]})"
+        )
+
+
+def error_code(error: Exception) -> Optional[str]:
+    """Error code of a botocore ClientError (or anything shaped like one)"""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+class AdaptiveLimiter:
+    """
+    Caps how many requests are in flight. The cap grows by one after every
+    `increase_after` successes and halves on throttling (AIMD), so the
+    concurrency settles just under the account's Bedrock quota.
+    """
+
+    def __init__(self, max_limit: int, increase_after: int = 10):
+        self.max_limit = max_limit
+        self.limit = max_limit
+        self.increase_after = increase_after
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+
+class BedrockEmbeddingFunction:
+    """
+    ChromaDB embedding function backed by Amazon Bedrock.
+
+    Titan takes one text per InvokeModel call, so a batch is embedded by up
+    to `max_workers` concurrent calls, limited adaptively when Bedrock
+    throttles. Retryable errors are retried with exponential backoff and
+    jitter; if any text still fails, EmbeddingError is raised naming every
+    failed input instead of storing a placeholder vector.
+    """
+
+    def __init__(self, region_name: str = "us-east-2", model_id: str = MODEL_ID, client=None,
+                 max_workers: int = 8, max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 20.0):
+        """Initialize Bedrock client (or use `client`, e.g. a stub in tests)"""
+        if client is None:
+            import boto3
+            client = boto3.client(
+                service_name='bedrock-runtime',
+                region_name=region_name
+            )
+        self.bedrock = client
+        self.model_id = model_id
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(max_workers)
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self._stats_lock = threading.Lock()
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        """Generate embeddings for a list of texts, in input order"""
+        embeddings: List[Optional[List[float]]] = [None] * len(input)
+        failures: Dict[int, Exception] = {}
+
+        def embed(index: int):
+            try:
+                embeddings[index] = self._embed_with_retry(input[index])
+            except Exception as e:
+                failures[index] = e
+
+        if len(input) == 1:
+            embed(0)
+        elif input:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(input))) as executor:
+                list(executor.map(embed, range(len(input))))
+
+        if failures:
+            raise EmbeddingError(failures)
+        return embeddings
+
+    def _embed_with_retry(self, text: str) -> List[float]:
+        attempt = 0
+        while True:
+            try:
+                with self.limiter:
+                    embedding = self._invoke(text)
+                self.limiter.on_success()
+                return embedding
+            except Exception as e:
+                code = error_code(e)
+                if code in THROTTLING_ERRORS:
+                    self.limiter.on_throttle()
+                    with self._stats_lock:
+                        self.throttles += 1
+                if code not in RETRYABLE_ERRORS or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                # Full jitter, so throttled workers don't retry in lockstep
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _invoke(self, text: str) -> List[float]:
+        with self._stats_lock:
+            self.calls += 1
+        response = self.bedrock.invoke_model(
+            modelId=self.model_id,
+            body=json.dumps({"inputText": text})
+        )
+        return json.loads(response['body'].read())['embedding']
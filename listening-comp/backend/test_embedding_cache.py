@@ -0,0 +1,98 @@
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache, cache_key
+from embeddings import BedrockEmbeddingFunction
+from test_embeddings import StubBedrockRuntime
+
+
+def cached_function(directory, stub, max_entries=None):
+    cache = EmbeddingCache(os.path.join(directory, "embedding_cache.sqlite3"), max_entries=max_entries)
+    return CachedEmbeddingFunction(BedrockEmbeddingFunction(client=stub), cache)
+
+
+def test_reindexing_makes_no_remote_calls():
+    """A second run over the same text, in a new process, hits the cache only"""
+    texts = ["Vas a escuchar a dos amigos.", "¿Dónde está la estación?", "Vas a escuchar  a dos amigos. "]
+    with tempfile.TemporaryDirectory() as directory:
+        stub = StubBedrockRuntime()
+        function = cached_function(directory, stub)
+        first = function(texts)
+        # The third text normalizes to the first, so it is embedded once
+        assert stub.calls == 2
+        assert first[0] == first[2]
+        function.cache.close()
+
+        stub = StubBedrockRuntime()
+        function = cached_function(directory, stub)
+        assert function(texts) == first
+        assert stub.calls == 0
+        assert function.cache.stats()["hits"] == 3
+        function.cache.close()
+
+
+def test_keys_depend_on_the_model():
+    assert cache_key("amazon.titan-embed-text-v2:0", "hola") != cache_key("amazon.titan-embed-text-v1", "hola")
+    assert cache_key("m", "hola  mundo\n") == cache_key("m", "hola mundo")
+
+
+def test_least_recently_used_embeddings_are_evicted():
+    with tempfile.TemporaryDirectory() as directory:
+        stub = StubBedrockRuntime()
+        function = cached_function(directory, stub, max_entries=2)
+        function(["uno"])
+        function(["dos"])
+        function(["uno"])
+        function(["tres"])
+        assert len(function.cache) == 2
+        calls = stub.calls
+        function(["uno", "tres"])
+        assert stub.calls == calls
+        function(["dos"])
+        assert stub.calls == calls + 1
+        function.cache.close()
+
+
+def test_misses_and_hits_return_the_same_values():
+    class ThirdsEmbeddingFunction:
+        model_id = "thirds"
+
+        def __call__(self, input):
+            return [[1 / 3, 0.1] for _ in input]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, "embedding_cache.sqlite3"))
+        function = CachedEmbeddingFunction(ThirdsEmbeddingFunction(), cache)
+        miss = function(["hola"])
+        assert function(["hola"]) == miss
+        assert cache.stats()["hits"] == 1
+        cache.close()
+
+
+def test_replacing_an_embedding_does_not_evict():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = EmbeddingCache(os.path.join(directory, "embedding_cache.sqlite3"), max_entries=2)
+        cache.put_many({"a": [1.0], "b": [2.0]})
+        cache.put_many({"a": [3.0]})
+        assert cache.get_many(["a", "b"]) == {"a": [3.0], "b": [2.0]}
+        cache.close()
+
+        # The count is picked up again when the cache is reopened
+        cache = EmbeddingCache(os.path.join(directory, "embedding_cache.sqlite3"), max_entries=2)
+        cache.put_many({"c": [4.0]})
+        assert len(cache) == 2
+        assert "c" in cache.get_many(["c"])
+        cache.close()
+
+
+if __name__ == "__main__":
+    for test in (
+        test_reindexing_makes_no_remote_calls,
+        test_keys_depend_on_the_model,
+        test_least_recently_used_embeddings_are_evicted,
+        test_misses_and_hits_return_the_same_values,
+        test_replacing_an_embedding_does_not_evict,
+    ):
+        test()
+        print(f"{test.__name__}: ok")
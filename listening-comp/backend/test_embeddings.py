@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from embeddings import BedrockEmbeddingFunction, EmbeddingError
+
+
+class StubClientError(Exception):
+    """Shaped like botocore's ClientError: the error code is in .response"""
+
+    def __init__(self, code: str):
+        super().__init__(f"An error occurred ({code})")
+        self.response = {"Error": {"Code": code}}
+
+
+class StubBedrockRuntime:
+    """
+    Stands in for the bedrock-runtime client. Embeds a text as
+    [len(text), first character code, ...], throttles the first `throttle`
+    calls and always rejects texts in `reject`.
+    """
+
+    def __init__(self, throttle: int = 0, reject=(), latency: float = 0.01, dimensions: int = 4):
+        self.throttle = throttle
+        self.reject = set(reject)
+        self.latency = latency
+        self.dimensions = dimensions
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId: str, body: str):
+        text = json.loads(body)["inputText"]
+        with self._lock:
+            self.calls += 1
+            throttled = self.calls <= self.throttle
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if throttled:
+                raise StubClientError("ThrottlingException")
+            if text in self.reject:
+                raise StubClientError("ValidationException")
+            embedding = [float(len(text)), float(ord(text[0]))] + [0.0] * (self.dimensions - 2)
+            return {"body": io.BytesIO(json.dumps({"embedding": embedding}).encode("utf-8"))}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def stub_embedding_function(stub, **kwargs):
+    return BedrockEmbeddingFunction(client=stub, base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+def test_embeddings_come_back_in_input_order():
+    """Concurrent calls still return one embedding per text, in order"""
+    stub = StubBedrockRuntime()
+    texts = [f"{'x' * n}pregunta" for n in range(40)]
+    embeddings = stub_embedding_function(stub, max_workers=8)(texts)
+    assert [embedding[0] for embedding in embeddings] == [float(len(text)) for text in texts]
+    assert stub.calls == 40
+    assert 1 < stub.max_in_flight <= 8
+
+
+def test_throttling_is_retried_and_lowers_concurrency():
+    stub = StubBedrockRuntime(throttle=6)
+    function = stub_embedding_function(stub, max_workers=8)
+    embeddings = function([f"texto {n}" for n in range(20)])
+    assert len(embeddings) == 20
+    assert function.retries == 6
+    assert function.throttles == 6
+    assert function.limiter.limit < 8
+
+
+def test_failures_are_reported_not_zero_filled():
+    stub = StubBedrockRuntime(reject={"mala"})
+    function = stub_embedding_function(stub)
+    try:
+        function(["buena", "mala", "otra"])
+    except EmbeddingError as e:
+        assert list(e.failures) == [1]
+    else:
+        raise AssertionError("EmbeddingError not raised")
+    # Non-retryable errors are not retried
+    assert function.retries == 0
+
+
+def test_retries_give_up_after_max_retries():
+    stub = StubBedrockRuntime(throttle=100)
+    function = stub_embedding_function(stub, max_retries=2)
+    try:
+        function(["hola"])
+    except EmbeddingError as e:
+        assert list(e.failures) == [0]
+    else:
+        raise AssertionError("EmbeddingError not raised")
+    assert stub.calls == 3
+
+
+if __name__ == "__main__":
+    for test in (
+        test_embeddings_come_back_in_input_order,
+        test_throttling_is_retried_and_lowers_concurrency,
+        test_failures_are_reported_not_zero_filled,
+        test_retries_give_up_after_max_retries,
+    ):
+        test()
+        print(f"{test.__name__}: ok")
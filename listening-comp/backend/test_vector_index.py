@@ -0,0 +1,125 @@
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from vector_index import NumpyIndex
+
+
+def random_vectors(count, dimensions=32, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def fill(index, vectors, first=0):
+    ids = [f"q{n}" for n in range(first, first + len(vectors))]
+    index.add(
+        ids=ids,
+        embeddings=vectors.tolist(),
+        documents=[f"document {n}" for n in range(first, first + len(vectors))],
+        metadatas=[{"practice_type": "Vocabulario" if n % 2 else "Conversación"} for n in range(first, first + len(vectors))]
+    )
+    return ids
+
+
+def exact_top(vectors, query, k):
+    return [f"q{n}" for n in np.argsort(-(vectors @ query), kind="stable")[:k]]
+
+
+def test_exact_search_matches_brute_force():
+    vectors = random_vectors(3000)
+    queries = random_vectors(5, seed=1)
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex(directory)
+        index.BLOCK_ROWS = 1000
+        fill(index, vectors)
+        results = index.query(queries.tolist(), n_results=10)
+        for query, ids, distances in zip(queries, results['ids'], results['distances']):
+            assert ids == exact_top(vectors, query, 10)
+            assert distances == sorted(distances)
+        index.close()
+
+
+def test_filters_deletes_and_reopening():
+    vectors = random_vectors(200)
+    query = vectors[3]
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex(directory)
+        fill(index, vectors)
+        results = index.query([query.tolist()], n_results=5, where={"practice_type": "Vocabulario"})
+        assert results['ids'][0][0] == "q3"
+        assert all(metadata["practice_type"] == "Vocabulario" for metadata in results['metadatas'][0])
+        assert abs(results['distances'][0][0]) < 1e-5
+
+        index.delete(["q3"])
+        index.close()
+
+        # Vectors and entries survive a restart; the deleted row stays gone
+        index = NumpyIndex(directory)
+        assert index.count() == 199
+        assert "q3" not in index.query([query.tolist()], n_results=5)['ids'][0]
+        assert index.get(["q4"])['documents'] == ["document 4"]
+        fill(index, vectors[:1], first=1000)
+        assert index.count() == 200
+        index.close()
+
+
+def test_ivf_search_finds_near_neighbours_and_new_rows():
+    vectors = random_vectors(5000)
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex(directory, nprobe=8)
+        fill(index, vectors)
+        index.train_ivf(n_lists=32)
+        # Each stored vector is its own nearest neighbour
+        results = index.query(vectors[:50].tolist(), n_results=1)
+        assert [ids[0] for ids in results['ids']] == [f"q{n}" for n in range(50)]
+
+        # Rows added after training are searched too
+        extra = random_vectors(10, seed=2)
+        fill(index, extra, first=5000)
+        results = index.query(extra.tolist(), n_results=1)
+        assert [ids[0] for ids in results['ids']] == [f"q{n}" for n in range(5000, 5010)]
+        index.close()
+
+        index = NumpyIndex(directory, nprobe=8)
+        assert index.query(vectors[7:8].tolist(), n_results=1)['ids'] == [["q7"]]
+        index.close()
+
+
+def test_filtered_search_with_and_without_ivf():
+    vectors = random_vectors(5000)
+    queries = random_vectors(5, seed=3)
+    vocabulary = vectors[1::2]
+    with tempfile.TemporaryDirectory() as directory:
+        index = NumpyIndex(directory, nprobe=32)
+        fill(index, vectors)
+        where = {"practice_type": "Vocabulario"}
+        for trained in (False, True):
+            if trained:
+                index.train_ivf(n_lists=32)
+            results = index.query(queries.tolist(), n_results=10, where=where)
+            for query, ids in zip(queries, results['ids']):
+                expected = [f"q{2 * int(row[1:]) + 1}" for row in exact_top(vocabulary, query, 10)]
+                assert len(set(ids) & set(expected)) >= (8 if trained else 10)
+                assert all(int(entry_id[1:]) % 2 for entry_id in ids)
+
+        # Rows added and deleted after the filter's mask was built
+        fill(index, queries[:1] * 1.0, first=5001)
+        fill(index, queries[:1] * 1.0, first=5002)
+        results = index.query(queries[:1].tolist(), n_results=3, where=where)
+        assert results['ids'][0][0] == "q5001"
+        assert "q5002" not in results['ids'][0]
+        index.delete(["q5001"])
+        assert "q5001" not in index.query(queries[:1].tolist(), n_results=3, where=where)['ids'][0]
+        index.close()
+
+
+if __name__ == "__main__":
+    for test in (
+        test_exact_search_matches_brute_force,
+        test_filters_deletes_and_reopening,
+        test_ivf_search_finds_near_neighbours_and_new_rows,
+        test_filtered_search_with_and_without_ivf,
+    ):
+        test()
+        print(f"{test.__name__}: ok")
@@ -0,0 +1,144 @@
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from embeddings import BedrockEmbeddingFunction
+from structured_data import DELEQuestion
+from test_embeddings import StubBedrockRuntime
+from vector_store import QuestionVectorStore, mmr_select, question_id, question_metadata, question_text
+
+QUESTIONS = [
+    DELEQuestion(
+        introduction="Vas a escuchar a dos amigos en una cafetería.",
+        conversation="- ¿Qué quieres tomar?\n- Un café con leche, por favor.",
+        question="¿Qué pide la mujer?"
+    ),
+    DELEQuestion(
+        introduction="Escucharás a un cliente y un vendedor en una tienda.",
+        conversation="- ¿Cuánto cuesta esta camisa?\n- Veinte euros.",
+        question="¿Cuánto cuesta la camisa?"
+    ),
+]
+
+
+BACKENDS = ("chroma", "numpy")
+
+
+def stub_store(directory, stub, backend="chroma"):
+    return QuestionVectorStore(
+        persist_directory=directory,
+        embedding_function=BedrockEmbeddingFunction(client=stub),
+        index_backend=backend
+    )
+
+
+def test_question_ids_are_stable_and_content_derived():
+    question = QUESTIONS[0]
+    assert question_id(question) == question_id(DELEQuestion(
+        introduction=question.introduction + "  ",
+        conversation=question.conversation,
+        question=question.question
+    ))
+    assert question_id(QUESTIONS[0]) != question_id(QUESTIONS[1])
+
+
+def test_reingesting_adds_and_embeds_nothing():
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            stub = StubBedrockRuntime()
+            store = stub_store(directory, stub, backend)
+            ids = store.bulk_add_questions(QUESTIONS + [QUESTIONS[0]])
+            assert ids[0] == ids[2]
+            assert store.index.count() == 2
+            calls = stub.calls
+
+            assert store.bulk_add_questions(QUESTIONS) == ids[:2]
+            assert store.add_question(QUESTIONS[1]) == ids[1]
+            assert store.index.count() == 2
+            assert stub.calls == calls
+            assert store.get_question_by_id(ids[1]) == QUESTIONS[1]
+
+
+def test_compact_moves_old_ids_and_drops_duplicates():
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            store = stub_store(directory, StubBedrockRuntime(), backend)
+            # As stored by earlier versions: hash() IDs, one question twice
+            questions = [QUESTIONS[0], QUESTIONS[0], QUESTIONS[1]]
+            documents = [question_text(question) for question in questions]
+            store.index.add(
+                ids=["111", "222", "333"],
+                embeddings=store.embedding_function(documents),
+                documents=documents,
+                metadatas=[question_metadata(question) for question in questions]
+            )
+            result = store.compact(batch_size=2)
+            assert result == {"scanned": 3, "rekeyed": 2, "removed": 1, "remaining": 2}
+            stable_ids = {question_id(question) for question in QUESTIONS}
+            assert store.index.existing_ids(list(stable_ids) + ["111", "222", "333"]) == stable_ids
+            assert store.compact()["rekeyed"] == 0
+
+
+def test_search_filters_on_metadata():
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            store = stub_store(directory, StubBedrockRuntime(), backend)
+            store.bulk_add_questions([QUESTIONS[0]], metadata={"practice_type": "Conversación"})
+            store.bulk_add_questions([QUESTIONS[1]], metadata={"practice_type": "Vocabulario"})
+            results = store.find_similar_questions("hola", n_results=5, where={"practice_type": "Vocabulario"})
+            assert results['ids'] == [question_id(QUESTIONS[1])]
+            assert len(store.find_similar_questions("hola", n_results=5)['ids']) == 2
+
+
+def test_batch_search_is_aligned_to_the_queries():
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            stub = StubBedrockRuntime()
+            store = stub_store(directory, stub, backend)
+            store.bulk_add_questions(QUESTIONS)
+            calls = stub.calls
+            queries = [question_text(QUESTIONS[1]), question_text(QUESTIONS[0]), question_text(QUESTIONS[1])]
+            results = store.find_similar_questions_batch(queries, n_results=1)
+            assert [result['ids'] for result in results] == [
+                [question_id(QUESTIONS[1])], [question_id(QUESTIONS[0])], [question_id(QUESTIONS[1])]
+            ]
+            # The queries were embedded before, as the stored questions
+            assert stub.calls == calls
+
+            # Only exact matches are within the threshold
+            results = store.find_similar_questions_batch(queries[:2], n_results=2, max_distance=1e-4)
+            assert [len(result['ids']) for result in results] == [1, 1]
+            assert store.find_similar_questions_batch([]) == []
+
+
+def test_mmr_prefers_diverse_neighbours():
+    query = [1.0, 0.0, 0.0]
+    candidates = [[0.99, 0.1, 0.0], [0.98, 0.12, 0.0], [0.7, 0.0, 0.7]]
+    # By similarity alone the two near-duplicates come first
+    assert mmr_select(query, candidates, 2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, candidates, 2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(query, [], 2) == []
+
+
+def test_batch_search_with_mmr():
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as directory:
+            store = stub_store(directory, StubBedrockRuntime(), backend)
+            store.bulk_add_questions(QUESTIONS)
+            results = store.find_similar_questions_batch(["hola"], n_results=2, mmr=True)
+            assert sorted(results[0]['ids']) == sorted(question_id(question) for question in QUESTIONS)
+            assert len(results[0]['documents']) == 2
+
+
+if __name__ == "__main__":
+    for test in (
+        test_question_ids_are_stable_and_content_derived,
+        test_reingesting_adds_and_embeds_nothing,
+        test_compact_moves_old_ids_and_drops_duplicates,
+        test_search_filters_on_metadata,
+        test_batch_search_is_aligned_to_the_queries,
+        test_mmr_prefers_diverse_neighbours,
+        test_batch_search_with_mmr,
+    ):
+        test()
+        print(f"{test.__name__}: ok")
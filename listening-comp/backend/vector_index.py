@@ -0,0 +1,533 @@
+from typing import List, Dict, Optional, Any, Iterator
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+
+# Metadata keys usable in `where` filters
+FILTER_KEY = re.compile(r"^\w+$")
+
+
+class VectorIndex(ABC):
+    """
+    Storage and nearest-neighbour search for question embeddings.
+    QuestionVectorStore embeds texts itself and talks to its index only
+    through these methods, so the backend can be swapped.
+
+    get() and scan() return Chroma-style dicts ({'ids': [...],
+    'documents': [...], 'metadatas': [...]}); query() returns one list per
+    query embedding under 'ids', 'distances', 'documents' and 'metadatas'.
+    Distances are squared L2, Chroma's default.
+    """
+
+    @abstractmethod
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[Dict]):
+        """Store new entries; IDs already in the index are left as they are"""
+
+    @abstractmethod
+    def existing_ids(self, ids: List[str]) -> set:
+        """The subset of `ids` that is in the index"""
+
+    @abstractmethod
+    def get(self, ids: List[str], include_embeddings: bool = False) -> Dict[str, list]:
+        """Entries for those of `ids` that are in the index, with their vectors if include_embeddings"""
+
+    @abstractmethod
+    def scan(self, batch_size: int = 1000) -> Iterator[Dict[str, list]]:
+        """Every entry, in pages of batch_size"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """Remove entries; IDs not in the index are ignored"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of entries"""
+
+    @abstractmethod
+    def query(self, embeddings: List[List[float]], n_results: int, where: Optional[Dict[str, Any]] = None,
+              include_embeddings: bool = False) -> Dict[str, list]:
+        """
+        The n_results nearest entries to each embedding, nearest first, and
+        with include_embeddings their stored vectors under 'embeddings'
+        """
+
+
+class ChromaIndex(VectorIndex):
+    """VectorIndex over a ChromaDB collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def existing_ids(self, ids):
+        if not ids:
+            return set()
+        return set(self.collection.get(ids=list(ids), include=[])['ids'])
+
+    def get(self, ids, include_embeddings=False):
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.get(ids=list(ids), include=include)
+
+    def scan(self, batch_size=1000):
+        # Pages are read up front: callers may delete while iterating
+        total = self.collection.count()
+        pages = [
+            self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            for offset in range(0, total, batch_size)
+        ]
+        return iter(pages)
+
+    def delete(self, ids):
+        self.collection.delete(ids=list(ids))
+
+    def count(self):
+        return self.collection.count()
+
+    def query(self, embeddings, n_results, where=None, include_embeddings=False):
+        n_results = min(n_results, self.count())
+        if n_results == 0:
+            keys = ('ids', 'distances', 'documents', 'metadatas') + (('embeddings',) if include_embeddings else ())
+            return {key: [[] for _ in embeddings] for key in keys}
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        return self.collection.query(
+            query_embeddings=embeddings,
+            n_results=n_results,
+            where=where or None,
+            include=include
+        )
+
+
+class NumpyIndex(VectorIndex):
+    """
+    Local in-process index. Vectors are unit-normalized float32 rows in a
+    memory-mapped file (vectors.f32); IDs, documents and metadata are in
+    SQLite (index.sqlite3). Search is a dot product against the memmap, so
+    nothing but the rows a query touches is paged in.
+
+    Without an IVF layout every query scans all rows, in blocks. train_ivf()
+    clusters the rows with spherical k-means and writes a copy of the
+    vectors grouped by cluster (vectors.ivf.f32); a query then scores only
+    the `nprobe` clusters nearest to it, each a contiguous slice, plus rows
+    added since the last train_ivf(). Retrain after large additions.
+
+    `where` filters are equality on metadata keys ({"practice_type": "..."},
+    {"key": {"$eq": value}} or {"$and": [...]}). Each filter's matching rows
+    are read from SQLite once and kept as a boolean row mask, extended as
+    rows are added, that the search applies the way it skips deleted rows.
+    A filter matching fewer rows than the search would score is answered by
+    scoring just those rows, exactly.
+    """
+
+    BLOCK_ROWS = 65536
+    # Row masks kept for the most recently used filters
+    MAX_FILTER_MASKS = 32
+
+    def __init__(self, directory: str, nprobe: int = 16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.nprobe = nprobe
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.ivf_path = os.path.join(directory, "ivf.npz")
+        self.ivf_vectors_path = os.path.join(directory, "vectors.ivf.f32")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT,
+                metadata TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+        settings = dict(self._db.execute("SELECT key, value FROM settings").fetchall())
+        self.dimensions = settings.get("dimensions")
+        # Rows ever written, deleted ones included; row numbers are never reused
+        self._rows = settings.get("rows", 0)
+        self._row_by_id = dict(self._db.execute("SELECT id, row FROM entries").fetchall())
+        self._live = np.zeros(self._rows, dtype=bool)
+        if self._row_by_id:
+            self._live[np.fromiter(self._row_by_id.values(), dtype=np.int64)] = True
+        self._vectors = None
+        self._open_vectors()
+        self._ivf = None
+        self._load_ivf()
+        # Filter (canonical JSON) -> (where, mask over every row written)
+        self._filter_masks = OrderedDict()
+
+    # Storage
+
+    def _open_vectors(self, capacity: int = 0):
+        if self.dimensions is None:
+            return
+        row_bytes = self.dimensions * 4
+        existing = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        capacity = max(capacity, existing, 1024)
+        if capacity > existing:
+            with open(self.vectors_path, "ab") as vectors:
+                vectors.truncate(capacity * row_bytes)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+    def _load_ivf(self):
+        if self.dimensions is None or not os.path.exists(self.ivf_path):
+            return
+        saved = np.load(self.ivf_path)
+        rows = saved["rows"]
+        self._ivf = {
+            "centroids": saved["centroids"],
+            "offsets": saved["offsets"],
+            "rows": rows,
+            "covered": int(saved["covered"]),
+            # A plain ndarray over the mapping: slicing a np.memmap costs more
+            # than the dot product on a small cluster
+            "vectors": np.asarray(np.memmap(self.ivf_vectors_path, dtype=np.float32, mode="r", shape=(len(rows), self.dimensions))),
+        }
+
+    @staticmethod
+    def _normalize(embeddings) -> np.ndarray:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2:
+            raise ValueError("Expected a list of embeddings")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def add(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                self._db.execute("INSERT INTO settings (key, value) VALUES ('dimensions', ?)", (self.dimensions,))
+                self._open_vectors()
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({self.dimensions})")
+
+            new = []
+            seen = set()
+            for position, entry_id in enumerate(ids):
+                if entry_id not in self._row_by_id and entry_id not in seen:
+                    seen.add(entry_id)
+                    new.append(position)
+            if not new:
+                return
+            first_row = self._rows
+            end_row = first_row + len(new)
+            if end_row > len(self._vectors):
+                self._vectors.flush()
+                self._open_vectors(max(end_row, 2 * len(self._vectors)))
+            self._vectors[first_row:end_row] = vectors[new]
+            self._vectors.flush()
+
+            self._db.executemany(
+                "INSERT INTO entries (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (first_row + offset, ids[position], documents[position], json.dumps(metadatas[position] or {}))
+                    for offset, position in enumerate(new)
+                ]
+            )
+            self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('rows', ?)", (end_row,))
+            self._db.commit()
+            for offset, position in enumerate(new):
+                self._row_by_id[ids[position]] = first_row + offset
+            self._live = np.concatenate([self._live, np.ones(len(new), dtype=bool)])
+            for key, (where, mask) in self._filter_masks.items():
+                matches = np.fromiter((self._matches(metadatas[position] or {}, where) for position in new), dtype=bool, count=len(new))
+                self._filter_masks[key] = (where, np.concatenate([mask, matches]))
+            self._rows = end_row
+
+    def existing_ids(self, ids):
+        with self._lock:
+            return {entry_id for entry_id in ids if entry_id in self._row_by_id}
+
+    def get(self, ids, include_embeddings=False):
+        with self._lock:
+            rows = [self._row_by_id[entry_id] for entry_id in ids if entry_id in self._row_by_id]
+            entries = self._entries(rows)
+        result = {
+            "ids": [entries[row][0] for row in rows],
+            "documents": [entries[row][1] for row in rows],
+            "metadatas": [entries[row][2] for row in rows],
+        }
+        if include_embeddings:
+            result["embeddings"] = [self._vectors[row].tolist() for row in rows]
+        return result
+
+    def _entries(self, rows) -> Dict[int, tuple]:
+        entries = {}
+        rows = [int(row) for row in rows]
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            for row, entry_id, document, metadata in self._db.execute(
+                f"SELECT row, id, document, metadata FROM entries WHERE row IN ({', '.join('?' * len(chunk))})",
+                chunk
+            ):
+                entries[row] = (entry_id, document, json.loads(metadata))
+        return entries
+
+    def scan(self, batch_size=1000):
+        after = -1
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    "SELECT row, id, document, metadata FROM entries WHERE row > ? ORDER BY row LIMIT ?",
+                    (after, batch_size)
+                ).fetchall()
+            if not page:
+                return
+            after = page[-1][0]
+            yield {
+                "ids": [entry[1] for entry in page],
+                "documents": [entry[2] for entry in page],
+                "metadatas": [json.loads(entry[3]) for entry in page],
+            }
+
+    def delete(self, ids):
+        with self._lock:
+            rows = [self._row_by_id.pop(entry_id) for entry_id in ids if entry_id in self._row_by_id]
+            if not rows:
+                return
+            for start in range(0, len(rows), 500):
+                chunk = rows[start:start + 500]
+                self._db.execute(f"DELETE FROM entries WHERE row IN ({', '.join('?' * len(chunk))})", chunk)
+            self._db.commit()
+            self._live[rows] = False
+
+    def count(self):
+        with self._lock:
+            return len(self._row_by_id)
+
+    # Search
+
+    def query(self, embeddings, n_results, where=None, include_embeddings=False):
+        queries = self._normalize(embeddings)
+        if self.dimensions is not None and queries.shape[1] != self.dimensions:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match the index ({self.dimensions})")
+        with self._lock:
+            rows_written = self._rows
+            live = self._live
+            if where:
+                live = live & self._filter_mask(where)
+        if self.count() == 0 or n_results <= 0:
+            top = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        elif where:
+            top = self._search_filtered(queries, n_results, rows_written, live)
+        elif self._ivf is not None:
+            top = self._search_ivf(queries, n_results, rows_written, live)
+        else:
+            top = self._search_all(queries, n_results, rows_written, live)
+
+        with self._lock:
+            entries = self._entries({int(row) for rows, _ in top for row in rows})
+        result = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        for rows, scores in top:
+            found = [(row, score) for row, score in zip(rows, scores) if int(row) in entries]
+            result["ids"].append([entries[int(row)][0] for row, _ in found])
+            result["documents"].append([entries[int(row)][1] for row, _ in found])
+            result["metadatas"].append([entries[int(row)][2] for row, _ in found])
+            # Squared L2 between unit vectors
+            result["distances"].append([max(0.0, 2.0 - 2.0 * float(score)) for _, score in found])
+            if include_embeddings:
+                result.setdefault("embeddings", []).append(self._vectors[[int(row) for row, _ in found]].tolist())
+        return result
+
+    @staticmethod
+    def _top(scores: np.ndarray, rows: np.ndarray, k: int):
+        # Best k of one query's candidate scores, best first
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k - 1)[:k]
+            scores, rows = scores[keep], rows[keep]
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+
+    def _search_all(self, queries, k, rows_written, live):
+        candidates = [[] for _ in queries]
+        for start in range(0, rows_written, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, rows_written)
+            block_live = live[start:end]
+            if not block_live.any():
+                continue
+            scores = queries @ self._vectors[start:end].T
+            scores[:, ~block_live] = -np.inf
+            rows = np.arange(start, end)
+            for index in range(len(queries)):
+                candidates[index].append(self._top(scores[index], rows, k))
+        return [self._merge(parts, k) for parts in candidates]
+
+    def _merge(self, parts, k):
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows = np.concatenate([part[0] for part in parts])
+        scores = np.concatenate([part[1] for part in parts])
+        rows, scores = self._top(scores, rows, k)
+        valid = np.isfinite(scores)
+        return rows[valid], scores[valid]
+
+    def _search_rows(self, queries, rows, k):
+        if len(rows) == 0:
+            return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in queries]
+        scores = queries @ self._vectors[rows].T
+        return [self._top(scores[index], rows, k) for index in range(len(queries))]
+
+    def _search_ivf(self, queries, k, rows_written, live):
+        ivf = self._ivf
+        # Clusters for every query in one product
+        centroid_scores = queries @ ivf["centroids"].T
+        nprobe = min(self.nprobe, centroid_scores.shape[1])
+        probed = np.argpartition(-centroid_scores, nprobe - 1, axis=1)[:, :nprobe]
+        # Rows added since the layout was built, scored for every query at once
+        tail = np.arange(ivf["covered"], rows_written)
+        tail = tail[live[tail]]
+        tail_scores = queries @ self._vectors[tail].T if len(tail) else None
+
+        top = []
+        for index, query in enumerate(queries):
+            spans = [(ivf["offsets"][cluster], ivf["offsets"][cluster + 1]) for cluster in probed[index]]
+            rows = np.concatenate([ivf["rows"][start:end] for start, end in spans])
+            scores = np.concatenate([ivf["vectors"][start:end] @ query for start, end in spans])
+            scores[~live[rows]] = -np.inf
+            parts = [self._top(scores, rows, k)]
+            if tail_scores is not None:
+                parts.append(self._top(tail_scores[index], tail, k))
+            top.append(self._merge(parts, k))
+        return top
+
+    def _search_filtered(self, queries, k, rows_written, live):
+        matches = np.flatnonzero(live)
+        ivf = self._ivf
+        if ivf is None:
+            scored = rows_written
+        else:
+            scored = self.nprobe * ivf["covered"] // len(ivf["centroids"]) + rows_written - ivf["covered"]
+        # Scoring a few matching rows directly beats a pass over every row
+        # the unfiltered search would touch
+        if len(matches) * 4 <= scored:
+            return self._search_rows(queries, matches, k)
+        if ivf is None:
+            return self._search_all(queries, k, rows_written, live)
+        top = self._search_ivf(queries, k, rows_written, live)
+        # The probed clusters may hold too few matches; those queries are
+        # answered exactly
+        short = [index for index, (rows, _) in enumerate(top) if len(rows) < min(k, len(matches))]
+        if short:
+            for index, exact in zip(short, self._search_rows(queries[short], matches, k)):
+                top[index] = exact
+        return top
+
+    def _filter_mask(self, where) -> np.ndarray:
+        # Called with the lock held
+        key = json.dumps(where, sort_keys=True)
+        cached = self._filter_masks.get(key)
+        if cached is not None:
+            self._filter_masks.move_to_end(key)
+            return cached[1]
+        conditions, params = self._where_sql(where)
+        mask = np.zeros(self._rows, dtype=bool)
+        rows = [row for (row,) in self._db.execute(f"SELECT row FROM entries WHERE {conditions}", params)]
+        mask[np.asarray(rows, dtype=np.int64)] = True
+        self._filter_masks[key] = (where, mask)
+        while len(self._filter_masks) > self.MAX_FILTER_MASKS:
+            self._filter_masks.popitem(last=False)
+        return mask
+
+    def _matches(self, metadata, where) -> bool:
+        # Python equivalent of _where_sql() for one entry's metadata
+        for key, value in where.items():
+            if key == "$and":
+                if not all(self._matches(metadata, clause) for clause in value):
+                    return False
+                continue
+            if isinstance(value, dict):
+                value = value["$eq"]
+            # json_extract() gives NULL for missing keys, which equals nothing
+            if metadata.get(key) is None or metadata[key] != value:
+                return False
+        return True
+
+    def _where_sql(self, where):
+        conditions = []
+        params = []
+        for key, value in where.items():
+            if key == "$and":
+                for clause in value:
+                    condition, clause_params = self._where_sql(clause)
+                    conditions.append(condition)
+                    params.extend(clause_params)
+                continue
+            if not FILTER_KEY.match(key):
+                raise ValueError(f"Unsupported filter key: {key}")
+            if isinstance(value, dict):
+                if set(value) != {"$eq"}:
+                    raise ValueError("NumpyIndex filters support only equality ($eq)")
+                value = value["$eq"]
+            conditions.append(f"json_extract(metadata, '$.{key}') = ?")
+            params.append(value)
+        return " AND ".join(conditions) or "1", params
+
+    # IVF layout
+
+    def train_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, sample_size: int = 65536, seed: int = 0):
+        """
+        Cluster the live rows into n_lists (default 4 * sqrt(rows)) and
+        write the clustered copy of the vectors used by query()
+        """
+        with self._lock:
+            rows_written = self._rows
+            live_rows = np.flatnonzero(self._live[:rows_written])
+        if len(live_rows) == 0:
+            return
+        n_lists = n_lists or max(1, int(4 * math.sqrt(len(live_rows))))
+        n_lists = min(n_lists, len(live_rows))
+        random = np.random.default_rng(seed)
+
+        sample = self._vectors[np.sort(random.choice(live_rows, min(sample_size, len(live_rows)), replace=False))]
+        centroids = sample[random.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            # Restart empty clusters from random sample points
+            sums[empty] = sample[random.choice(len(sample), int(empty.sum()))]
+            centroids = self._normalize(sums)
+
+        assignment = np.empty(len(live_rows), dtype=np.int64)
+        for start in range(0, len(live_rows), self.BLOCK_ROWS):
+            block = live_rows[start:start + self.BLOCK_ROWS]
+            assignment[start:start + len(block)] = np.argmax(self._vectors[block] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        rows = live_rows[order]
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+
+        temporary = self.ivf_vectors_path + ".tmp"
+        clustered = np.memmap(temporary, dtype=np.float32, mode="w+", shape=(len(rows), self.dimensions))
+        for start in range(0, len(rows), self.BLOCK_ROWS):
+            clustered[start:start + self.BLOCK_ROWS] = self._vectors[rows[start:start + self.BLOCK_ROWS]]
+        clustered.flush()
+        del clustered
+        with self._lock:
+            self._ivf = None
+            os.replace(temporary, self.ivf_vectors_path)
+            with open(self.ivf_path + ".tmp", "wb") as saved:
+                np.savez(saved, centroids=centroids, offsets=offsets, rows=rows, covered=rows_written)
+            os.replace(self.ivf_path + ".tmp", self.ivf_path)
+            self._load_ivf()
+
+    def close(self):
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._db.close()
@@ -1,45 +1,82 @@
 from typing import List, Dict, Optional, Any
 import chromadb
 from chromadb.config import Settings
-import boto3
 import json
 from dataclasses import dataclass
+import hashlib
 import os
+import numpy as np
 
 # Import DELEQuestion and TranscriptStructurer from structured_data
 from structured_data import DELEQuestion, TranscriptStructurer
+# Batched, concurrent Titan embeddings (see embeddings.py)
+from embeddings import BedrockEmbeddingFunction, EmbeddingError
+from embedding_cache import CachedEmbeddingFunction, EmbeddingCache, normalize_text
+# Where question vectors are stored and searched (see vector_index.py)
+from vector_index import ChromaIndex, NumpyIndex
 
-class BedrockEmbeddingFunction:
-    def __init__(self, region_name: str = "us-east-2"):
-        """Initialize Bedrock client"""
-        self.bedrock = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=region_name
-        )
-        self.model_id = "amazon.titan-embed-text-v2:0"
+def question_text(question: DELEQuestion) -> str:
+    """Combined text that is embedded and stored as the document"""
+    return f"{question.introduction}\n{question.conversation}\n{question.question}"
 
-    def __call__(self, input: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts using Amazon Bedrock"""
-        embeddings = []
-        
-        for text in input:
-            try:
-                body = json.dumps({
-                    "inputText": text
-                })
-                response = self.bedrock.invoke_model(
-                    modelId=self.model_id,
-                    body=body
-                )
-                response_body = json.loads(response['body'].read())
-                embedding = response_body['embedding']
-                embeddings.append(embedding)
-            except Exception as e:
-                print(f"Error generating embedding: {str(e)}")
-                # Return a zero vector as fallback - now 1024 dimensions for v2 model
-                embeddings.append([0.0] * 1024)
-                
-        return embeddings
+def question_metadata(question: DELEQuestion) -> Dict[str, str]:
+    return {
+        "type": "original",
+        "introduction": question.introduction,
+        "conversation": question.conversation,
+        "question": question.question
+    }
+
+def question_id(question: DELEQuestion) -> str:
+    """
+    Content-derived ID: BLAKE2b over the normalized fields, so the same
+    question gets the same ID in every run and re-ingesting it is a no-op
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for field in (question.introduction, question.conversation, question.question):
+        digest.update(normalize_text(field).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+def format_results(ids: List[str], distances: List[float], metadatas: List[Dict]) -> Dict[str, list]:
+    """Search results with each question formatted for display"""
+    return {
+        'ids': ids,
+        'documents': [
+            f"Introduction:\n{metadata['introduction']}\n\n"
+            f"Conversation:\n{metadata['conversation']}\n\n"
+            f"Question:\n{metadata['question']}"
+            for metadata in metadatas
+        ],
+        'distances': distances
+    }
+
+def mmr_select(query_embedding: List[float], candidate_embeddings: List[List[float]], k: int,
+               lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance: positions of up to k candidates, each
+    picked for similarity to the query minus similarity to those already
+    picked
+    """
+    if not candidate_embeddings:
+        return []
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    picked = []
+    for _ in range(min(k, len(candidates))):
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0)
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return picked
 
 def parse_questions_from_text(text: str) -> List[DELEQuestion]:
     """Parse XML-like formatted questions into DELEQuestion objects"""
@@ -89,13 +126,33 @@ def parse_questions_from_text(text: str) -> List[DELEQuestion]:
     return questions
 
 class QuestionVectorStore:
-    def __init__(self, persist_directory: str = "vectorstore"):
-        """Initialize ChromaDB client with persistence"""
+    def __init__(self, persist_directory: str = "vectorstore", embedding_cache_size: Optional[int] = 1_000_000,
+                 embedding_function: Optional[BedrockEmbeddingFunction] = None, index_backend: str = "chroma"):
+        """
+        Initialize the vector index with persistence: a ChromaDB collection
+        (index_backend="chroma") or a local memory-mapped NumPy index
+        (index_backend="numpy")
+        """
         self.persist_directory = persist_directory
-        self.client = chromadb.PersistentClient(path=persist_directory)
-        # Use Amazon Bedrock's Titan embedding model
-        self.embedding_function = BedrockEmbeddingFunction()
-        self.collection = self._get_or_create_collection()
+        self.index_backend = index_backend
+        # Use Amazon Bedrock's Titan embedding model, behind a disk cache so
+        # text embedded before (by any run) is never sent to Bedrock again
+        self.embedding_cache = EmbeddingCache(
+            os.path.join(persist_directory, "embedding_cache.sqlite3"),
+            max_entries=embedding_cache_size
+        )
+        self.embedding_function = CachedEmbeddingFunction(
+            embedding_function or BedrockEmbeddingFunction(),
+            self.embedding_cache
+        )
+        if index_backend == "chroma":
+            self.client = chromadb.PersistentClient(path=persist_directory)
+            self.collection = self._get_or_create_collection()
+            self.index = ChromaIndex(self.collection)
+        elif index_backend == "numpy":
+            self.index = NumpyIndex(os.path.join(persist_directory, "numpy_index"))
+        else:
+            raise ValueError(f"Unknown index backend: {index_backend}")
 
     def _get_or_create_collection(self):
         """Get or create the collection, resetting if dimensions mismatch"""
@@ -139,100 +196,156 @@ class QuestionVectorStore:
 
     def add_question(self, question: DELEQuestion) -> str:
         """
-        Add a question to the vector store
-        Returns the ID of the added question
+        Add a question to the vector store, unless it is already there
+        Returns the ID of the question
         """
-        # Create a combined text for embedding
-        combined_text = f"{question.introduction}\n{question.conversation}\n{question.question}"
-        
-        # Generate a unique ID
-        question_id = str(hash(combined_text))
-        
-        # Add to collection with metadata containing the separate parts
-        self.collection.add(
-            documents=[combined_text],
-            metadatas=[{
-                "type": "original",
-                "introduction": question.introduction,
-                "conversation": question.conversation,
-                "question": question.question
-            }],
-            ids=[question_id]
-        )
-        return question_id
+        return self.bulk_add_questions([question])[0]
 
-    def find_similar_questions(self, query: str, n_results: int = 5) -> Dict:
-        """Find similar questions based on semantic search"""
+    def find_similar_questions(self, query: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> Dict:
+        """
+        Find similar questions based on semantic search, optionally only
+        among questions whose metadata matches `where`
+        (e.g. {"practice_type": "Vocabulario"})
+        """
         try:
             # Check if collection is empty
-            all_ids = self.collection.get()['ids']
-            if not all_ids:
+            if self.index.count() == 0:
                 print("Vector store is empty - no questions found")
                 return None
-                
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=min(n_results, len(all_ids)),  # Don't request more results than we have
-                include=["metadatas", "distances"]
-            )
-            
+
+            formatted_results = self.find_similar_questions_batch([query], n_results, filters=where)[0]
+
             # Check if we got any results
-            if not results['ids'][0]:
+            if not formatted_results['ids']:
                 print("No similar questions found for query")
                 return None
-            
-            # Format results for better readability
-            formatted_results = {
-                'ids': results['ids'][0],
-                'documents': [],
-                'distances': results['distances'][0]
-            }
-            
-            for metadata in results['metadatas'][0]:
-                formatted_doc = (
-                    f"Introduction:\n{metadata['introduction']}\n\n"
-                    f"Conversation:\n{metadata['conversation']}\n\n"
-                    f"Question:\n{metadata['question']}"
-                )
-                formatted_results['documents'].append(formatted_doc)
-            
+
             return formatted_results
-            
+
         except Exception as e:
             print(f"Error searching vector store: {str(e)}")
             return None
 
-    def bulk_add_questions(self, questions: List[DELEQuestion]) -> List[str]:
-        """Add multiple questions at once and return their IDs"""
-        documents = []
-        metadatas = []
-        ids = []
-        
-        for question in questions:
-            combined_text = f"{question.introduction}\n{question.conversation}\n{question.question}"
-            question_id = str(hash(combined_text))
-            
-            documents.append(combined_text)
-            metadatas.append({
-                "type": "original",
-                "introduction": question.introduction,
-                "conversation": question.conversation,
-                "question": question.question
-            })
-            ids.append(question_id)
-        
-        self.collection.add(
-            documents=documents,
-            metadatas=metadatas,
-            ids=ids
-        )
+    def find_similar_questions_batch(self, queries: List[str], n_results: int = 5,
+                                     filters: Optional[Dict[str, Any]] = None,
+                                     max_distance: Optional[float] = None, mmr: bool = False,
+                                     mmr_lambda: float = 0.5, fetch_k: Optional[int] = None) -> List[Dict]:
+        """
+        Similar questions for many queries at once: one embedding batch and
+        one index query for all of them. Returns one result per query, in
+        input order, formatted like find_similar_questions (empty lists when
+        nothing matched).
+
+        max_distance drops neighbours farther than that distance. mmr
+        re-ranks the fetch_k (default 4 * n_results) nearest neighbours by
+        maximal marginal relevance, trading similarity to the query
+        (mmr_lambda = 1) against novelty among the picks (mmr_lambda = 0).
+        """
+        if not queries:
+            return []
+        if self.index.count() == 0:
+            return [format_results([], [], []) for _ in queries]
+
+        query_embeddings = self.embedding_function(list(queries))
+        candidates = max(n_results, fetch_k or 4 * n_results) if mmr else n_results
+        results = self.index.query(query_embeddings, candidates, where=filters, include_embeddings=mmr)
+
+        formatted = []
+        for position, query_embedding in enumerate(query_embeddings):
+            ids = results['ids'][position]
+            distances = results['distances'][position]
+            metadatas = results['metadatas'][position]
+            keep = [
+                index for index, distance in enumerate(distances)
+                if max_distance is None or distance <= max_distance
+            ]
+            if mmr:
+                embeddings = results['embeddings'][position]
+                picked = mmr_select(query_embedding, [embeddings[index] for index in keep], n_results, mmr_lambda)
+                keep = [keep[index] for index in picked]
+            keep = keep[:n_results]
+            formatted.append(format_results(
+                [ids[index] for index in keep],
+                [distances[index] for index in keep],
+                [metadatas[index] for index in keep]
+            ))
+        return formatted
+
+    def bulk_add_questions(self, questions: List[DELEQuestion], metadata: Optional[Dict[str, Any]] = None) -> List[str]:
+        """
+        Add multiple questions at once and return their IDs, in input order.
+        Questions already in the store (same ID) are skipped, so they are
+        neither stored twice nor embedded again. `metadata` (e.g.
+        {"practice_type": "Conversación"}) is stored with every new question
+        and can be used as a search filter.
+        """
+        ids = [question_id(question) for question in questions]
+        unique = dict(zip(ids, questions))
+        if not unique:
+            return ids
+
+        existing = self.index.existing_ids(list(unique))
+        new = [(qid, question) for qid, question in unique.items() if qid not in existing]
+        if new:
+            documents = [question_text(question) for _, question in new]
+            self.index.add(
+                ids=[qid for qid, _ in new],
+                embeddings=self.embedding_function(documents),
+                documents=documents,
+                metadatas=[{**question_metadata(question), **(metadata or {})} for _, question in new]
+            )
         return ids
 
+    def compact(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Move questions stored under old, per-process hash() IDs to their
+        stable IDs and remove duplicates. Stored embeddings are reused, so
+        nothing is re-embedded.
+        """
+        stored = {}
+        for page in self.index.scan(batch_size):
+            stored.update(zip(page['ids'], zip(page['documents'], page['metadatas'])))
+
+        rekeyed = {}
+        stale_ids = []
+        for stored_id, (document, metadata) in stored.items():
+            question = self.parse_document_to_question(document, metadata)
+            if question is None:
+                continue
+            stable_id = question_id(question)
+            if stored_id == stable_id:
+                continue
+            stale_ids.append(stored_id)
+            if stable_id not in stored and stable_id not in rekeyed:
+                rekeyed[stable_id] = stored_id
+
+        # Only the questions that move need their embeddings read
+        items = list(rekeyed.items())
+        for start in range(0, len(items), batch_size):
+            chunk = dict(items[start:start + batch_size])
+            page = self.index.get(list(chunk.values()), include_embeddings=True)
+            embeddings = dict(zip(page['ids'], page['embeddings']))
+            self.index.add(
+                ids=list(chunk),
+                embeddings=[embeddings[old_id] for old_id in chunk.values()],
+                documents=[stored[old_id][0] for old_id in chunk.values()],
+                metadatas=[stored[old_id][1] for old_id in chunk.values()]
+            )
+        for start in range(0, len(stale_ids), batch_size):
+            self.index.delete(stale_ids[start:start + batch_size])
+
+        return {
+            "scanned": len(stored),
+            "rekeyed": len(rekeyed),
+            "removed": len(stale_ids) - len(rekeyed),
+            "remaining": self.index.count()
+        }
+
     def get_question_by_id(self, question_id: str) -> Optional[DELEQuestion]:
         """Retrieve a specific question by ID"""
-        result = self.collection.get(ids=[question_id])
+        result = self.index.get([question_id])
         if result and result['documents']:
-            return self.parse_document_to_question(result['documents'][0], result['metadatas'][0][0])
+            return self.parse_document_to_question(result['documents'][0], result['metadatas'][0])
         return None
 
     def parse_document_to_question(self, document: str, metadata: Dict) -> Optional[DELEQuestion]:
@@ -254,11 +367,23 @@ class QuestionVectorStore:
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description='Process YouTube transcript and store questions')
-    parser.add_argument('transcript_path', help='Path to the transcript file')
+    parser.add_argument('transcript_path', nargs='?', help='Path to the transcript file')
+    parser.add_argument('--index-backend', choices=['chroma', 'numpy'], default='chroma',
+                        help='Vector index: ChromaDB collection or local memory-mapped NumPy index')
+    parser.add_argument('--compact', action='store_true',
+                        help='Move stored questions to stable IDs and remove duplicates, then exit')
     args = parser.parse_args()
 
     # Initialize vector store
-    vector_store = QuestionVectorStore()
+    vector_store = QuestionVectorStore(index_backend=args.index_backend)
+
+    if args.compact:
+        result = vector_store.compact()
+        print(f"Scanned {result['scanned']} questions: {result['rekeyed']} moved to stable IDs, "
+              f"{result['removed']} duplicates removed, {result['remaining']} remaining")
+        exit(0)
+    if not args.transcript_path:
+        parser.error("transcript_path is required unless --compact is given")
     
     # Get structured questions from transcript
     structurer = TranscriptStructurer()
@@ -273,8 +398,16 @@ if __name__ == "__main__":
     print(f"Found {len(questions)} questions in transcript")
     
     # Store questions in vector store
-    question_ids = vector_store.bulk_add_questions(questions)
+    try:
+        question_ids = vector_store.bulk_add_questions(questions)
+    except EmbeddingError as e:
+        print(f"Error: {e}")
+        for index, error in sorted(e.failures.items()):
+            print(f"  question {index + 1}: {error}")
+        exit(1)
     print(f"Successfully stored {len(question_ids)} questions")
+    cache_stats = vector_store.embedding_cache.stats()
+    print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries")
     
     # Test similarity search with first question
     if questions:
@@ -2,6 +2,7 @@ import gradio as gr
 import requests
 import json
 import random
+import time
 import logging
 import cv2
 from openai import OpenAI
@@ -12,6 +13,11 @@ import paddleocr
 
 dotenv.load_dotenv()
 
+# Seconds between vocabulary refreshes. Picking a word does not refetch the
+# group: every graded word changes its review counts, so the ETag never
+# matches and each refetch would return the whole group.
+VOCABULARY_REFRESH_SECONDS = float(os.getenv('VOCABULARY_REFRESH_SECONDS', '300'))
+
 def load_prompts():
     """Load prompts from YAML file"""
     with open('prompts.yaml', 'r', encoding='utf-8') as f:
@@ -30,38 +36,73 @@ class SpanishWritingApp:
     def __init__(self):
         self.client = OpenAI()
         self.vocabulary = None
+        self.vocabulary_etag = None
+        self.vocabulary_loaded_at = 0.0
         self.current_word = None
         self.reader = None
+        # Get group_id from environment variable or use default
+        self.group_id = os.getenv('GROUP_ID', '1')
         self.load_vocabulary()
 
     def load_vocabulary(self):
         """Fetch vocabulary from API using group_id"""
         try:
-            # Get group_id from environment variable or use default
-            group_id = os.getenv('GROUP_ID', '1')
-            url = f"http://localhost:5000/api/groups/{group_id}/words/raw"
+            url = f"http://localhost:5000/api/groups/{self.group_id}/words/raw"
             logger.debug(f"Fetching vocabulary from: {url}")
             
-            response = requests.get(url)
-            if response.status_code == 200:
+            # Revalidate with the ETag of the vocabulary we already have; the
+            # backend answers 304 without a body when the group is unchanged
+            headers = {}
+            if self.vocabulary_etag and self.vocabulary and self.vocabulary.get('words'):
+                headers['If-None-Match'] = self.vocabulary_etag
+
+            response = requests.get(url, headers=headers)
+            if response.status_code in (200, 304):
+                self.vocabulary_loaded_at = time.monotonic()
+            if response.status_code == 304:
+                logger.debug("Vocabulary unchanged")
+            elif response.status_code == 200:
                 self.vocabulary = response.json()
+                self.vocabulary_etag = response.headers.get('ETag')
                 logger.info(f"Loaded {len(self.vocabulary.get('words', []))} words")
             else:
                 logger.error(f"Failed to load vocabulary. Status code: {response.status_code}")
-                self.vocabulary = {"words": []}
+                # Keep whatever vocabulary was loaded before
+                self.vocabulary = self.vocabulary or {"words": []}
         except Exception as e:
             logger.error(f"Error loading vocabulary: {str(e)}")
-            self.vocabulary = {"words": []}
+            # Keep whatever vocabulary was loaded before
+            self.vocabulary = self.vocabulary or {"words": []}
+
+    def next_due_word(self):
+        """Ask the backend for the next word due for review in the group"""
+        try:
+            url = f"http://localhost:5000/api/groups/{self.group_id}/due"
+            response = requests.get(url, params={'limit': 1})
+            if response.status_code == 200:
+                words = response.json().get('words', [])
+                if words:
+                    return words[0]
+            else:
+                logger.error(f"Failed to load due words. Status code: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error loading due words: {str(e)}")
+        return None
 
     def get_random_word(self):
         """Get a random word from vocabulary"""
         logger.debug("Getting random word")
+        # Pick up words added to the group now and then, not on every word
+        if time.monotonic() - self.vocabulary_loaded_at > VOCABULARY_REFRESH_SECONDS:
+            self.load_vocabulary()
         
         if not self.vocabulary or not self.vocabulary.get('words'):
             logger.error("No vocabulary loaded")
             return "No vocabulary loaded", "", ""
         
-        self.current_word = random.choice(self.vocabulary['words'])
+        # Study words in spaced repetition order; fall back to a random word
+        # if the backend has no schedule to offer
+        self.current_word = self.next_due_word() or random.choice(self.vocabulary['words'])
         logger.debug(f"Selected word: {self.current_word}")
         
         return (
@@ -142,8 +183,8 @@ class SpanishWritingApp:
             session_id = os.getenv('SESSION_ID', '1')  # Use a default session_id for testing
 
             try:
-                response = requests.post(f"http://localhost:5000/api/study_sessions/{session_id}/review", json=review_data)
-                if response.status_code == 200:
+                response = requests.post(f"http://localhost:5000/api/study_sessions/{session_id}/review_log", json=review_data)
+                if response.status_code in (200, 202):
                     logger.info("Successfully submitted review to backend")
                 else:
                     logger.error(f"Failed to submit review. Status code: {response.status_code}")